@@ -0,0 +1,185 @@
+"""Benchmarks ``PortScanner.run()`` against a ``LoopbackTarget`` running in a
+separate process, and reports ports per second, wall time, peak file
+descriptors, peak resident memory and accuracy::
+
+    $ python bench/bench_scanner.py --mix mixed --repeat 3
+    $ python bench/bench_scanner.py --open 100 --closed 20000 --filtered 50 --json
+
+Ports of the target are scanned in a single run, so the scheduler is
+measured rather than the per-scan setup.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from port_scanner.scanner import PortScanner, SCAN_TYPES
+from port_scanner.reactor import available_backends
+from port_scanner.values import RESULT_OPEN, RESULT_CLOSED, RESULT_FILTERED
+
+# (open, closed, filtered, slow) port counts
+MIXES = {
+    'closed': (10, 10000, 0, 0),
+    'mixed': (200, 5000, 20, 20),
+    'filtered': (20, 1000, 200, 0),
+}
+
+EXPECTED_RESULTS = {
+    'open': RESULT_OPEN,
+    'closed': RESULT_CLOSED,
+    'filtered': RESULT_FILTERED,
+    'slow': RESULT_OPEN,
+}
+
+# number of results between two counts of open file descriptors
+FD_SAMPLE_INTERVAL = 32
+
+
+def count_fds():
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return None
+
+
+def peak_rss_mb():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    if sys.platform == 'darwin':
+        return usage / (1024.0 * 1024.0)
+
+    return usage / 1024.0
+
+
+class FdSampler(object):
+    """An ``on_result`` hook counting the open file descriptors of the process
+    every ``FD_SAMPLE_INTERVAL`` results.
+    """
+    def __init__(self):
+        self.results = 0
+        self.peak = count_fds()
+
+    def __call__(self, key, result, rtt):
+        self.results += 1
+        if self.results % FD_SAMPLE_INTERVAL == 0 and self.peak is not None:
+            self.peak = max(self.peak, count_fds())
+
+
+def start_target(open_count, closed_count, filtered_count, slow_count):
+    """Start a ``LoopbackTarget`` in a child process.
+
+    Returns:
+        A (process, ports) tuple. The target runs until the process'
+        standard input is closed.
+    """
+    process = subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, 'target.py'),
+                                '--open', str(open_count), '--closed', str(closed_count),
+                                '--filtered', str(filtered_count), '--slow', str(slow_count)],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    ports = json.loads(process.stdout.readline().decode())
+    return process, ports
+
+
+def stop_target(process):
+    process.stdin.close()
+    process.wait()
+
+
+def run_once(ports, **scanner_kwargs):
+    """Scan the target's ports once, and return the measurements.
+    """
+    expected = {}
+    for port_class, class_ports in ports.items():
+        for port in class_ports:
+            expected[port] = EXPECTED_RESULTS[port_class]
+
+    fd_sampler = FdSampler()
+    scanner = PortScanner('127.0.0.1', list(expected), on_result=fd_sampler, **scanner_kwargs)
+    try:
+        start_time = time.time()
+        results_map = scanner.run()
+        wall_time = time.time() - start_time
+    finally:
+        scanner.close()
+
+    correct = sum(1 for port, result in results_map.items() if expected[port] == result)
+    return {
+        'ports': len(expected),
+        'wall_time': wall_time,
+        'ports_per_sec': len(expected) / wall_time if wall_time else None,
+        'peak_fds': fd_sampler.peak,
+        'peak_rss_mb': peak_rss_mb(),
+        'accuracy': correct / float(len(expected)) if expected else None,
+    }
+
+
+def format_run(index, run):
+    return '%-5d %8d %10.3f %12.0f %10s %12.1f %9.2f%%' % (
+        index, run['ports'], run['wall_time'], run['ports_per_sec'] or 0,
+        run['peak_fds'], run['peak_rss_mb'], 100 * (run['accuracy'] or 0))
+
+
+def handle_args():
+    parser = argparse.ArgumentParser(description='Benchmark port scans of a loopback target.')
+    parser.add_argument('--mix', choices=sorted(MIXES), default='mixed',
+                        help='A preset of open, closed, filtered and slow port counts.')
+    parser.add_argument('--open', type=int, help='The number of open ports, overriding --mix.')
+    parser.add_argument('--closed', type=int, help='The number of closed ports, overriding --mix.')
+    parser.add_argument('--filtered', type=int,
+                        help='The number of filtered ports, overriding --mix.')
+    parser.add_argument('--slow', type=int,
+                        help='The number of slow ports, overriding --mix.')
+    parser.add_argument('--repeat', type=int, default=1, help='The number of scans to run.')
+    parser.add_argument('--scan-type', dest='scan_type', choices=SCAN_TYPES, default='connect')
+    parser.add_argument('--reactor', choices=available_backends(),
+                        help='The reactor backend. Defaults to the best available.')
+    parser.add_argument('--window', type=int, help='The initial number of probes in flight.')
+    parser.add_argument('--json', action='store_true',
+                        help='If present, print one JSON object per run instead of a table.')
+    return parser.parse_args()
+
+
+def main():
+    args = handle_args()
+    open_count, closed_count, filtered_count, slow_count = MIXES[args.mix]
+    if args.open is not None:
+        open_count = args.open
+    if args.closed is not None:
+        closed_count = args.closed
+    if args.filtered is not None:
+        filtered_count = args.filtered
+    if args.slow is not None:
+        slow_count = args.slow
+
+    scanner_kwargs = {'scan_type': args.scan_type, 'reactor_backend': args.reactor}
+    if args.window is not None:
+        scanner_kwargs['window'] = args.window
+
+    process, ports = start_target(open_count, closed_count, filtered_count, slow_count)
+    try:
+        if not args.json:
+            print('%d open, %d closed, %d filtered, %d slow ports on 127.0.0.1, %s scan\n'
+                  % (open_count, closed_count, filtered_count, slow_count, args.scan_type))
+            print('%-5s %8s %10s %12s %10s %12s %10s' % (
+                'RUN', 'PORTS', 'WALL (s)', 'PORTS/SEC', 'PEAK FDS', 'PEAK RSS (MB)', 'ACCURACY'))
+
+        for index in range(1, args.repeat + 1):
+            run = run_once(ports, **scanner_kwargs)
+            if args.json:
+                run['run'] = index
+                print(json.dumps(run, sort_keys=True))
+            else:
+                print(format_run(index, run))
+            sys.stdout.flush()
+    finally:
+        stop_target(process)
+
+
+if __name__ == '__main__':
+    main()
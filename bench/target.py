@@ -0,0 +1,157 @@
+"""A stand-in target for benchmarks, listening on the loopback interface.
+
+Open ports are listening sockets: the kernel completes handshakes on its own.
+Closed ports are ports nothing is bound to, which answer with a RST.
+Filtered ports are listening sockets whose accept queue is kept full, so the
+kernel silently drops SYNs to them, as a firewall would.
+Slow ports are open ports that answer late: their accept queue is full too,
+but one connection is taken off it every ``slow_delay`` seconds. A SYN
+dropped meanwhile is answered when the client sends it again, about a second
+later on Linux, so probes to slow ports are answered after a second or more.
+Handshakes on the loopback interface can't be delayed more finely from
+user space; for a uniform delay on every port, use netem instead, e.g.
+``tc qdisc add dev lo root netem delay 50ms``.
+
+Run as a script, the target prints its ports as a JSON object on a single
+line, and keeps them up until its standard input is closed::
+
+    $ python bench/target.py --open 10 --closed 100 --filtered 5 --slow 5
+"""
+import argparse
+import json
+import select
+import socket
+import sys
+import threading
+
+LOOPBACK_ADDRESS = '127.0.0.1'
+
+# time between two connections taken off the accept queue of a slow port,
+# in seconds
+SLOW_DELAY = 0.2
+
+
+class LoopbackTarget(object):
+    """Sets up sockets emulating open, closed, filtered and slow ports.
+
+    Keyword Args:
+        open_count(int): The number of open ports.
+        closed_count(int): The number of closed ports.
+        filtered_count(int): The number of filtered ports.
+        slow_count(int): The number of slow ports.
+        slow_delay(float): The time between two connections taken off the
+            accept queue of a slow port, in seconds.
+        address(str): The loopback address to listen on.
+
+    Attributes:
+        ports(dict): A dictionary mapping ``'open'``, ``'closed'``,
+            ``'filtered'`` and ``'slow'`` to lists of ports, populated by
+            ``start()``.
+    """
+    def __init__(self, open_count=0, closed_count=0, filtered_count=0, slow_count=0,
+                 slow_delay=SLOW_DELAY, address=LOOPBACK_ADDRESS):
+        self.counts = {'open': open_count, 'closed': closed_count,
+                       'filtered': filtered_count, 'slow': slow_count}
+        self.slow_delay = slow_delay
+        self.address = address
+        self.ports = {'open': [], 'closed': [], 'filtered': [], 'slow': []}
+        self.sockets = []
+        self.listeners = {}
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def listen(self, backlog):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind((self.address, 0))
+        listener.listen(backlog)
+        self.sockets.append(listener)
+        port = listener.getsockname()[1]
+        self.listeners[port] = listener
+        return port
+
+    def fill_accept_queue(self, port):
+        # a listen(0) queue holds a single connection, which is never accepted
+        filler = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        filler.connect((self.address, port))
+        self.sockets.append(filler)
+
+    def release_slow_ports(self):
+        """Take one connection off the accept queue of every slow port each
+        ``slow_delay`` seconds, until the target is closed.
+        """
+        listeners = [self.listeners[port] for port in self.ports['slow']]
+        while not self.stopped.wait(self.slow_delay):
+            for listener in select.select(listeners, [], [], 0)[0]:
+                conn, addr = listener.accept()
+                conn.close()
+
+    def free_port(self):
+        """Return a port nothing is bound to.
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind((self.address, 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        return port
+
+    def start(self):
+        for _ in range(self.counts['open']):
+            self.ports['open'].append(self.listen(socket.SOMAXCONN))
+
+        for _ in range(self.counts['filtered']):
+            port = self.listen(0)
+            self.fill_accept_queue(port)
+            self.ports['filtered'].append(port)
+
+        for _ in range(self.counts['slow']):
+            port = self.listen(0)
+            self.fill_accept_queue(port)
+            self.ports['slow'].append(port)
+
+        if self.ports['slow']:
+            self.thread = threading.Thread(target=self.release_slow_ports)
+            self.thread.daemon = True
+            self.thread.start()
+
+        used = set(self.ports['open'] + self.ports['filtered'] + self.ports['slow'])
+        while len(self.ports['closed']) < self.counts['closed']:
+            port = self.free_port()
+            if port not in used:
+                used.add(port)
+                self.ports['closed'].append(port)
+
+        return self.ports
+
+    def close(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+        for sock in self.sockets:
+            sock.close()
+
+        del self.sockets[:]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--open', type=int, default=0)
+    parser.add_argument('--closed', type=int, default=0)
+    parser.add_argument('--filtered', type=int, default=0)
+    parser.add_argument('--slow', type=int, default=0)
+    parser.add_argument('--slow-delay', dest='slow_delay', type=float, default=SLOW_DELAY)
+    args = parser.parse_args()
+
+    target = LoopbackTarget(args.open, args.closed, args.filtered, args.slow, args.slow_delay)
+    try:
+        sys.stdout.write(json.dumps(target.start()) + '\n')
+        sys.stdout.flush()
+        # keep the ports up until the benchmark closes our standard input
+        sys.stdin.read()
+    finally:
+        target.close()
+
+
+if __name__ == '__main__':
+    main()
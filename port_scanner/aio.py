@@ -0,0 +1,213 @@
+"""This module provides a class ``AsyncPortScanner`` that scans a collection
+of ports on a remote host from an ``asyncio`` event loop.
+
+Probes are ``port_scanner.probe.PortProbe`` non-blocking connects, watched
+with the loop's ``add_writer`` machinery, so any number of scans can share
+one loop with the rest of an application. Any loop that supports
+``add_writer`` on sockets works, including ``uvloop``'s. As with
+``port_scanner.scanner.PortScanner``, the deadline of each probe follows a
+``port_scanner.timing.RttEstimator`` of the host, and grows with retries.
+
+This module requires Python 3.6 or later.
+"""
+import asyncio
+import socket
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+from port_scanner.values import RESULT_OPEN, RESULT_CLOSED, RESULT_FILTERED, RESULT_UNKNOWN
+from port_scanner.probe import PortProbe
+from port_scanner.chunker import PermutedPortChunker
+from port_scanner.scanner import InvalidHostError, WINDOW_SIZE, MAX_RETRIES, RETRY_BACKOFF
+from port_scanner.resolver import unique_addresses
+from port_scanner.timing import RttEstimator, monotonic, \
+     INITIAL_TIMEOUT, MIN_TIMEOUT, MAX_TIMEOUT
+
+# the loop running the current coroutine; ``get_running_loop()`` is only
+# available from Python 3.7 on
+running_loop = getattr(asyncio, 'get_running_loop', asyncio.get_event_loop)
+
+
+def new_event_loop(use_uvloop=True):
+    """Event loop factory.
+
+    Keyword Args:
+        use_uvloop(bool): Whether to return a ``uvloop`` loop, if ``uvloop``
+            is installed. Falls back to the default ``asyncio`` loop.
+    """
+    if use_uvloop and uvloop is not None:
+        return uvloop.new_event_loop()
+
+    return asyncio.new_event_loop()
+
+
+class AsyncPortScanner(object):
+    """This class takes a remote host and a collection of ports and scans
+    the ports for their status, without blocking the event loop.
+
+    Args:
+        host(str): The hostname or IP address of the remote host. If a hostname
+            is given and it resolves to multiple addresses, only one address is used.
+        port_list(collection): The collection of port numbers (integers) to scan.
+
+    Keyword Args:
+        chunker_class: The ``port_scanner.chunker.PortChunker`` (sub)class
+            that decides the order in which ports are probed.
+        seed: Seed passed to the chunker, to make the scan order reproducible.
+        window(int): The number of probes kept in flight at once.
+        timeout(float): The time after which an unanswered probe is
+            considered filtered, before round trip times to the host have
+            been measured. Defaults to ``port_scanner.timing.INITIAL_TIMEOUT``.
+        min_timeout(float): The lower clamp of the measured probe timeout.
+        max_timeout(float): The upper clamp of the measured probe timeout,
+            retries included.
+
+    Attributes:
+        address(str): The resolved address of the host, once a scan started.
+        results_map(dict): A dictionary mapping ports to their status codes
+            populated during a scan.
+        rtt_estimator(RttEstimator): The round trip time estimates of the
+            host, reset by every scan.
+    """
+    def __init__(self, host, port_list, chunker_class=PermutedPortChunker, seed=None,
+                 window=WINDOW_SIZE, timeout=None, min_timeout=MIN_TIMEOUT,
+                 max_timeout=MAX_TIMEOUT):
+        self.host = host
+        self.address = None
+        self.port_list = port_list
+        self.chunker_class = chunker_class
+        self.seed = seed
+        self.window = window
+        self.timeout = timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.results_map = {}
+        self.rtt_estimator = None
+
+    async def resolve(self):
+        """Resolve the instance's host without blocking the loop.
+
+        Raises:
+            InvalidHostError: If hostname doesn't resolve.
+        """
+        if self.address is not None:
+            return self.address
+
+        loop = running_loop()
+        try:
+            addr_info = await loop.getaddrinfo(self.host, None, family=socket.AF_UNSPEC,
+                                               type=socket.SOCK_STREAM)
+        except socket.gaierror:
+            raise InvalidHostError(self.host)
+
+        addresses = unique_addresses(addr_info)
+        if not addresses:
+            raise InvalidHostError(self.host)
+
+        # IPv4 preferred, as with ``port_scanner.scanner.resolve_host()``
+        self.address = addresses[0]
+        return self.address
+
+    async def probe_once(self, port, timeout):
+        """Connect to a port once, and return its status and the time the
+        host took to answer, or ``None``.
+        """
+        loop = running_loop()
+        probe = PortProbe(self.address, port)
+        writable = loop.create_future()
+
+        def on_writable():
+            if not writable.done():
+                writable.set_result(None)
+
+        loop.add_writer(probe.file_no, on_writable)
+        try:
+            await asyncio.wait_for(writable, timeout)
+            return probe.analyze(), probe.rtt()
+        except asyncio.TimeoutError:
+            return RESULT_FILTERED, None
+        finally:
+            loop.remove_writer(probe.file_no)
+            probe.close()
+
+    async def probe_port(self, port):
+        """Probe a port until its status is determined, retrying up to
+        ``MAX_RETRIES`` times with a growing timeout. Answers to first
+        probes are sampled by the instance's ``rtt_estimator``, and retries
+        timing out back it off.
+
+        Returns:
+            A (port, result) tuple.
+        """
+        estimator = self.rtt_estimator
+        for attempt in range(MAX_RETRIES + 1):
+            timeout = min(estimator.timeout() * RETRY_BACKOFF ** attempt, estimator.max_timeout)
+            sent_time = monotonic()
+            result, rtt = await self.probe_once(port, timeout)
+            if result in (RESULT_OPEN, RESULT_CLOSED):
+                # Karn's algorithm: retries can't tell which probe was answered
+                if attempt == 0 and rtt is not None:
+                    estimator.sample(rtt)
+                break
+
+            if result == RESULT_FILTERED and attempt > 0:
+                estimator.back_off(sent_time, monotonic())
+
+        return port, result
+
+    async def stream(self):
+        """Clear the results map and start a new scan, yielding
+        (port, result) tuples as ports are resolved.
+
+        Usage::
+
+            async for port, result in scanner.stream():
+                ...
+        """
+        self.results_map.clear()
+        await self.resolve()
+        timeout = self.timeout if self.timeout is not None else INITIAL_TIMEOUT
+        self.rtt_estimator = RttEstimator(timeout, self.min_timeout, self.max_timeout)
+
+        port_chunker = self.chunker_class(self.port_list, seed=self.seed)
+        pending = []
+        in_flight = set()
+        try:
+            while True:
+                while len(in_flight) < self.window:
+                    if not pending:
+                        pending = port_chunker.get_chunk() or []
+                        pending.reverse()
+                        if not pending:
+                            break
+
+                    in_flight.add(asyncio.ensure_future(self.probe_port(pending.pop())))
+
+                if not in_flight:
+                    break
+
+                done, in_flight = await asyncio.wait(in_flight,
+                                                     return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    port, result = task.result()
+                    self.results_map[port] = result
+                    yield port, result
+        finally:
+            for task in in_flight:
+                task.cancel()
+            # let cancelled probes close their sockets before returning
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+    async def scan(self):
+        """Clear the results map and run a complete scan.
+
+        Returns:
+            The instance's ``results_map``.
+        """
+        async for port, result in self.stream():
+            pass
+
+        return self.results_map
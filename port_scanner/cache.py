@@ -0,0 +1,122 @@
+"""This module provides a class ``ResultCache``: a persistent cache of port
+results kept in an SQLite database, so that repeated scans of the same hosts
+only probe the ports whose cached result is stale.
+
+Each result class has its own time to live. Results are written in batches,
+and once the cache holds more than its maximum number of entries, the
+oldest entries are evicted.
+"""
+import sqlite3
+import time
+
+from port_scanner.values import RESULT_OPEN, RESULT_CLOSED, RESULT_FILTERED
+
+# time to live of cached results, in seconds, by result class.
+# Results of other classes aren't cached.
+DEFAULT_TTLS = {
+    RESULT_OPEN: 900.0,
+    RESULT_CLOSED: 900.0,
+    RESULT_FILTERED: 300.0,
+}
+
+# number of entries the cache holds before the oldest are evicted
+MAX_ENTRIES = 1000000
+
+# number of results buffered before they are written to the database
+STORE_BATCH_SIZE = 1024
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS results ('
+    ' address TEXT NOT NULL, port INTEGER NOT NULL,'
+    ' result INTEGER NOT NULL, timestamp REAL NOT NULL,'
+    ' PRIMARY KEY (address, port))',
+    'CREATE INDEX IF NOT EXISTS results_timestamp ON results (timestamp)',
+]
+
+
+class ResultCache(object):
+    """A persistent cache mapping (address, port) to (result, timestamp).
+
+    Keyword Args:
+        path(str): The path of the SQLite database. Defaults to an in-memory
+            database, which doesn't persist.
+        ttls(dict): A dictionary mapping result classes to their time to
+            live, in seconds. Defaults to ``DEFAULT_TTLS``.
+        max_entries(int): The number of entries above which the oldest
+            are evicted.
+
+    Attributes:
+        hits(int): The number of lookups that found a fresh result.
+        misses(int): The number of lookups that didn't.
+    """
+    def __init__(self, path=':memory:', ttls=None, max_entries=MAX_ENTRIES):
+        self.connection = sqlite3.connect(path)
+        for statement in SCHEMA:
+            self.connection.execute(statement)
+        self.connection.commit()
+
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.max_entries = max_entries
+        self.pending = []
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, address, port, now=None):
+        """Return the cached result of a port if it is still fresh, or ``None``.
+        """
+        if now is None:
+            now = time.time()
+
+        row = self.connection.execute(
+            'SELECT result, timestamp FROM results WHERE address = ? AND port = ?',
+            (address, port)).fetchone()
+
+        if row is not None and now - row[1] < self.ttls.get(row[0], 0):
+            self.hits += 1
+            return row[0]
+
+        self.misses += 1
+        return None
+
+    def store(self, address, port, result, now=None):
+        """Cache the result of a port probed at ``now``. Results of classes
+        without a time to live are ignored.
+        """
+        if not self.ttls.get(result):
+            return
+
+        if now is None:
+            now = time.time()
+
+        self.pending.append((address, port, result, now))
+        if len(self.pending) >= STORE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered results to the database, then evict the oldest
+        entries if there are too many.
+        """
+        if self.pending:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)', self.pending)
+            del self.pending[:]
+
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self.connection.execute(
+                'DELETE FROM results WHERE rowid IN '
+                '(SELECT rowid FROM results ORDER BY timestamp LIMIT ?)', (excess,))
+
+        self.connection.commit()
+
+    def stats(self):
+        """Return a dictionary of the hit and miss counts.
+        """
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
@@ -0,0 +1,195 @@
+"""This module provides a class ``Checkpoint`` that keeps the progress of a
+scan in a memory-mapped file, so that a scan that was interrupted can be
+resumed without probing the ports that were already done.
+
+The file is laid out as a fixed-size header, a bitmap of the ports to scan,
+a table of addresses, and one section per address holding a bitmap of the done ports and the 2-bit
+result of each done port. Recording a result sets a few bits in memory, and
+the file is synced at most once per ``SYNC_INTERVAL`` seconds.
+"""
+import mmap
+import random
+import struct
+import time
+
+from port_scanner.output import pack_address, unpack_address
+from port_scanner.portset import PortSet, BITMAP_SIZE
+
+CHECKPOINT_MAGIC = b'PSK1'
+
+# magic, seed, number of addresses
+HEADER = struct.Struct('!4sQI')
+
+# packed address
+HOST_ENTRY = struct.Struct('!16s')
+
+# two bits per port number
+RESULTS_SIZE = 65536 // 4
+
+SECTION_SIZE = BITMAP_SIZE + RESULTS_SIZE
+
+# minimum time between two syncs of the file, in seconds
+SYNC_INTERVAL = 1.0
+
+
+class InvalidCheckpointError(Exception):
+    def __init__(self, message):
+        self.message = message
+
+
+class Checkpoint(object):
+    """The progress of a scan of a list of ports on a list of addresses,
+    backed by a memory-mapped file. Use ``create()`` or ``load()`` rather
+    than the constructor.
+
+    Args:
+        file_obj(file): The checkpoint file, opened for reading and writing.
+
+    Attributes:
+        seed(int): The seed of the scan's chunkers.
+        addresses(list): The addresses scanned.
+        port_list(PortSet): The ports scanned on every address.
+
+    Raises:
+        InvalidCheckpointError: If the file isn't a checkpoint.
+    """
+    def __init__(self, file_obj):
+        self.file_obj = file_obj
+        self.map = mmap.mmap(file_obj.fileno(), 0)
+        self.closed = False
+        self.last_sync = time.time()
+
+        magic, self.seed, host_count = None, None, 0
+        if len(self.map) >= HEADER.size:
+            magic, self.seed, host_count = HEADER.unpack_from(self.map, 0)
+
+        if magic != CHECKPOINT_MAGIC or len(self.map) != self.size(host_count):
+            self.map.close()
+            raise InvalidCheckpointError('%s is not a checkpoint file' % file_obj.name)
+
+        self.port_list = PortSet.from_bitmap(self.map[HEADER.size:HEADER.size + BITMAP_SIZE])
+
+        self.addresses = []
+        self.indexes = {}
+        for index in range(host_count):
+            address = unpack_address(HOST_ENTRY.unpack_from(self.map, self.entry_offset(index))[0])
+            self.addresses.append(address)
+            self.indexes[address] = index
+
+    @staticmethod
+    def size(host_count):
+        return HEADER.size + BITMAP_SIZE + host_count * (HOST_ENTRY.size + SECTION_SIZE)
+
+    @classmethod
+    def create(cls, path, addresses, port_list, seed=None):
+        """Create a checkpoint file for a new scan, replacing any existing file.
+
+        Args:
+            path(str): The path of the file.
+            addresses(list): The addresses to scan.
+            port_list(collection): The ports to scan on every address.
+
+        Keyword Args:
+            seed(int): The seed of the scan's chunkers. If ``None``, a random
+                seed is chosen, so that a resumed scan keeps drawing ports
+                in the same order.
+        """
+        if seed is None:
+            seed = random.getrandbits(63)
+
+        with open(path, 'wb') as file_obj:
+            file_obj.write(HEADER.pack(CHECKPOINT_MAGIC, seed, len(addresses)))
+            file_obj.write(bytes(PortSet(port_list).bits))
+            for address in addresses:
+                file_obj.write(HOST_ENTRY.pack(pack_address(address)))
+
+            file_obj.truncate(cls.size(len(addresses)))
+
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path):
+        """Open an existing checkpoint file.
+
+        Raises:
+            InvalidCheckpointError: If the file can't be opened or isn't a checkpoint.
+        """
+        try:
+            file_obj = open(path, 'r+b')
+        except IOError as e:
+            raise InvalidCheckpointError('Can\'t open %s: %s' % (path, e.strerror))
+
+        try:
+            return cls(file_obj)
+        except ValueError:
+            # empty files can't be mapped
+            file_obj.close()
+            raise InvalidCheckpointError('%s is not a checkpoint file' % path)
+        except InvalidCheckpointError:
+            file_obj.close()
+            raise
+
+    def entry_offset(self, index):
+        return HEADER.size + BITMAP_SIZE + index * HOST_ENTRY.size
+
+    def section_offset(self, address):
+        """Return the offset of an address' section.
+
+        Raises:
+            InvalidCheckpointError: If the address isn't part of the checkpoint.
+        """
+        try:
+            index = self.indexes[address]
+        except KeyError:
+            raise InvalidCheckpointError('%s is not part of the checkpoint' % address)
+
+        return self.entry_offset(len(self.addresses)) + index * SECTION_SIZE
+
+    def is_done(self, address, port):
+        offset = self.section_offset(address) + (port >> 3)
+        return bool(struct.unpack_from('B', self.map, offset)[0] & (1 << (port & 7)))
+
+    def mark(self, address, port, result):
+        """Record the final result of a port.
+        """
+        offset = self.section_offset(address)
+
+        done_offset = offset + (port >> 3)
+        done = struct.unpack_from('B', self.map, done_offset)[0]
+        struct.pack_into('B', self.map, done_offset, done | (1 << (port & 7)))
+
+        result_offset = offset + BITMAP_SIZE + (port >> 2)
+        shift = (port & 3) * 2
+        results = struct.unpack_from('B', self.map, result_offset)[0]
+        struct.pack_into('B', self.map, result_offset,
+                         (results & ~(3 << shift)) | ((result & 3) << shift))
+
+    def results(self, address):
+        """Generate the (port, result) tuples of the done ports of an address.
+        """
+        offset = self.section_offset(address)
+        results = bytearray(self.map[offset + BITMAP_SIZE:offset + SECTION_SIZE])
+        for port in PortSet.from_bitmap(self.map[offset:offset + BITMAP_SIZE]):
+            yield port, (results[port >> 2] >> ((port & 3) * 2)) & 3
+
+    def remaining_ports(self, address):
+        """Return the ``PortSet`` of ports of an address that are not done.
+        """
+        offset = self.section_offset(address)
+        return self.port_list - PortSet.from_bitmap(self.map[offset:offset + BITMAP_SIZE])
+
+    def sync(self, force=False):
+        """Write the changes out to the file, unless it was synced less
+        than ``SYNC_INTERVAL`` seconds ago and ``force`` is false.
+        """
+        now = time.time()
+        if force or now - self.last_sync >= SYNC_INTERVAL:
+            self.map.flush()
+            self.last_sync = now
+
+    def close(self):
+        if not self.closed:
+            self.map.flush()
+            self.map.close()
+            self.file_obj.close()
+            self.closed = True
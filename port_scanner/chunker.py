@@ -2,18 +2,31 @@
 to a port scanner.
 """
 import random
+from array import array
+
+from port_scanner.portset import PortSet
+from port_scanner.ranking import COMMON_PORTS, ranked_slice
 
 CHUNK_SIZE_LOWER_LIMIT = 10
 CHUNK_SIZE_UPPER_LIMIT = 20
 
 LOWEST_PORT_NUMBER = 1
-HIGHEST_PORT_NUMBER = 65335
+HIGHEST_PORT_NUMBER = 65535
+
+VALID_PORTS = PortSet.from_range(LOWEST_PORT_NUMBER, HIGHEST_PORT_NUMBER)
+
+# upper bounds of the rank tiers ports are drawn in, by their rank in
+# ``port_scanner.ranking``: 0 to 9, then 10 to 99, then the rest of the
+# common ports
+RANK_TIERS = (10, 100, len(COMMON_PORTS))
+
+# ports of each rank tier, most often open tier first
+TIER_PORTS = tuple(ranked_slice(lower, upper)
+                   for lower, upper in zip((0,) + RANK_TIERS, RANK_TIERS))
 
-FIRST_CLASS_PORTS = {80, 443}
-SECOND_CLASS_PORTS = {139, 53, 23, 111, 995,
-                      22, 993, 143, 135, 110,
-                      445, 587, 25, 199, 113,
-                      21, 256, 554}
+# ports of the first two tiers
+FIRST_CLASS_PORTS = set(TIER_PORTS[0])
+SECOND_CLASS_PORTS = set(TIER_PORTS[1])
 
 
 class RemovalError(Exception):
@@ -40,16 +53,19 @@ def port_set_intersection(port_set_1, port_set_2):
     return port_set_1.intersection(port_set_2)
 
 
-def random_chunk_size(lower_bound, upper_bound):
+def random_chunk_size(lower_bound, upper_bound, rng=random):
     """Return a random integer between lower_bound and upper_bound.
 
+    Keyword Args:
+        rng: Source of randomness. Defaults to the ``random`` module.
+
     Raises:
         ChunkBoundsError: if bounds are invalid.
     """
     if not bounds_are_valid(lower_bound, upper_bound):
         raise ChunkBoundsError(lower_bound, upper_bound)
 
-    return random.randint(lower_bound, upper_bound)
+    return rng.randint(lower_bound, upper_bound)
 
 
 def port_is_valid(port):
@@ -58,13 +74,11 @@ def port_is_valid(port):
 
 def validate_port_list(port_list):
     """Filter out invalid (out of bounds) ports from list.
-    """
-    port_pool = set()
-    for port in port_list:
-        if port_is_valid(port):
-            port_pool.add(port)
 
-    return port_pool
+    Returns:
+        A ``port_scanner.portset.PortSet`` of the valid ports.
+    """
+    return VALID_PORTS.intersection(port_list)
 
 
 def remove_ports_from_pool(ports_to_remove, port_pool):
@@ -72,7 +86,7 @@ def remove_ports_from_pool(ports_to_remove, port_pool):
 
     Args:
         ports_to_remove(collection): iterable collection of ports to remove.
-        port_pool(set): pool to remove from.
+        port_pool(set): pool to remove from, a ``set`` or a ``PortSet``.
 
     Raises:
         RemovalError: if a port isn't in the pool to begin with.
@@ -84,15 +98,18 @@ def remove_ports_from_pool(ports_to_remove, port_pool):
         raise RemovalError(port)
 
 
-def draw_from_pool(port_pool, size):
+def draw_from_pool(port_pool, size, rng=random):
     """Return a random sample of ports from a pool,
     and remove those ports from the pool.
 
     Args:
-        port_pool(set): The pool of ports to draw from.
+        port_pool(set): The pool of ports to draw from, a ``set`` or a ``PortSet``.
         size(int): The desired size of the drawing.
             If size is bigger than the pool, the pool will be completely drained.
 
+    Keyword Args:
+        rng: Source of randomness. Defaults to the ``random`` module.
+
     Returns:
         Random sample of ports from the pool.
     """
@@ -100,7 +117,11 @@ def draw_from_pool(port_pool, size):
         size = 0
 
     size = min(size, len(port_pool))
-    drawing = random.sample(port_pool, size)
+    if isinstance(port_pool, PortSet):
+        drawing = port_pool.sample(size, rng)
+    else:
+        # sample from a sequence: sets aren't accepted by newer versions of ``random``
+        drawing = rng.sample(sorted(port_pool), size)
     remove_ports_from_pool(drawing, port_pool)
     return drawing
 
@@ -108,38 +129,132 @@ def draw_from_pool(port_pool, size):
 def port_pool_is_empty(port_pool):
     """Check whether a port pool is empty.
     """
-    return len(port_pool) == 0
+    return not port_pool
+
+
+class PortPermutation(object):
+    """A seedable pseudo-random permutation of the integers ``0 .. size - 1``.
+
+    The permutation is computed with a small balanced Feistel cipher over the
+    smallest even power of two covering ``size``, cycle-walking past outputs
+    that fall outside of the range. Only the round keys and a counter are kept,
+    so memory use is constant and ``next()`` takes amortized constant time.
+
+    Args:
+        size(int): The number of integers to permute.
+
+    Keyword Args:
+        seed: Seed for the round keys. The same seed and size always produce
+            the same permutation. If ``None``, a random seed is used.
+
+    Attributes:
+        size(int): The number of integers in the permutation.
+        position(int): The number of integers returned so far.
+    """
+    ROUNDS = 4
+
+    def __init__(self, size, seed=None):
+        self.size = max(size, 0)
+        self.position = 0
+
+        half_bits = 1
+        while 1 << (2 * half_bits) < self.size:
+            half_bits += 1
+
+        self.half_bits = half_bits
+        self.half_mask = (1 << half_bits) - 1
+
+        rng = random.Random(seed)
+        self.keys = [rng.getrandbits(32) for _ in range(self.ROUNDS)]
+        self.counter = 0
+
+    def round_function(self, value, key):
+        mixed = ((value ^ key) * 0x9E3779B1 + (key >> 7)) & 0xFFFFFFFF
+        mixed ^= mixed >> 15
+        return mixed & self.half_mask
+
+    def encrypt(self, value):
+        """Map a value of the covering domain to another one, bijectively.
+        """
+        left = value >> self.half_bits
+        right = value & self.half_mask
+        for key in self.keys:
+            left, right = right, left ^ self.round_function(right, key)
+
+        return (left << self.half_bits) | right
+
+    def next(self):
+        """Return the next integer of the permutation, or ``None`` when exhausted.
+        """
+        if self.position >= self.size:
+            return None
+
+        value = self.encrypt(self.counter)
+        self.counter += 1
+        # cycle-walk: re-encrypt until the value lands inside of the range
+        while value >= self.size:
+            value = self.encrypt(value)
+
+        self.position += 1
+        return value
+
+    def remaining(self):
+        return self.size - self.position
+
+    def __iter__(self):
+        value = self.next()
+        while value is not None:
+            yield value
+            value = self.next()
 
 
 class PortChunker(object):
     """This object is initialized with a collection of ports(integers)
-    that it splits up into     distinct non-overlapping pools(sets).
+    that it splits up into distinct non-overlapping pools(``PortSet``s).
     The member method ``get_chunk()`` draws from the pools according to preferences.
     Designed to be called by ``port_scanner.scanner.PortScanner``
     to scan chunks of ports at a time.
 
     Args:
-        port_list(collection): Collection of ports to form the basis of the pools.
+        port_list(collection): Collection of ports to form the basis of the pools,
+            preferably a ``port_scanner.portset.PortSet``.
+
+    Keyword Args:
+        seed: Seed for the chunker's random choices. If ``None``, chunks are
+            not reproducible between runs.
 
     Attributes:
-        fist_class_pool: A pool of very popular ports
+        tier_pools: A pool of the ports of each rank tier in ``TIER_PORTS``,
+            most often open tier first, drawn before the main pool.
+        fist_class_pool: The first tier pool: the most popular ports
             that a scanner would want to check first.
-        second_class_pool: A pool of popular ports
+        second_class_pool: The second tier pool: popular ports
             that a scanner would want to check early in the process.
-        main_pool: A pool of ports that aren't first class or second class.
+        main_pool: A pool of ports that aren't in any rank tier.
 
     """
-    def __init__(self, port_list):
+    def __init__(self, port_list, seed=None):
+        self.random = random.Random(seed)
         port_pool = validate_port_list(port_list)
 
-        self.first_class_pool = port_set_intersection(port_pool, FIRST_CLASS_PORTS)
-        port_pool -= self.first_class_pool
-
-        self.second_class_pool = port_set_intersection(port_pool, SECOND_CLASS_PORTS)
-        port_pool -= self.second_class_pool
+        self.tier_pools = []
+        for tier_ports in TIER_PORTS:
+            tier_pool = port_set_intersection(port_pool, tier_ports)
+            port_pool -= tier_pool
+            self.tier_pools.append(tier_pool)
 
+        self.first_class_pool = self.tier_pools[0]
+        self.second_class_pool = self.tier_pools[1]
         self.main_pool = port_pool
 
+    def draw_main(self, size):
+        """Draw up to ``size`` ports from the main pool.
+        """
+        return draw_from_pool(self.main_pool, size, self.random)
+
+    def main_pool_is_empty(self):
+        return port_pool_is_empty(self.main_pool)
+
     def get_chunk(self,
                   lower_bound=CHUNK_SIZE_LOWER_LIMIT,
                   upper_bound=CHUNK_SIZE_UPPER_LIMIT):
@@ -148,7 +263,7 @@ class PortChunker(object):
 
         Args:
             lower_bound: The suggested lower bound on the size of a chunk from the main pool.
-                Also the suggested upper bound on a chunk drawing from a first or second-class pool.
+                Also the upper bound on a chunk drawing from a tier pool.
             upper_bound: The hard upper bound on the size of any chunk returned.
 
         Returns:
@@ -157,26 +272,59 @@ class PortChunker(object):
         if not bounds_are_valid(lower_bound, upper_bound):
             raise ChunkBoundsError(lower_bound, upper_bound)
 
-        # first class ports get chunks all to themselves
-        if not port_pool_is_empty(self.first_class_pool):
-            # drawing size from first class pool should be small (at most lower_bound)
-            drawing = draw_from_pool(self.first_class_pool, lower_bound)
+        # tiers get chunks all to themselves, most often open tier first
+        for tier_pool in self.tier_pools:
+            if not port_pool_is_empty(tier_pool):
+                # drawing size from a tier pool should be small (at most lower_bound)
+                drawing = draw_from_pool(tier_pool, lower_bound, self.random)
+                return drawing
+
+        # only get here when every tier is exhausted
+        if not self.main_pool_is_empty():
+            desired_chunk_size = random_chunk_size(lower_bound, upper_bound, self.random)
+            drawing = self.draw_main(desired_chunk_size)
             return drawing
 
-        # second class ports get priority, but can be mixed in with ports from the main pool
-        if not port_pool_is_empty(self.second_class_pool):
-            # drawing size from second class pool should make up at most half of the returned chunk
-            drawing = draw_from_pool(self.second_class_pool, lower_bound / 2 + 1)
-            remaining_size = lower_bound - len(drawing)
 
-            if remaining_size > 0:
-                drawing += draw_from_pool(self.main_pool, remaining_size)
-                random.shuffle(drawing)
+class PermutedPortChunker(PortChunker):
+    """A ``PortChunker`` that walks a ``PortPermutation`` of the main pool
+    instead of sampling and removing from a set on every drawing.
 
-            return drawing
+    Rank tiers keep their priority. The main pool is kept
+    as a sorted array of ports, and each port drawn from it costs constant
+    time, so chunking a full port range is linear in the number of ports.
 
-        # only get here when first and second class ports are exhausted
-        if not port_pool_is_empty(self.main_pool):
-            desired_chunk_size = random_chunk_size(lower_bound, upper_bound)
-            drawing = draw_from_pool(self.main_pool, desired_chunk_size)
-            return drawing
+    Args:
+        port_list(collection): Collection of ports to form the basis of the pools.
+
+    Keyword Args:
+        seed: Seed for the permutation and the chunker's random choices.
+            The same seed and port list always produce the same chunks.
+
+    Attributes:
+        main_ports(array): Sorted ports of the main pool.
+        main_permutation(PortPermutation): The order in which ``main_ports``
+            are drawn.
+    """
+    def __init__(self, port_list, seed=None):
+        super(PermutedPortChunker, self).__init__(port_list, seed)
+
+        # a PortSet iterates in ascending order
+        self.main_ports = array('H', self.main_pool)
+        self.main_pool = None
+        self.main_permutation = PortPermutation(len(self.main_ports),
+                                                self.random.getrandbits(32))
+
+    def draw_main(self, size):
+        drawing = []
+        while len(drawing) < size:
+            index = self.main_permutation.next()
+            if index is None:
+                break
+
+            drawing.append(self.main_ports[index])
+
+        return drawing
+
+    def main_pool_is_empty(self):
+        return self.main_permutation.remaining() == 0
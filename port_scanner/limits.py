@@ -0,0 +1,119 @@
+"""This module provides functions that size a scanner's concurrency to the
+process' limit on open file descriptors (``RLIMIT_NOFILE``), which connect
+scans need one of per probe in flight.
+
+The soft limit is as low as 256 on macOS and 1024 on most Linux systems,
+and can usually be raised up to the hard limit without privileges.
+"""
+import errno
+import os
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+# file descriptors kept free for anything other than probes: standard
+# streams, the reactor, caches, checkpoints, output files and resolvers
+FD_HEADROOM = 32
+
+# macOS refuses soft limits above OPEN_MAX, even with an unlimited hard limit
+OPEN_MAX = 10240
+
+# errors with which the kernel refuses new sockets or connections for lack
+# of resources, which go away as probes in flight are closed
+RESOURCE_ERRORS = frozenset([
+    errno.EMFILE,
+    errno.ENFILE,
+    errno.ENOBUFS,
+    errno.EAGAIN,
+    errno.EADDRNOTAVAIL,
+])
+
+
+def get_fd_limit():
+    """Return the (soft, hard) limits on open file descriptors, with
+    ``None`` for unlimited, or ``None`` if the platform has no such limits.
+    """
+    if resource is None:
+        return None
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        soft = None
+    if hard == resource.RLIM_INFINITY:
+        hard = None
+
+    return soft, hard
+
+
+def raise_fd_limit(target=None):
+    """Raise the soft limit on open file descriptors as far as the hard limit
+    allows, or to ``target`` if it is lower. The limit is never lowered.
+
+    Returns:
+        The soft limit afterwards, or ``None`` if it is unlimited or the
+        platform has no such limit.
+    """
+    limits = get_fd_limit()
+    if limits is None or limits[0] is None:
+        return None
+
+    soft, hard = limits
+    wanted = hard if hard is not None else OPEN_MAX
+    if target is not None:
+        wanted = min(wanted, target)
+    if wanted <= soft:
+        return soft
+
+    raw_hard = resource.RLIM_INFINITY if hard is None else hard
+    for candidate in (wanted, min(wanted, OPEN_MAX)):
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (candidate, raw_hard))
+        except (ValueError, OSError):
+            continue
+        return candidate
+
+    return soft
+
+
+def count_open_fds():
+    """Return the number of file descriptors the process has open, or
+    ``None`` if the platform doesn't list them.
+    """
+    for fd_dir in ('/proc/self/fd', '/dev/fd'):
+        try:
+            return len(os.listdir(fd_dir))
+        except OSError:
+            continue
+
+    return None
+
+
+def fd_budget(headroom=FD_HEADROOM, raise_limit=False):
+    """Return the number of file descriptors probes may use at once, or
+    ``None`` if there is no limit.
+
+    Keyword Args:
+        headroom(int): The number of file descriptors kept free for
+            anything else, on top of those already open.
+        raise_limit(bool): Whether to raise the soft limit first, as
+            ``raise_fd_limit()`` does.
+    """
+    limits = get_fd_limit()
+    if limits is None:
+        return None
+
+    soft = raise_fd_limit() if raise_limit else limits[0]
+    if soft is None:
+        return None
+
+    return max(soft - (count_open_fds() or 0) - headroom, 1)
+
+
+def is_resource_error(error):
+    """Return whether a ``socket.error`` means that the kernel is out of
+    file descriptors, buffers or local ports for now.
+    """
+    return getattr(error, 'errno', None) in RESOURCE_ERRORS
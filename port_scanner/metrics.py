@@ -0,0 +1,199 @@
+"""This module provides counters and histograms describing where the time
+of a scan goes, and their export as a dictionary or in the Prometheus text
+exposition format.
+
+Metrics are plain attributes updated in place, so that keeping them costs a
+few additions per probe and per reactor wakeup.
+"""
+from bisect import bisect_left
+
+# upper bounds of the round trip time histogram buckets, in seconds
+RTT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# upper bounds of the in-flight depth histogram buckets, in probes
+DEPTH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# prefix of metric names in the Prometheus format
+METRIC_PREFIX = 'portscanner'
+
+# (attribute, help) of the counters of ``ScanMetrics``
+COUNTERS = (
+    ('launched', 'Probes launched.'),
+    ('reaped', 'Probes answered by the remote host.'),
+    ('timed_out', 'Probes that reached their deadline unanswered.'),
+    ('retried', 'Ports queued to be probed again.'),
+    ('resource_errors', 'Launches refused for lack of file descriptors or buffers.'),
+    ('wakeups', 'Returns from waiting on the reactor.'),
+    ('wait_seconds', 'Seconds spent waiting on the reactor.'),
+    ('sleep_seconds', 'Seconds spent sleeping between chunks and for the rate limit.'),
+)
+
+# (attribute, help) of the gauges of ``ScanMetrics``
+GAUGES = (
+    ('in_flight_peak', 'Highest number of probes in flight at once.'),
+)
+
+# (attribute, help) of the histograms of ``ScanMetrics``
+HISTOGRAMS = (
+    ('rtt_seconds', 'Round trip times of answered probes, in seconds.'),
+    ('in_flight', 'Probes in flight at reactor wakeups.'),
+)
+
+
+class Histogram(object):
+    """A histogram of observed values, with fixed buckets.
+
+    Args:
+        buckets(collection): The upper bounds of the buckets. Values above
+            the highest bound are counted in an extra bucket.
+
+    Attributes:
+        counts(list): The number of values in each bucket, not cumulative.
+        sum(float): The sum of observed values.
+        count(int): The number of observed values.
+    """
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        """Return (upper bound, count of values less than or equal to it)
+        tuples, ending with an infinite bound.
+        """
+        cumulative = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            cumulative.append((bound, total))
+
+        return cumulative
+
+    def as_dict(self):
+        return {
+            'buckets': [[bound, count] for bound, count in self.cumulative_counts()[:-1]],
+            'sum': self.sum,
+            'count': self.count,
+        }
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float):
+        return repr(value)
+
+    return str(value)
+
+
+class ScanMetrics(object):
+    """The metrics of a scanner. Counters accumulate over scans until
+    ``reset()`` is called.
+
+    Attributes:
+        launched(int): The number of probes launched.
+        reaped(int): The number of probes answered by the remote host.
+        timed_out(int): The number of probes that reached their deadline.
+        retried(int): The number of ports queued to be probed again.
+        resource_errors(int): The number of probes the kernel refused to
+            launch for lack of file descriptors, buffers or local ports.
+        wakeups(int): The number of returns from waiting on the reactor.
+        wait_seconds(float): The time spent waiting on the reactor, in seconds.
+        sleep_seconds(float): The time spent sleeping between the chunks of
+            ``poll()``, and for the rate limit, in seconds.
+        in_flight_peak(int): The highest number of probes in flight at
+            once, which is the high-water mark of file descriptors used
+            by probes in connect scans.
+        rtt_seconds(Histogram): The round trip times of answered probes.
+        in_flight(Histogram): The number of probes in flight at each
+            reactor wakeup.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        for name, help_text in COUNTERS + GAUGES:
+            setattr(self, name, 0)
+
+        self.wait_seconds = 0.0
+        self.sleep_seconds = 0.0
+        self.rtt_seconds = Histogram(RTT_BUCKETS)
+        self.in_flight = Histogram(DEPTH_BUCKETS)
+
+    def on_launch(self, in_flight):
+        """Count a launched probe, with ``in_flight`` probes now in flight.
+        """
+        self.launched += 1
+        if in_flight > self.in_flight_peak:
+            self.in_flight_peak = in_flight
+
+    def on_wakeup(self, waited, in_flight):
+        """Count a return from waiting ``waited`` seconds on the reactor.
+        """
+        self.wakeups += 1
+        self.wait_seconds += waited
+        self.in_flight.observe(in_flight)
+
+    def on_answer(self, rtt):
+        """Count a probe answered after ``rtt`` seconds, or ``None`` if unknown.
+        """
+        self.reaped += 1
+        if rtt is not None:
+            self.rtt_seconds.observe(rtt)
+
+    def as_dict(self):
+        """Return the metrics as a dictionary of numbers, and of dictionaries
+        with the cumulative ``buckets``, ``sum`` and ``count`` of histograms.
+        """
+        metrics = dict((name, getattr(self, name)) for name, help_text in COUNTERS + GAUGES)
+        for name, help_text in HISTOGRAMS:
+            metrics[name] = getattr(self, name).as_dict()
+
+        return metrics
+
+    def to_prometheus(self, prefix=METRIC_PREFIX, labels=None):
+        """Return the metrics in the Prometheus text exposition format.
+
+        Keyword Args:
+            prefix(str): The prefix of metric names.
+            labels(dict): Labels added to every sample.
+        """
+        label_pairs = sorted((labels or {}).items())
+
+        def sample(name, value, extra=()):
+            pairs = label_pairs + list(extra)
+            label_text = ''
+            if pairs:
+                label_text = '{%s}' % ','.join('%s="%s"' % (key, val) for key, val in pairs)
+            return '%s%s %s' % (name, label_text, format_value(value))
+
+        lines = []
+        for name, help_text in COUNTERS:
+            metric = '%s_%s_total' % (prefix, name)
+            lines.extend(['# HELP %s %s' % (metric, help_text),
+                          '# TYPE %s counter' % metric,
+                          sample(metric, getattr(self, name))])
+
+        for name, help_text in GAUGES:
+            metric = '%s_%s' % (prefix, name)
+            lines.extend(['# HELP %s %s' % (metric, help_text),
+                          '# TYPE %s gauge' % metric,
+                          sample(metric, getattr(self, name))])
+
+        for name, help_text in HISTOGRAMS:
+            metric = '%s_%s' % (prefix, name)
+            histogram = getattr(self, name)
+            lines.extend(['# HELP %s %s' % (metric, help_text),
+                          '# TYPE %s histogram' % metric])
+            for bound, count in histogram.cumulative_counts():
+                lines.append(sample(metric + '_bucket', count, [('le', format_value(bound))]))
+            lines.append(sample(metric + '_sum', histogram.sum))
+            lines.append(sample(metric + '_count', histogram.count))
+
+        return '\n'.join(lines) + '\n'
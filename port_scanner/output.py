@@ -0,0 +1,229 @@
+"""This module provides writers that stream scan results to a file in
+machine-readable formats: JSON Lines, CSV, and a packed fixed-width binary
+format that can be read back with ``read_binary()``.
+
+Records are encoded as they arrive, and written to the underlying file in
+batches.
+"""
+import csv
+import json
+import math
+import socket
+import struct
+
+from port_scanner.values import RESULT_NAMES
+
+# number of records buffered before they are written out
+BATCH_SIZE = 1024
+
+# binary format: a magic header followed by fixed-width records of
+# (IPv6 or IPv4-mapped address, port, result, padding, rtt or NaN)
+BINARY_MAGIC = b'PSR1'
+BINARY_RECORD = struct.Struct('!16sHBxf')
+
+IPV4_MAPPED_PREFIX = b'\x00' * 10 + b'\xff\xff'
+
+
+class UnknownFormatError(Exception):
+    def __init__(self, output_format):
+        self.message = '%s is not a known output format' % output_format
+
+
+class InvalidBinaryError(Exception):
+    def __init__(self):
+        self.message = 'Not a binary results file'
+
+
+def pack_address(address):
+    """Pack an IPv4 or IPv6 address into 16 bytes.
+    IPv4 addresses are packed as IPv4-mapped IPv6 addresses.
+    """
+    if ':' in address:
+        return socket.inet_pton(socket.AF_INET6, address)
+
+    return IPV4_MAPPED_PREFIX + socket.inet_aton(address)
+
+
+def unpack_address(packed):
+    if packed.startswith(IPV4_MAPPED_PREFIX):
+        return socket.inet_ntoa(packed[len(IPV4_MAPPED_PREFIX):])
+
+    return socket.inet_ntop(socket.AF_INET6, packed)
+
+
+class ResultWriter(object):
+    """Base class for writers. Subclasses implement ``encode()``.
+
+    Args:
+        stream(file): The file to write to. It isn't closed by the writer.
+
+    Keyword Args:
+        batch_size(int): The number of records buffered before they are
+            written out.
+
+    Attributes:
+        count(int): The number of records written so far.
+    """
+    empty = ''
+
+    def __init__(self, stream, batch_size=BATCH_SIZE):
+        self.stream = stream
+        self.batch_size = batch_size
+        self.buffer = []
+        self.count = 0
+        self.start()
+
+    def start(self):
+        """Buffer anything that comes before the records.
+        """
+        pass
+
+    def encode(self, address, port, result, rtt):
+        """Return a record, encoded.
+        """
+        raise NotImplementedError
+
+    def write(self, address, port, result, rtt=None):
+        """Buffer a record, and write out the buffer if it is full.
+        """
+        self.buffer.append(self.encode(address, port, result, rtt))
+        self.count += 1
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def on_result(self, key, result, rtt):
+        """Adapter for the ``on_result`` hook of a
+        ``port_scanner.scanner.MultiPortScanner``.
+        """
+        address, port = key
+        self.write(address, port, result, rtt)
+
+    def flush(self):
+        if self.buffer:
+            self.stream.write(self.empty.join(self.buffer))
+            del self.buffer[:]
+
+        self.stream.flush()
+
+    def close(self):
+        """Write out what is left in the buffer.
+        """
+        self.flush()
+
+
+class JsonLinesWriter(ResultWriter):
+    """Writes one JSON object per line, with
+    ``address``, ``port``, ``status`` and ``rtt`` keys.
+    """
+    def encode(self, address, port, result, rtt):
+        record = {'address': address, 'port': port,
+                  'status': RESULT_NAMES[result], 'rtt': rtt}
+        return json.dumps(record, separators=(',', ':'), sort_keys=True) + '\n'
+
+
+class RowBuffer(object):
+    """File-like object keeping the last row written by a ``csv.writer``.
+    """
+    def __init__(self):
+        self.row = None
+
+    def write(self, row):
+        self.row = row
+
+
+class CsvWriter(ResultWriter):
+    """Writes a header row, then one ``address,port,status,rtt`` row per record.
+    """
+    def start(self):
+        self.row_buffer = RowBuffer()
+        self.rows = csv.writer(self.row_buffer, lineterminator='\n')
+        self.buffer.append(self.encode_row(['address', 'port', 'status', 'rtt']))
+
+    def encode_row(self, row):
+        self.rows.writerow(row)
+        return self.row_buffer.row
+
+    def encode(self, address, port, result, rtt):
+        return self.encode_row([address, port, RESULT_NAMES[result],
+                                '' if rtt is None else '%.6f' % rtt])
+
+
+class BinaryWriter(ResultWriter):
+    """Writes ``BINARY_MAGIC``, then one ``BINARY_RECORD`` per record.
+    The stream must be opened in binary mode.
+    """
+    empty = b''
+
+    def start(self):
+        self.buffer.append(BINARY_MAGIC)
+
+    def encode(self, address, port, result, rtt):
+        return BINARY_RECORD.pack(pack_address(address), port, result,
+                                  float('nan') if rtt is None else rtt)
+
+
+def read_exactly(stream, size):
+    """Read ``size`` bytes from a stream, or fewer if it ends first, even
+    if reads return short, as on pipes and sockets.
+    """
+    data = b''
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+
+    return data
+
+
+def read_binary(stream):
+    """Generate (address, port, result, rtt) tuples from a file written by
+    a ``BinaryWriter``. rtt is ``None`` for ports that didn't answer.
+
+    Raises:
+        InvalidBinaryError: If the file doesn't start with ``BINARY_MAGIC``.
+    """
+    if read_exactly(stream, len(BINARY_MAGIC)) != BINARY_MAGIC:
+        raise InvalidBinaryError()
+
+    size = BINARY_RECORD.size
+    leftover = b''
+    while True:
+        data = stream.read(size * BATCH_SIZE)
+        if not data:
+            # a truncated last record is ignored
+            break
+
+        # a record split between reads is completed by the next one
+        batch = leftover + data
+        end = len(batch) - len(batch) % size
+        for offset in range(0, end, size):
+            packed, port, result, rtt = BINARY_RECORD.unpack_from(batch, offset)
+            yield unpack_address(packed), port, result, None if math.isnan(rtt) else rtt
+
+        leftover = batch[end:]
+
+
+OUTPUT_FORMATS = {
+    'jsonl': JsonLinesWriter,
+    'csv': CsvWriter,
+    'bin': BinaryWriter,
+}
+
+
+def create_writer(output_format, stream, batch_size=BATCH_SIZE):
+    """Writer factory.
+
+    Args:
+        output_format(str): One of ``'jsonl'``, ``'csv'`` or ``'bin'``.
+        stream(file): The file to write to.
+
+    Raises:
+        UnknownFormatError: If the format is unknown.
+    """
+    try:
+        writer_class = OUTPUT_FORMATS[output_format]
+    except KeyError:
+        raise UnknownFormatError(output_format)
+
+    return writer_class(stream, batch_size)
@@ -0,0 +1,290 @@
+"""This module provides a class ``PortSet``: a set of port numbers backed by
+a 65536-bit bitmap, so that its size in memory doesn't depend on the number
+of ports it holds.
+
+Set operations between ``PortSet``s work on the whole bitmap at once, and
+ranges of ports are added a byte at a time.
+"""
+import binascii
+import random
+
+# port numbers a ``PortSet`` can hold are 0 .. PORT_COUNT - 1
+PORT_COUNT = 65536
+
+BITMAP_SIZE = PORT_COUNT // 8
+
+EMPTY_BITMAP = bytes(bytearray(BITMAP_SIZE))
+
+# number of set bits of every byte value
+POPCOUNT_TABLE = bytes(bytearray(bin(value).count('1') for value in range(256)))
+
+# positions of the set bits of every byte value
+BIT_POSITIONS = [tuple(bit for bit in range(8) if value & (1 << bit)) for value in range(256)]
+
+
+class InvalidPortSpecError(Exception):
+    def __init__(self, message):
+        self.message = message
+
+
+class PortSet(object):
+    """A set of port numbers.
+
+    Args:
+        ports(iterable): The initial ports of the set. Numbers outside of
+            ``0 .. 65535`` are ignored.
+
+    Attributes:
+        bits(bytearray): The bitmap of the set. Port ``n`` is bit ``n % 8``
+            of byte ``n // 8``.
+    """
+    __hash__ = None
+
+    def __init__(self, ports=()):
+        if isinstance(ports, PortSet):
+            self.bits = bytearray(ports.bits)
+            return
+
+        self.bits = bytearray(BITMAP_SIZE)
+        for port in ports:
+            if 0 <= port < PORT_COUNT:
+                self.bits[port >> 3] |= 1 << (port & 7)
+
+    @classmethod
+    def from_bitmap(cls, bitmap):
+        """Return a set from a ``BITMAP_SIZE`` bytes bitmap laid out as ``bits``.
+        """
+        port_set = cls()
+        port_set.bits[:] = bytearray(bitmap)
+        return port_set
+
+    @classmethod
+    def from_range(cls, lower, upper):
+        """Return the set of ports from ``lower`` to ``upper`` inclusive.
+        """
+        port_set = cls()
+        port_set.add_range(lower, upper)
+        return port_set
+
+    @classmethod
+    def from_string(cls, port_string):
+        """Return the set of ports of a comma- and hyphen-separated string,
+        e.g. ``'1,2-8,9,10-20'``. Numbers outside of ``0 .. 65535`` are ignored.
+
+        Raises:
+            InvalidPortSpecError: If the string uses invalid syntax,
+                or a range is reversed.
+        """
+        port_set = cls()
+        for section in port_string.split(','):
+            if '-' not in section:
+                try:
+                    port = int(section)
+                except ValueError:
+                    raise InvalidPortSpecError('%s uses invalid syntax for port list.' % section)
+
+                if 0 <= port < PORT_COUNT:
+                    port_set.add(port)
+                continue
+
+            lower_and_upper = section.split('-')
+            try:
+                lower = int(lower_and_upper[0])
+                upper = int(lower_and_upper[1])
+            except (IndexError, ValueError):
+                raise InvalidPortSpecError('%s uses invalid syntax for port list.' % section)
+
+            if lower > upper:
+                raise InvalidPortSpecError('Section %s is an invalid range.' % section)
+
+            port_set.add_range(lower, upper)
+
+        return port_set
+
+    def to_int(self):
+        return int(binascii.hexlify(bytes(self.bits)), 16)
+
+    @classmethod
+    def from_int(cls, value):
+        port_set = cls()
+        port_set.bits[:] = bytearray(binascii.unhexlify('%0*x' % (BITMAP_SIZE * 2, value)))
+        return port_set
+
+    def add(self, port):
+        """Add a port to the set.
+
+        Raises:
+            ValueError: If the port number is outside of ``0 .. 65535``.
+        """
+        if not 0 <= port < PORT_COUNT:
+            raise ValueError('%d is not a port number' % port)
+
+        self.bits[port >> 3] |= 1 << (port & 7)
+
+    def add_range(self, lower, upper):
+        """Add the ports from ``lower`` to ``upper`` inclusive, clipped to
+        ``0 .. 65535``.
+        """
+        lower = max(lower, 0)
+        upper = min(upper, PORT_COUNT - 1)
+        if lower > upper:
+            return
+
+        # whole bytes are filled at once, partial ones a port at a time
+        while lower <= upper and lower & 7:
+            self.add(lower)
+            lower += 1
+        while upper >= lower and (upper + 1) & 7:
+            self.add(upper)
+            upper -= 1
+
+        if lower <= upper:
+            self.bits[lower >> 3:(upper >> 3) + 1] = b'\xff' * ((upper - lower + 1) >> 3)
+
+    def remove(self, port):
+        """Remove a port from the set.
+
+        Raises:
+            KeyError: If the port isn't in the set.
+        """
+        if port not in self:
+            raise KeyError(port)
+
+        self.bits[port >> 3] &= ~(1 << (port & 7)) & 0xff
+
+    def discard(self, port):
+        if port in self:
+            self.remove(port)
+
+    def copy(self):
+        return PortSet(self)
+
+    def union(self, other):
+        return PortSet.from_int(self.to_int() | as_port_set(other).to_int())
+
+    def intersection(self, other):
+        return PortSet.from_int(self.to_int() & as_port_set(other).to_int())
+
+    def difference(self, other):
+        return PortSet.from_int(self.to_int() & ~as_port_set(other).to_int())
+
+    def bounds(self):
+        """Return the lowest and highest ports of the set, or ``None`` if it is empty.
+        """
+        if not self:
+            return None
+
+        first = BITMAP_SIZE - len(self.bits.lstrip(b'\x00'))
+        last = len(self.bits.rstrip(b'\x00')) - 1
+        return ((first << 3) + BIT_POSITIONS[self.bits[first]][0],
+                (last << 3) + BIT_POSITIONS[self.bits[last]][-1])
+
+    def sample(self, size, rng=random):
+        """Return a list of ``size`` distinct ports of the set chosen at random,
+        or all of them if the set is smaller.
+
+        Keyword Args:
+            rng: Source of randomness. Defaults to the ``random`` module.
+        """
+        count = len(self)
+        size = max(min(size, count), 0)
+        if not size:
+            return []
+
+        lower, upper = self.bounds()
+        expected_draws = size * (upper - lower + 1) // count
+        if size * 2 > count or expected_draws > BITMAP_SIZE + count:
+            # very sparse sets and large samples: sample from the list of ports
+            return rng.sample(list(self), size)
+
+        # draw ports in the bounds until enough are in the set
+        drawing = []
+        drawn = set()
+        while len(drawing) < size:
+            port = rng.randint(lower, upper)
+            if port in self and port not in drawn:
+                drawn.add(port)
+                drawing.append(port)
+
+        return drawing
+
+    def intervals(self):
+        """Generate the (lower, upper) inclusive ranges of ports in the set, in order.
+        """
+        start = previous = None
+        for port in self:
+            if previous is None or port != previous + 1:
+                if start is not None:
+                    yield start, previous
+                start = port
+            previous = port
+
+        if start is not None:
+            yield start, previous
+
+    def to_string(self):
+        """Return the set as a string that ``from_string()`` accepts.
+        """
+        return ','.join(str(lower) if lower == upper else '%d-%d' % (lower, upper)
+                        for lower, upper in self.intervals())
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def __ior__(self, other):
+        self.bits[:] = self.union(other).bits
+        return self
+
+    def __iand__(self, other):
+        self.bits[:] = self.intersection(other).bits
+        return self
+
+    def __isub__(self, other):
+        self.bits[:] = self.difference(other).bits
+        return self
+
+    def __contains__(self, port):
+        return 0 <= port < PORT_COUNT and bool(self.bits[port >> 3] & (1 << (port & 7)))
+
+    def __iter__(self):
+        """Generate the ports of the set in ascending order.
+        """
+        for index, byte in enumerate(self.bits):
+            if byte:
+                base = index << 3
+                for bit in BIT_POSITIONS[byte]:
+                    yield base | bit
+
+    def __len__(self):
+        return sum(bytearray(self.bits.translate(POPCOUNT_TABLE)))
+
+    def __bool__(self):
+        return self.bits != EMPTY_BITMAP
+
+    __nonzero__ = __bool__
+
+    def __eq__(self, other):
+        if isinstance(other, PortSet):
+            return self.bits == other.bits
+
+        try:
+            return set(self) == set(other)
+        except TypeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __repr__(self):
+        return 'PortSet(%r)' % self.to_string()
+
+
+def as_port_set(ports):
+    """Return ``ports`` if it is a ``PortSet``, or a new ``PortSet`` of its ports.
+    """
+    if isinstance(ports, PortSet):
+        return ports
+
+    return PortSet(ports)
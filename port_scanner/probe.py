@@ -1,17 +1,23 @@
 """This module provides functions and a class ``PortProbe`` to connect
 over a single TCP socket on a specified port, and determine the status of the
-port on the host on the otherside.
+port on the host on the otherside, as well as a class ``ProbeTable`` to keep
+track of probes in flight.
 """
 import socket
 import struct
 import os
+from array import array
 
 from errno import EALREADY, EINPROGRESS, EWOULDBLOCK, EINVAL, \
      ENOTCONN, EISCONN, EBADF,  \
      ETIMEDOUT, ECONNREFUSED, errorcode
 
+from port_scanner.timing import monotonic
 from port_scanner.values import RESULT_CLOSED, RESULT_FILTERED, RESULT_OPEN, RESULT_UNKNOWN
 
+# initial number of slots of a ``ProbeTable``
+PROBE_TABLE_SIZE = 1024
+
 
 def connect(sock, address):
     """Asynchronously connect over a provided TCP socket.
@@ -33,10 +39,19 @@ def connect(sock, address):
         raise socket.error(err, errorcode[err])
 
 
-def create_tcp_socket():
+def address_family(ip_addr):
+    """Return the address family of an IPv4 or IPv6 address.
+    """
+    return socket.AF_INET6 if ':' in ip_addr else socket.AF_INET
+
+
+def create_tcp_socket(family=socket.AF_INET):
     """TCP socket factory.
+
+    Keyword Args:
+        family(int): ``socket.AF_INET`` or ``socket.AF_INET6``.
     """
-    return socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    return socket.socket(family, socket.SOCK_STREAM)
 
 
 def setup_tcp_socket(sock):
@@ -55,33 +70,73 @@ class PortProbe(object):
     the port on the other side.
 
     Args:
-        ip_addr(str): IP address of host to connect to. If a hostname is given
-            instead of an IP address, behavior is undefined.
+        ip_addr(str): IPv4 or IPv6 address of host to connect to. If a hostname
+            is given instead of an IP address, behavior is undefined.
         port(int): Port to connect to.
 
     Attributes:
         file_no(int): The file descriptor of the associated socket.
+        address(str): The remote IP address of the associated socket.
         port(int): The remote port of the associated socket.
+        start_time(float): The time at which the connection was initiated.
+        reap_time(float): The time at which the status of the port
+            was determined, or ``None`` until then.
     """
+    __slots__ = ('socket', 'file_no', 'address', 'port', 'result',
+                 'start_time', 'reap_time')
 
     def __init__(self, ip_addr, port):
-        self.socket = create_tcp_socket()
+        self.socket = create_tcp_socket(address_family(ip_addr))
         setup_tcp_socket(self.socket)
-        connect(self.socket, (ip_addr, port))
+        self.start_time = monotonic()
+        try:
+            connect(self.socket, (ip_addr, port))
+        except socket.error:
+            self.socket.close()
+            raise
 
         self.file_no = self.socket.fileno()
+        self.address = ip_addr
         self.port = port
         self.result = RESULT_UNKNOWN
+        self.reap_time = None
 
     def close(self):
-        self.socket.close()
-
-    def analyze(self):
+        if self.socket is not None:
+            self.socket.close()
+
+    def detach(self):
+        """Return the probe's socket, which closing the probe no longer closes.
+        """
+        sock, self.socket = self.socket, None
+        return sock
+
+    def rtt(self):
+        """Return the time it took the remote host to answer,
+        or ``None`` if it didn't.
+        """
+        if self.reap_time is None or self.result not in (RESULT_OPEN, RESULT_CLOSED):
+            return None
+
+        return self.reap_time - self.start_time
+
+    def analyze(self, verify=True):
+        """Determine the status of the port.
+
+        Keyword Args:
+            verify(bool): Whether to check that the socket is actually
+                connected when it reports no error. This costs a second
+                system call, and can be skipped when the socket was reported
+                writable by ``select``, ``poll`` or ``epoll``.
+        """
         if self.result is not RESULT_UNKNOWN:
             return self.result
 
         err = self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
-        if err == 0:
+        if err == 0 and not verify:
+            self.result = RESULT_OPEN
+
+        elif err == 0:
             try:
                 self.socket.getpeername()
             except socket.error as se:
@@ -100,4 +155,91 @@ class PortProbe(object):
         elif err == ECONNREFUSED:
             self.result = RESULT_CLOSED
 
+        if self.result is not RESULT_UNKNOWN:
+            self.reap_time = monotonic()
+
         return self.result
+
+
+class ProbeTable(object):
+    """A table of probes in flight, indexed by file descriptor.
+
+    Slots are preallocated and reused along with the file descriptors, so
+    adding and removing probes doesn't allocate. The table only grows, by
+    doubling, when a file descriptor beyond its size shows up.
+
+    Keyword Args:
+        size(int): The initial number of slots.
+
+    Attributes:
+        probes(list): The probe in each slot, or ``None``.
+        deadlines(array): The deadline of the probe in each slot.
+    """
+    def __init__(self, size=PROBE_TABLE_SIZE):
+        size = max(size, 1)
+        self.probes = [None] * size
+        self.deadlines = array('d', [0.0]) * size
+        self.count = 0
+
+    def grow(self, fd):
+        size = len(self.probes)
+        while size <= fd:
+            size *= 2
+
+        extra = size - len(self.probes)
+        self.probes.extend([None] * extra)
+        self.deadlines.extend(array('d', [0.0]) * extra)
+
+    def add(self, probe, deadline):
+        """Put a probe in the slot of its file descriptor.
+        """
+        fd = probe.file_no
+        if fd >= len(self.probes):
+            self.grow(fd)
+
+        if self.probes[fd] is None:
+            self.count += 1
+
+        self.probes[fd] = probe
+        self.deadlines[fd] = deadline
+
+    def get(self, fd):
+        """Return the probe of a file descriptor, or ``None``.
+        """
+        if 0 <= fd < len(self.probes):
+            return self.probes[fd]
+
+        return None
+
+    def pop(self, fd):
+        """Remove and return the probe of a file descriptor, or ``None``.
+        """
+        probe = self.get(fd)
+        if probe is not None:
+            self.probes[fd] = None
+            self.count -= 1
+
+        return probe
+
+    def is_due(self, fd, deadline):
+        """Whether the slot of a file descriptor holds a probe with
+        the given deadline.
+        """
+        return self.get(fd) is not None and self.deadlines[fd] == deadline
+
+    def clear(self):
+        for fd in self:
+            self.probes[fd] = None
+
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, fd):
+        return self.get(fd) is not None
+
+    def __iter__(self):
+        """Iterate over the file descriptors of the probes in the table.
+        """
+        return iter([fd for fd, probe in enumerate(self.probes) if probe is not None])
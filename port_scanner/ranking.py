@@ -0,0 +1,106 @@
+"""This module provides a table ranking all TCP ports, most commonly open
+first, and functions to look ports up in it.
+
+The ports listed in ``data/common-ports``, a file bundled with the package,
+come first, in its order: nmap's top ports, followed by ports of common
+services. Every other port follows by IANA range: the rest of the
+well-known ports, then the registered ports, then the dynamic ports, each
+in ascending order. Only the listed ports are ranked by how often they are
+open; ``top_ports()`` doesn't go beyond them. The table is computed once,
+on import, as arrays of unsigned shorts::
+
+    ports = top_ports(100)
+    port_rank(443)
+"""
+import pkgutil
+from array import array
+
+from port_scanner.portset import PortSet, PORT_COUNT
+
+# path of the bundled list of common ports, relative to the package
+COMMON_PORTS_PATH = 'data/common-ports'
+
+# (lower, upper) inclusive bounds of the well-known, registered and dynamic
+# port ranges, in the order ports that aren't listed are ranked in
+PORT_RANGES = ((1, 1023), (1024, 49151), (49152, 65535))
+
+
+def parse_common_ports(lines):
+    """Return the TCP ports listed in ``lines``, in order and without
+    repeats. Each line holds a service name and a port/protocol pair;
+    comments and other protocols are skipped.
+    """
+    ports = []
+    seen = set()
+    for line in lines:
+        fields = line.split('#', 1)[0].split()
+        if len(fields) < 2:
+            continue
+
+        port, _, protocol = fields[1].partition('/')
+        port = int(port)
+        if protocol == 'tcp' and port not in seen:
+            seen.add(port)
+            ports.append(port)
+
+    return ports
+
+
+def load_common_ports():
+    """Return the bundled common ports, as parsed by ``parse_common_ports()``.
+    """
+    data = pkgutil.get_data('port_scanner', COMMON_PORTS_PATH)
+    return parse_common_ports(data.decode('ascii').splitlines())
+
+
+def build_ranking(head):
+    """Return an array of every port, ``head`` first and the others by
+    ``PORT_RANGES``.
+    """
+    ranked = array('H', head)
+    listed = set(head)
+    for lower, upper in PORT_RANGES:
+        ranked.extend(port for port in range(lower, upper + 1) if port not in listed)
+
+    return ranked
+
+
+def build_ranks(ranked):
+    """Return an array of the rank of every port in ``ranked``, indexed by
+    port number.
+    """
+    ranks = array('H', [0]) * PORT_COUNT
+    for rank, port in enumerate(ranked):
+        ranks[port] = rank
+
+    return ranks
+
+
+# ports most commonly found open, most common first
+COMMON_PORTS = tuple(load_common_ports())
+
+# every port, the common ports first
+RANKED_PORTS = build_ranking(COMMON_PORTS)
+
+# rank of every port, indexed by port number; port 0 has no rank
+PORT_RANKS = build_ranks(RANKED_PORTS)
+
+
+def port_rank(port):
+    """Return the rank of a port, from 0 for the most commonly open port.
+    """
+    return PORT_RANKS[port]
+
+
+def ranked_slice(start, stop=None):
+    """Return a ``PortSet`` of the ports ranked from ``start`` to ``stop``,
+    exclusive, or to the last port.
+    """
+    return PortSet(RANKED_PORTS[start:stop])
+
+
+def top_ports(count):
+    """Return a ``PortSet`` of the ``count`` most commonly open ports, or
+    of all of the ``COMMON_PORTS`` if ``count`` is larger.
+    """
+    return ranked_slice(0, min(max(count, 0), len(COMMON_PORTS)))
@@ -0,0 +1,215 @@
+"""This module provides reactors: objects that keep a persistent registration
+of file descriptors and report which of them are ready for I/O.
+
+``EpollReactor`` and ``PollReactor`` have no limit on the number or value of
+registered file descriptors, and their cost per wakeup doesn't depend on
+rebuilding a descriptor set. ``SelectReactor`` is kept as a portable fallback,
+and is limited to ``FD_SETSIZE`` descriptors.
+"""
+import select
+
+# Events a file descriptor can be registered for
+EVENT_READ = 1
+EVENT_WRITE = 2
+
+# select.select can't handle file descriptors at or above this value
+FD_SETSIZE = 1024
+
+
+class UnknownBackendError(Exception):
+    def __init__(self, backend):
+        self.message = '%s is not an available reactor backend' % backend
+
+
+class Reactor(object):
+    """Base class for reactors.
+
+    Attributes:
+        capacity(int): The maximum number of file descriptors the reactor can
+            watch at once, or ``None`` if there is no limit.
+    """
+    capacity = None
+
+    def __init__(self):
+        self.registered = {}
+
+    def register(self, fd, events=EVENT_WRITE):
+        """Start watching a file descriptor for the given events.
+        """
+        self.registered[fd] = events
+
+    def modify(self, fd, events):
+        """Change the events a registered file descriptor is watched for.
+        """
+        self.registered[fd] = events
+
+    def unregister(self, fd):
+        """Stop watching a file descriptor. Unknown file descriptors are ignored.
+        """
+        self.registered.pop(fd, None)
+
+    def poll(self, timeout):
+        """Wait up to ``timeout`` seconds for registered file descriptors
+        to become ready.
+
+        Returns:
+            A list of (fd, events) tuples for the ready file descriptors.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        self.registered.clear()
+
+    def __len__(self):
+        return len(self.registered)
+
+    def __contains__(self, fd):
+        return fd in self.registered
+
+
+class SelectReactor(Reactor):
+    """Reactor backed by ``select.select``.
+    """
+    capacity = FD_SETSIZE
+
+    def poll(self, timeout):
+        r = [fd for fd, events in self.registered.items() if events & EVENT_READ]
+        w = [fd for fd, events in self.registered.items() if events & EVENT_WRITE]
+
+        # failed connects are reported in the exceptional set on some platforms
+        r2, w2, e2 = select.select(r, w, w, timeout)
+
+        ready = {}
+        for fd in r2:
+            ready[fd] = ready.get(fd, 0) | EVENT_READ
+        for fd in w2:
+            ready[fd] = ready.get(fd, 0) | EVENT_WRITE
+        for fd in e2:
+            ready[fd] = ready.get(fd, 0) | EVENT_WRITE
+
+        return list(ready.items())
+
+
+class PollReactor(Reactor):
+    """Reactor backed by ``select.poll``.
+    """
+    poller_factory = staticmethod(getattr(select, 'poll', None))
+    read_mask = getattr(select, 'POLLIN', 0) | getattr(select, 'POLLPRI', 0)
+    write_mask = getattr(select, 'POLLOUT', 0)
+    error_mask = getattr(select, 'POLLERR', 0) | getattr(select, 'POLLHUP', 0)
+
+    def __init__(self):
+        super(PollReactor, self).__init__()
+        self.poller = self.poller_factory()
+
+    def to_mask(self, events):
+        mask = 0
+        if events & EVENT_READ:
+            mask |= self.read_mask
+        if events & EVENT_WRITE:
+            mask |= self.write_mask
+
+        return mask
+
+    def register(self, fd, events=EVENT_WRITE):
+        self.poller.register(fd, self.to_mask(events))
+        super(PollReactor, self).register(fd, events)
+
+    def modify(self, fd, events):
+        self.poller.modify(fd, self.to_mask(events))
+        super(PollReactor, self).modify(fd, events)
+
+    def unregister(self, fd):
+        if fd in self.registered:
+            try:
+                self.poller.unregister(fd)
+            except (KeyError, IOError, OSError, ValueError):
+                # already gone, e.g. closed before being unregistered
+                pass
+
+        super(PollReactor, self).unregister(fd)
+
+    def poll(self, timeout):
+        ready = []
+        for fd, mask in self.poller.poll(self.convert_timeout(timeout)):
+            events = 0
+            if mask & (self.read_mask | self.error_mask):
+                events |= EVENT_READ
+            if mask & (self.write_mask | self.error_mask):
+                events |= EVENT_WRITE
+
+            ready.append((fd, events & self.registered.get(fd, 0)))
+
+        return ready
+
+    def convert_timeout(self, timeout):
+        # select.poll takes milliseconds, and None to block
+        if timeout is None:
+            return None
+
+        return max(int(timeout * 1000), 0)
+
+
+class EpollReactor(PollReactor):
+    """Reactor backed by Linux ``select.epoll``.
+    """
+    poller_factory = staticmethod(getattr(select, 'epoll', None))
+    read_mask = getattr(select, 'EPOLLIN', 0) | getattr(select, 'EPOLLPRI', 0)
+    write_mask = getattr(select, 'EPOLLOUT', 0)
+    error_mask = getattr(select, 'EPOLLERR', 0) | getattr(select, 'EPOLLHUP', 0)
+
+    def convert_timeout(self, timeout):
+        # select.epoll takes seconds, and -1 to block
+        if timeout is None:
+            return -1
+
+        return max(timeout, 0.0)
+
+    def close(self):
+        self.poller.close()
+        super(EpollReactor, self).close()
+
+
+REACTOR_BACKENDS = {
+    'epoll': EpollReactor,
+    'poll': PollReactor,
+    'select': SelectReactor,
+}
+
+# order of preference when no backend is requested
+PREFERRED_BACKENDS = ['epoll', 'poll', 'select']
+
+
+def backend_is_available(backend):
+    if backend == 'epoll':
+        return hasattr(select, 'epoll')
+    if backend == 'poll':
+        return hasattr(select, 'poll')
+
+    return backend in REACTOR_BACKENDS
+
+
+def available_backends():
+    """Return the names of the backends usable on this platform,
+    in order of preference.
+    """
+    return [backend for backend in PREFERRED_BACKENDS if backend_is_available(backend)]
+
+
+def create_reactor(backend=None):
+    """Reactor factory.
+
+    Keyword Args:
+        backend(str): One of ``'epoll'``, ``'poll'`` or ``'select'``.
+            If ``None``, the best backend available on the platform is used.
+
+    Raises:
+        UnknownBackendError: If the backend is unknown or unavailable.
+    """
+    if backend is None:
+        backend = available_backends()[0]
+
+    if not backend_is_available(backend):
+        raise UnknownBackendError(backend)
+
+    return REACTOR_BACKENDS[backend]()
@@ -0,0 +1,133 @@
+"""This module provides a class ``Resolver`` that resolves hostnames to IPv4
+and IPv6 addresses with ``socket.getaddrinfo``, many at a time on a pool of
+threads, and caches the answers.
+
+``getaddrinfo`` doesn't expose the time to live of DNS records, so answers
+are cached for a fixed time, and failures for a shorter one.
+"""
+import socket
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+# number of threads resolving hostnames concurrently
+RESOLVER_THREADS = 16
+
+# time for which answers are cached, in seconds
+DNS_TTL = 300.0
+
+# time for which failures to resolve are cached, in seconds
+NEGATIVE_TTL = 30.0
+
+
+def is_ip_address(host):
+    """Return whether a string is a literal IPv4 or IPv6 address.
+    """
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, host.split('%', 1)[0])
+        except (socket.error, ValueError):
+            continue
+        else:
+            return True
+
+    return False
+
+
+def unique_addresses(addr_info):
+    """Return the addresses of ``getaddrinfo`` results without duplicates,
+    IPv4 addresses first and otherwise in order.
+    """
+    addresses = []
+    for family in (socket.AF_INET, socket.AF_INET6):
+        for info in addr_info:
+            address = info[4][0]
+            if info[0] == family and address not in addresses:
+                addresses.append(address)
+
+    return addresses
+
+
+class Resolver(object):
+    """A caching resolver. Instances are safe to share between threads.
+
+    Keyword Args:
+        threads(int): The maximum number of hostnames resolved concurrently.
+        ttl(float): The time for which answers are cached, in seconds.
+        negative_ttl(float): The time for which failures are cached, in seconds.
+
+    Attributes:
+        lookups(int): The number of hostnames actually looked up.
+    """
+    def __init__(self, threads=RESOLVER_THREADS, ttl=DNS_TTL, negative_ttl=NEGATIVE_TTL):
+        self.threads = threads
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.lookups = 0
+
+    def cached(self, host, now):
+        with self.lock:
+            entry = self.cache.get(host)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+
+            self.cache.pop(host, None)
+            return None
+
+    def lookup(self, host):
+        """Return the list of addresses of a hostname or IP address, IPv4
+        addresses first. The list is empty if the hostname doesn't resolve.
+        """
+        if is_ip_address(host):
+            return [host]
+
+        now = time.time()
+        addresses = self.cached(host, now)
+        if addresses is not None:
+            return addresses
+
+        try:
+            addr_info = socket.getaddrinfo(host, None, socket.AF_UNSPEC, socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError):
+            addresses = []
+        else:
+            addresses = unique_addresses(addr_info)
+
+        with self.lock:
+            self.lookups += 1
+            ttl = self.ttl if addresses else self.negative_ttl
+            self.cache[host] = (now + ttl, addresses)
+
+        return addresses
+
+    def resolve_many(self, hosts):
+        """Resolve a collection of hostnames or IP addresses concurrently.
+
+        Returns:
+            A dictionary mapping each host to its list of addresses, as
+            returned by ``lookup()``.
+        """
+        hosts = list(set(hosts))
+        now = time.time()
+        names = [host for host in hosts
+                 if not is_ip_address(host) and self.cached(host, now) is None]
+
+        if len(names) > 1 and self.threads > 1:
+            pool = ThreadPool(min(self.threads, len(names)))
+            try:
+                pool.map(self.lookup, names)
+            finally:
+                pool.close()
+                pool.join()
+
+        return dict((host, self.lookup(host)) for host in hosts)
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+
+# resolver shared by scanners that aren't given one
+DEFAULT_RESOLVER = Resolver()
@@ -1,23 +1,89 @@
-"""This module provides functions and a class ``PortScanner``
-for scanning a collection of ports on a remote host.
+"""This module provides functions and classes ``PortScanner`` and
+``MultiPortScanner`` for scanning a collection of ports on remote hosts.
 """
-import select
-import time
 import socket
+import heapq
+from collections import deque
 
-from port_scanner.values import RESULT_FILTERED
-from port_scanner.probe import PortProbe
-from port_scanner.chunker import PortChunker
+from port_scanner.values import RESULT_OPEN, RESULT_CLOSED, RESULT_FILTERED, RESULT_UNKNOWN
+from port_scanner.probe import PortProbe, ProbeTable, address_family
+from port_scanner.chunker import PermutedPortChunker
+from port_scanner.checkpoint import InvalidCheckpointError
+from port_scanner.limits import fd_budget, is_resource_error, FD_HEADROOM
+from port_scanner.metrics import ScanMetrics
+from port_scanner.reactor import create_reactor, EVENT_READ
+from port_scanner.resolver import DEFAULT_RESOLVER
+from port_scanner.service import ServiceGrabber, SERVICE_WINDOW, BANNER_TIMEOUT
+from port_scanner.syn import SynEngine, SynProbe, SynUnavailableError
+from port_scanner.targets import expand_targets
+from port_scanner.timing import CongestionWindow, RttEstimator, RateLimiter, \
+     SYSTEM_CLOCK, MAX_WINDOW, INITIAL_TIMEOUT, MIN_TIMEOUT, MAX_TIMEOUT
 
 # interval at which to probe chunks of ports together
 INTERVAL_TIME = 0.11
 
+# number of probes ``run()`` starts with in flight at once
+WINDOW_SIZE = 20
+
+# number of times a port that didn't answer is probed again
+MAX_RETRIES = 1
+
+# factor by which the timeout of a probe grows with every retry
+RETRY_BACKOFF = 2.0
+
+# ways of probing ports: full TCP connects, or raw-socket SYNs
+SCAN_TYPES = ('connect', 'syn')
+
+# time after which to try launching probes again, when the kernel refused
+# one for lack of resources while none were in flight
+RESOURCE_RETRY_DELAY = 0.01
+
+# number of times in a row launching is tried again while none are in flight
+# before the kernel's refusal is raised
+MAX_RESOURCE_RETRIES = 100
+
+# ports probed on every host by host discovery: a host that answers any of
+# them, open or closed, is up
+DISCOVERY_PORTS = (80, 443, 22, 445)
+
+# deadline of host discovery probes, in seconds: round trip times aren't
+# known yet, and a host wrongly found down isn't scanned at all
+DISCOVERY_TIMEOUT = 2.0
+
 
 class InvalidHostError(Exception):
     def __init__(self, host):
         self.message = '%s is an invalid host or IP address' % host
 
 
+class UnknownScanTypeError(Exception):
+    def __init__(self, scan_type):
+        self.message = '%s is not a known scan type' % scan_type
+
+
+def resolve_host(host, all_addresses=False, resolver=DEFAULT_RESOLVER):
+    """Return the address of a hostname or IP address in a list, IPv4
+    preferred, or all of its IPv4 and IPv6 addresses if ``all_addresses``
+    is true.
+
+    Raises:
+        InvalidHostError: If hostname doesn't resolve.
+    """
+    return pick_addresses(host, resolver.lookup(host), all_addresses)
+
+
+def pick_addresses(host, addresses, all_addresses=False):
+    """Return the addresses of a host to scan out of those it resolved to.
+
+    Raises:
+        InvalidHostError: If the host didn't resolve to any address.
+    """
+    if not addresses:
+        raise InvalidHostError(host)
+
+    return list(addresses) if all_addresses else addresses[:1]
+
+
 def reverse_port_chunk(port_chunk):
     """Return a port_chunk(list) in reverse order.
     """
@@ -30,32 +96,318 @@ class PortScanner(object):
 
     Args:
         host(str): The hostname or IP address of the remote host. If a hostname
-            is given and it resolves to multiple addresses, only one address is used.
+            is given and it resolves to multiple addresses, only one address is used,
+            unless ``all_addresses`` is true.
             If a hostname is given that doesn't resolve, initialization fails.
         port_list(collection): The collection of port numbers (integers) to scan.
 
+    Keyword Args:
+        chunker_class: The ``port_scanner.chunker.PortChunker`` (sub)class used
+            to split ``port_list`` into chunks. Defaults to ``PermutedPortChunker``.
+        seed: Seed passed to the chunker, to make the scan order reproducible.
+        reactor_backend(str): The ``port_scanner.reactor`` backend used to wait
+            on probes, one of ``'epoll'``, ``'poll'`` or ``'select'``.
+            Defaults to the best backend available on the platform.
+        window(int): The number of probes ``run()`` starts with in flight
+            at once. If ``adaptive`` is false, the number is fixed.
+        max_window(int): The number of probes ``run()`` never has more of in
+            flight at once, if ``adaptive`` is true.
+        adaptive(bool): Whether to adapt the number of probes in flight to
+            the responses and losses observed during a scan.
+        timeout(float): The time after which ``run()`` considers an
+            unanswered probe to be filtered, before round trip times to
+            the host have been measured. Defaults to
+            ``port_scanner.timing.INITIAL_TIMEOUT``.
+        min_timeout(float): The lower clamp of the measured probe timeout.
+        max_timeout(float): The upper clamp of the measured probe timeout.
+        max_retries(int): The number of times a port that timed out, or
+            whose status couldn't be determined, is probed again.
+        retry_backoff(float): The factor by which the timeout of a probe
+            grows with every retry, up to ``max_timeout``.
+        on_result: A callable invoked with (key, result, rtt) as soon as the
+            status of each port is determined, as yielded by ``iter_results()``.
+        checkpoint(Checkpoint): A ``port_scanner.checkpoint.Checkpoint`` the
+            progress of scans is recorded in. Ports it holds a result for
+            are not probed again, and its seed replaces ``seed``.
+        cache(ResultCache): A ``port_scanner.cache.ResultCache`` consulted
+            before a port is probed. Ports with a fresh cached result are not
+            probed, and the results of probed ports are added to it.
+        all_addresses(bool): Whether to scan every IPv4 and IPv6 address a
+            hostname resolves to, rather than a single address.
+        resolver(Resolver): The ``port_scanner.resolver.Resolver`` hostnames
+            are resolved with. Defaults to a resolver shared by all scanners.
+        scan_type(str): ``'connect'`` to probe ports with full TCP connections,
+            or ``'syn'`` to probe them with raw-socket SYNs sent by a
+            ``port_scanner.syn.SynEngine`` (Linux, IPv4 only, requires root
+            or ``CAP_NET_RAW``). ``'syn'`` applies to ``run()`` and
+            ``iter_results()``, ``poll()`` always connects.
+        probe_factory: A callable taking (address, port) and returning a
+            launched probe with the interface of a
+            ``port_scanner.probe.PortProbe``, used for connect scans.
+            Defaults to ``PortProbe``.
+        reactor(Reactor): The reactor probes are registered with, replacing
+            the one ``reactor_backend`` would create. It must report the
+            file descriptors of the probes ``probe_factory`` creates.
+        clock: An object whose ``time()`` and ``sleep()`` the scanner
+            measures and waits with, e.g. a
+            ``port_scanner.simulator.VirtualClock``. Defaults to
+            ``port_scanner.timing.SYSTEM_CLOCK``, which is monotonic.
+        metrics(ScanMetrics): The ``port_scanner.metrics.ScanMetrics`` scans
+            are counted in. Defaults to a new instance.
+        tracer(ProbeTracer): A ``port_scanner.trace.ProbeTracer`` the
+            launch, answer, timeout and retry of every probe, and every
+            reactor wakeup, are recorded in. Nothing is traced if ``None``.
+        rate(float): The maximum number of probes launched per second, over
+            all hosts. No limit if ``None``.
+        rate_limiter(RateLimiter): A ``port_scanner.timing.RateLimiter``
+            shared with other scanners, e.g. running in other threads,
+            replacing ``rate``. It must use the same clock as the scanner.
+        raise_fd_limit(bool): Whether to raise the process' soft limit on
+            open file descriptors as far as its hard limit allows, before
+            sizing the window of connect scans.
+        fd_headroom(int): The number of file descriptors connect scans leave
+            free for anything other than probes.
+        grab_services(bool): Whether to identify the services on open ports
+            while the scan goes on, with a ``port_scanner.service.ServiceGrabber``
+            sharing the instance's reactor. Applies to ``run()`` and
+            ``iter_results()``, which don't end until every open port's
+            session is over.
+        service_window(int): The number of service sessions open at once.
+        service_timeout(float): The time after which a service session is
+            ended.
+        discover(bool): Whether ``run()`` and ``iter_results()`` start with
+            host discovery: the ``discovery_ports`` of every address are
+            probed at once, and addresses that answer none of them, not even
+            with a RST, are left out of the scan and added to ``down_addresses``.
+        discovery_ports(collection): The ports probed by host discovery.
+            The results of those also in ``port_list`` are kept for the scan.
+        discovery_timeout(float): The deadline of host discovery probes,
+            which doesn't adapt to round trip times.
+
     Attributes:
         results_map(dict): A dictionary mapping ports to their status codes
-            populated during a call to ``run()``.
+            populated during a call to ``run()``. If ``all_addresses`` is true
+            and the host resolved to several addresses, it maps (address, port)
+            tuples instead, as with ``MultiPortScanner``.
+        reactor(Reactor): The reactor probes are registered with. It is kept
+            for the lifetime of the scanner.
+        window(int): The hard limit on the number of probes in flight. For
+            connect scans, it is sized to fit the process' limit on open file
+            descriptors, and it shrinks whenever the kernel runs out of file
+            descriptors or buffers during a scan.
+        fd_budget(int): The number of file descriptors connect scans may use
+            for probes, or ``None`` if there is no limit or the probes
+            don't use file descriptors.
+        congestion(CongestionWindow): The adaptive limit on the number of
+            probes in flight, reset by every call to ``run()``.
+            ``None`` if ``adaptive`` is false.
+        rtt_estimators(dict): A dictionary mapping addresses to their
+            ``port_scanner.timing.RttEstimator``, populated during a call
+            to ``run()``.
+        metrics(ScanMetrics): Counters and histograms of the probes,
+            reactor wakeups and waits of the instance's scans.
+        services(dict): A dictionary mapping the ``results_map`` keys of open
+            ports to their ``port_scanner.service.ServiceInfo``, populated
+            during a call to ``run()`` if ``grab_services`` is true.
+        service_grabber(ServiceGrabber): The instance's service grabber, or
+            ``None``.
+        down_addresses(list): The addresses host discovery found down during
+            a call to ``run()``, which were not scanned.
 
     Raises:
         InvalidHostError: If hostname doesn't resolve.
+        InvalidCheckpointError: If an address to scan isn't part of the checkpoint.
+        UnknownScanTypeError: If the scan type is unknown.
+        SynUnavailableError: If ``scan_type`` is ``'syn'`` and SYN scans
+            can't be run.
     """
-    def __init__(self, host, port_list):
-        try:
-            self.address = socket.gethostbyname(host)
-        except socket.gaierror:
-            raise InvalidHostError(host)
+    def __init__(self, host, port_list, chunker_class=PermutedPortChunker, seed=None,
+                 reactor_backend=None, window=WINDOW_SIZE, max_window=MAX_WINDOW,
+                 adaptive=True, timeout=None,
+                 min_timeout=MIN_TIMEOUT, max_timeout=MAX_TIMEOUT,
+                 max_retries=MAX_RETRIES, retry_backoff=RETRY_BACKOFF, on_result=None,
+                 checkpoint=None, cache=None, all_addresses=False,
+                 resolver=DEFAULT_RESOLVER, scan_type='connect', probe_factory=None,
+                 reactor=None, clock=SYSTEM_CLOCK, metrics=None, tracer=None,
+                 rate=None, rate_limiter=None, raise_fd_limit=False,
+                 fd_headroom=FD_HEADROOM, grab_services=False,
+                 service_window=SERVICE_WINDOW, service_timeout=BANNER_TIMEOUT,
+                 discover=False, discovery_ports=DISCOVERY_PORTS,
+                 discovery_timeout=DISCOVERY_TIMEOUT):
+        self.all_addresses = all_addresses
+        self.resolver = resolver
+        self.addresses = self.resolve(host)
+        self.address = self.addresses[0] if self.addresses else None
 
         self.port_list = port_list
+        self.chunker_class = chunker_class
+        self.seed = seed
+        self.checkpoint = checkpoint
+        self.cache = cache
+        if checkpoint is not None:
+            self.seed = checkpoint.seed
+            for address in self.addresses:
+                if address not in checkpoint.addresses:
+                    raise InvalidCheckpointError('%s is not part of the checkpoint' % address)
+
+        self.probe_factory = probe_factory
+        self.clock = clock
+        self.metrics = metrics if metrics is not None else ScanMetrics()
+        self.tracer = tracer
+        if rate_limiter is None and rate is not None:
+            rate_limiter = RateLimiter(rate, clock=clock)
+        self.rate_limiter = rate_limiter
+        self.reactor = reactor if reactor is not None else create_reactor(reactor_backend)
+        self.initial_window = window
+        self.adaptive = adaptive
+        self.window = max_window if adaptive else window
+        if self.reactor.capacity is not None:
+            self.window = min(self.window, self.reactor.capacity)
+
+        self.congestion = None
+
+        if scan_type not in SCAN_TYPES:
+            raise UnknownScanTypeError(scan_type)
+
+        self.scan_type = scan_type
+        self.syn_engine = None
+        if scan_type == 'syn':
+            self.syn_engine = self.create_syn_engine()
+
+        self.fd_budget = None
+        if self.syn_engine is None and probe_factory is None:
+            self.fd_budget = fd_budget(fd_headroom, raise_fd_limit)
+            if self.fd_budget is not None:
+                self.window = min(self.window, self.fd_budget)
+
+        self.services = {}
+        self.service_grabber = None
+        if grab_services:
+            self.service_grabber = ServiceGrabber(self.reactor, clock=clock,
+                                                  window=service_window,
+                                                  timeout=service_timeout,
+                                                  on_service=self.record_service)
+            if self.fd_budget is not None:
+                # sessions take their file descriptors out of the probes' budget
+                self.fd_budget = max(self.fd_budget - self.service_grabber.window, 1)
+                self.window = min(self.window, self.fd_budget)
+
+        self.discover = discover
+        self.discovery_ports = discovery_ports
+        self.discovery_timeout = discovery_timeout
+        self.discovering = False
+        self.discovered = {}
+        self.live_addresses = set()
+        self.down_addresses = []
+
+        self.timeout = timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.on_result = on_result
         self.results_map = {}
+        self.rtt_estimators = {}
+
+        # scheduler state used during ``run()``
+        self.chunkers = deque()
+        self.pending = deque()
+        self.retries = deque()
+        self.finished = deque()
+        self.in_flight = ProbeTable()
+        self.deadlines = []
+        self.attempts = {}
+        self.launch_times = {}
+        self.loss_candidates = {}
+        self.launch_delay = None
+        self.fd_cap = None
+        self.resource_retries = 0
+
+    def resolve(self, host):
+        """Return the list of addresses to scan for the ``host`` argument.
+        """
+        return resolve_host(host, self.all_addresses, self.resolver)
+
+    def result_key(self, address, port):
+        """Return the ``results_map`` key of a port on a scanned address.
+        """
+        if len(self.addresses) > 1:
+            return address, port
+
+        return port
+
+    def launch_probe(self, port, address=None):
+        """Create a ``PortProbe`` for a port on the instance's host,
+        or on ``address`` if it is given.
+        """
+        if address is None:
+            address = self.address
+
+        if self.probe_factory is not None:
+            return self.probe_factory(address, port)
+
+        return PortProbe(address, port)
+
+    def launch_scheduled_probe(self, port, address):
+        """Create a probe launched by ``run()``: a ``SynProbe`` if the
+        instance runs SYN scans, and a ``PortProbe`` otherwise.
+        """
+        if self.syn_engine is not None:
+            return SynProbe(self.syn_engine, address, port)
+
+        return self.launch_probe(port, address)
+
+    def watch(self, probe):
+        """Register a probe launched by ``run()`` with the reactor, if it
+        has a file descriptor of its own.
+        """
+        if self.syn_engine is None:
+            self.reactor.register(probe.file_no)
+
+    def unwatch(self, probe):
+        if self.syn_engine is None:
+            self.reactor.unregister(probe.file_no)
+
+    def cached_result(self, address, port):
+        """Return the result of a port found by host discovery, or its fresh
+        result in the instance's cache, or ``None``.
+        """
+        if self.discovered:
+            discovered = self.discovered.get((address, port))
+            if discovered is not None:
+                return discovered
+
+        if self.cache is None:
+            return None
+
+        return self.cache.lookup(address, port)
+
+    def cache_result(self, address, port, result):
+        """Add the result of a probed port to the instance's cache, if any.
+        """
+        if self.cache is not None:
+            self.cache.store(address, port, result)
+
+    def create_syn_engine(self):
+        """Create the instance's SYN engine, and watch its receive socket.
+
+        Raises:
+            SynUnavailableError: If SYN scans can't be run.
+        """
+        for address in self.addresses:
+            if address_family(address) != socket.AF_INET:
+                raise SynUnavailableError('SYN scans only support IPv4 addresses')
+
+        syn_engine = SynEngine()
+        self.reactor.register(syn_engine.file_no, EVENT_READ)
+        return syn_engine
 
     def launch_probes(self, port_chunk):
         """Launch probes on a given port chunk.
 
         Return a map of underlying file descriptors to ``PortProbe``s.
-        If a result for the port is already in the ``results_map``, a
-        new probe is not created.
+        If a result for the port is already in the ``results_map``, or
+        in the instance's cache, a new probe is not created.
 
         Args:
             port_chunk(list): List of ports to probe at one time.
@@ -66,74 +418,635 @@ class PortScanner(object):
         fd_map = {}
 
         for port in port_chunk:
-            if port not in self.results_map \
-                    or self.results_map[port] == RESULT_FILTERED:
-                probe = PortProbe(self.address, port)
-                fd_map[probe.file_no] = probe
+            if port in self.results_map \
+                    and self.results_map[port] != RESULT_FILTERED:
+                continue
+
+            cached = self.cached_result(self.address, port)
+            if cached is not None:
+                self.results_map[port] = cached
+                continue
+
+            if self.rate_limiter is not None:
+                self.rate_limiter.wait()
+
+            probe = self.launch_probe(port)
+            fd_map[probe.file_no] = probe
+            self.metrics.on_launch(len(fd_map))
+            if self.tracer is not None:
+                self.tracer.launch(self.clock.time(), probe, 1)
 
         return fd_map
 
     def poll(self, port_chunk, timeout):
-        """Launch probes for given port chunk, and check their
-        status with ``select.select``. Populate ``results_map``
+        """Launch probes for given port chunk, register them with the
+        instance's reactor and check their status. Populate ``results_map``
         with results.
 
         Args:
             port_chunk(list): List of ports to poll.
             timeout(float): Amount of total time to spend in this
-                method. Time is either used entirely with calls to
-                ``select.select`` or used sleeping if ``select.select``
-                returns information on all ports in the chunk.
+                method. Time is either used entirely waiting on the
+                reactor or used sleeping if the reactor returns
+                information on all ports in the chunk.
         """
         fd_map = self.launch_probes(port_chunk)
+        for fd in fd_map:
+            self.reactor.register(fd)
 
-        r = {}; e = {}
-        w = set(fd_map.keys())
-
-        while timeout > 0.0 and len(w) > 0:
-            start_time = time.time()
-            r2, w2, e2 = select.select(r, w, e, timeout)
-            timeout -= time.time() - start_time
+        while timeout > 0.0 and len(fd_map) > 0:
+            start_time = self.clock.time()
+            ready = self.reactor.poll(timeout)
+            waited = self.clock.time() - start_time
+            timeout -= waited
+            self.metrics.on_wakeup(waited, len(fd_map))
+            if self.tracer is not None:
+                self.tracer.wakeup(start_time + waited, waited, len(ready))
 
-            for reaped in w2:
-                probe = fd_map[reaped]
+            for reaped, events in ready:
+                probe = fd_map.pop(reaped)
                 self.results_map[probe.port] = probe.analyze()
+                if self.results_map[probe.port] in (RESULT_OPEN, RESULT_CLOSED):
+                    self.metrics.on_answer(probe.rtt())
+                if self.tracer is not None:
+                    self.tracer.finish(self.clock.time(), probe, self.results_map[probe.port])
+                self.cache_result(probe.address, probe.port, self.results_map[probe.port])
 
+                self.reactor.unregister(reaped)
                 probe.close()
-                w.remove(reaped)
 
-        for unreaped in w:
+        for unreaped in fd_map:
             probe = fd_map[unreaped]
             self.results_map[probe.port] = RESULT_FILTERED
+            self.metrics.timed_out += 1
+            if self.tracer is not None:
+                self.tracer.finish(self.clock.time(), probe, RESULT_FILTERED, timed_out=True)
+            self.cache_result(probe.address, probe.port, RESULT_FILTERED)
 
+            self.reactor.unregister(unreaped)
             probe.close()
 
         if timeout > 0:
-            time.sleep(timeout)
+            self.clock.sleep(timeout)
+            self.metrics.sleep_seconds += timeout
 
-    def run(self, interval_time=INTERVAL_TIME):
+    def run(self, timeout=None):
         """Clear the results map and start a new scan.
 
-        Ports from the instance's ``port_list`` are chunked,
-        and each chunk is polled twice, the second time in reverse order.
+        Ports from the instance's ``port_list`` are drawn from a chunker
+        and probed through a sliding window: up to ``window`` probes are
+        kept in flight, and a new probe is launched as soon as one is
+        answered or reaches its deadline. Only ports that time out, or whose
+        status can't be determined, are probed again, up to ``max_retries``
+        times and with a growing timeout. Retries are launched as soon as
+        the window has room, ahead of ports that weren't probed yet.
+
+        If the instance is adaptive, the window starts at ``window`` probes,
+        grows with every answered probe, and is halved whenever a port that
+        timed out answers a retry, since the first probe was then lost.
+
+        The deadline of each probe is derived from the smoothed round trip
+        time and variance of its host, measured on answered probes that
+        were not retries.
 
         Keyword Args:
-            interval_time(float): The time to wait between each poll.
+            timeout(float): The deadline of probes until round trip times
+                have been measured. Defaults to the instance's ``timeout``.
+
+        Returns:
+            The instance's ``results_map``.
+        """
+        for result in self.iter_results(timeout):
+            pass
+
+        return self.results_map
+
+    def iter_results(self, timeout=None):
+        """Clear the results map and start a new scan, scheduled as described
+        in ``run()``. Yield a (key, result, rtt) tuple as soon as the status
+        of each port is determined, where key is the ``results_map`` key of
+        the port, and rtt is the time the host took to answer, or ``None``.
+
+        Stopping the iteration early aborts the scan.
+
+        If the instance discovers hosts, the addresses found down are not
+        scanned, and none of their ports are yielded.
+
+        If the instance has a checkpoint, the results it holds are restored
+        to the results map without being yielded, and only the other ports
+        are probed.
+
+        Keyword Args:
+            timeout(float): The deadline of probes until round trip times
+                have been measured. Defaults to the instance's ``timeout``.
         """
         self.clear()
+        if timeout is None:
+            timeout = self.timeout if self.timeout is not None else INITIAL_TIMEOUT
+
+        for address in self.addresses:
+            self.rtt_estimators[address] = RttEstimator(timeout, self.min_timeout,
+                                                        self.max_timeout)
+
+        if self.adaptive:
+            self.congestion = CongestionWindow(initial=self.initial_window,
+                                               maximum=self.window)
+
+        try:
+            addresses = self.discover_hosts() if self.discover else self.addresses
+            for address in addresses:
+                port_list = self.port_list
+                if self.checkpoint is not None:
+                    port_list = self.restore(address)
+
+                self.chunkers.append((address, self.chunker_class(port_list, seed=self.seed)))
+
+            for result in self.schedule():
+                yield result
+        finally:
+            self.abort()
+            if self.checkpoint is not None:
+                self.checkpoint.sync(force=True)
+            if self.cache is not None:
+                self.cache.flush()
+
+    def schedule(self):
+        """Launch and reap probes until no ports are left to probe, and
+        yield the results recorded in the meantime.
+        """
+        while True:
+            self.fill_window()
+            while self.finished:
+                yield self.finished.popleft()
+
+            # service sessions of host discovery go on during the scan
+            if not self.in_flight and (self.discovering or not self.grabbing()):
+                if self.launch_delay is None:
+                    break
+
+                # rate limited with nothing to wait for
+                self.clock.sleep(self.launch_delay)
+                self.metrics.sleep_seconds += self.launch_delay
+                continue
+
+            start_time = self.clock.time()
+            ready = self.reactor.poll(self.next_wait(start_time))
+            end_time = self.clock.time()
+            self.metrics.on_wakeup(end_time - start_time, len(self.in_flight))
+            if self.tracer is not None:
+                self.tracer.wakeup(end_time, end_time - start_time, len(ready))
+
+            self.reap(ready)
+            now = self.clock.time()
+            self.expire(now)
+            if self.service_grabber is not None:
+                self.service_grabber.expire(now)
+
+    def discover_hosts(self):
+        """Probe the instance's discovery ports on every address at once,
+        and return the addresses that answered any of them. No more probes
+        are launched to an address once it answered. The other addresses are
+        added to ``down_addresses``.
+
+        The round trip times measured carry over to the scan, as do the
+        results of discovery ports it covers.
+        """
+        # spread the first probes over every address before any retry
+        for port in self.discovery_ports:
+            for address in self.addresses:
+                self.pending.append((address, port))
+
+        self.discovering = True
+        try:
+            for result in self.schedule():
+                pass
+        finally:
+            self.discovering = False
+
+        # ports probed again by the scan start from scratch
+        self.attempts.clear()
+        self.loss_candidates.clear()
+
+        self.down_addresses = [address for address in self.addresses
+                               if address not in self.live_addresses]
+        return [address for address in self.addresses if address in self.live_addresses]
+
+    def grabbing(self):
+        """Return whether service sessions are open or queued.
+        """
+        return self.service_grabber is not None and len(self.service_grabber) > 0
+
+    def next_wait(self, now):
+        """Return the time to wait on the reactor: until the next deadline of
+        a probe or a service session, or until the rate limiter lets the next
+        probe through.
+        """
+        deadlines = []
+        if self.in_flight:
+            deadlines.append(self.deadlines[0][0])
+        if self.service_grabber is not None:
+            deadline = self.service_grabber.next_deadline()
+            if deadline is not None:
+                deadlines.append(deadline)
 
-        port_chunker = PortChunker(self.port_list)
-        port_chunk = port_chunker.get_chunk()
-        while port_chunk:
-            self.poll(port_chunk, interval_time)
-            reversed_chunk = reverse_port_chunk(port_chunk)
-            self.poll(reversed_chunk, interval_time)
+        wait = max(min(deadlines) - now, 0.0) if deadlines else 0.0
+        if self.launch_delay is not None:
+            wait = min(wait, self.launch_delay)
 
+        return wait
+
+    def restore(self, address):
+        """Restore the results of an address from the instance's checkpoint.
+
+        Returns:
+            The list of ports of the address that are still to be scanned.
+        """
+        for port, result in self.checkpoint.results(address):
+            self.results_map[self.result_key(address, port)] = result
+
+        return self.checkpoint.remaining_ports(address)
+
+    def next_targets(self):
+        """Return the next chunk of (address, port) targets, or an empty list
+        when every chunker is exhausted. Addresses take turns, so that
+        consecutive chunks are spread over different hosts.
+        """
+        while self.chunkers:
+            address, port_chunker = self.chunkers.popleft()
             port_chunk = port_chunker.get_chunk()
+            if port_chunk:
+                self.chunkers.append((address, port_chunker))
+                if self.checkpoint is not None:
+                    self.checkpoint.sync()
 
-        return self.results_map
+                return [(address, port) for port in port_chunk]
+
+        return []
+
+    def window_limit(self):
+        """Return the number of probes that may currently be in flight.
+        """
+        limit = self.window
+        if self.fd_cap is not None:
+            limit = min(limit, self.fd_cap)
+        if self.congestion is not None:
+            limit = min(limit, self.congestion.limit())
+
+        return limit
+
+    def next_target(self):
+        """Return the next (address, port) target to probe, or ``None`` when
+        there are no ports left. Retries come first.
+        """
+        if self.retries:
+            return self.retries.popleft()
+
+        if not self.pending:
+            self.pending.extend(self.next_targets())
+            if not self.pending:
+                return None
+
+        return self.pending.popleft()
+
+    def probe_timeout(self, target):
+        """Return the timeout of the next probe of a target.
+        """
+        if self.discovering:
+            return self.discovery_timeout
+
+        estimator = self.rtt_estimators[target[0]]
+        timeout = estimator.timeout()
+        retries = self.attempts.get(target, 0)
+        if retries:
+            timeout = min(timeout * self.retry_backoff ** retries, estimator.max_timeout)
+
+        return timeout
+
+    def fill_window(self):
+        """Launch probes until the window is full or there are no ports left,
+        or until the instance's rate limiter holds the next probe back, in
+        which case ``launch_delay`` is set to the time until it may be launched.
+        """
+        self.launch_delay = None
+        while len(self.in_flight) < self.window_limit():
+            target = self.next_target()
+            if target is None:
+                return
+
+            address, port = target
+            if self.discovering and address in self.live_addresses:
+                continue
+
+            if target not in self.attempts:
+                cached = self.cached_result(address, port)
+                if cached is not None:
+                    self.record(address, port, cached, None)
+                    continue
+
+            if self.rate_limiter is not None:
+                delay = self.rate_limiter.acquire()
+                if delay > 0:
+                    self.defer(target)
+                    self.launch_delay = delay
+                    return
+
+            timeout = self.probe_timeout(target)
+            try:
+                probe = self.launch_scheduled_probe(port, address)
+            except socket.error as e:
+                if not is_resource_error(e):
+                    raise
+
+                self.defer(target)
+                self.on_resource_error(e)
+                return
+
+            self.resource_retries = 0
+            self.attempts[target] = self.attempts.get(target, 0) + 1
+
+            now = self.clock.time()
+            self.launch_times[target] = now
+            deadline = now + timeout
+            self.in_flight.add(probe, deadline)
+            self.metrics.on_launch(len(self.in_flight))
+            if self.tracer is not None:
+                self.tracer.launch(now, probe, self.attempts[target])
+            self.watch(probe)
+            heapq.heappush(self.deadlines, (deadline, probe.file_no))
+
+    def defer(self, target):
+        """Put a target that couldn't be launched back where it came from,
+        so that it is launched next, without looking it up in the cache again.
+        """
+        if self.attempts.setdefault(target, 0):
+            self.retries.appendleft(target)
+        else:
+            self.pending.appendleft(target)
+
+    def on_resource_error(self, error):
+        """Hold back launches after the kernel refused a probe for lack of
+        file descriptors, buffers or local ports. The window is capped to the
+        probes in flight, which free resources as they are retired, and the
+        cap grows back by one probe with every probe retired. If none are in
+        flight, launching is tried again after ``RESOURCE_RETRY_DELAY``, up
+        to ``MAX_RESOURCE_RETRIES`` times in a row.
+
+        Args:
+            error(socket.error): The error the kernel refused the probe with.
+
+        Raises:
+            socket.error: If launching was already tried again
+                ``MAX_RESOURCE_RETRIES`` times in a row.
+        """
+        self.metrics.resource_errors += 1
+        if self.in_flight:
+            self.fd_cap = len(self.in_flight)
+            return
+
+        self.resource_retries += 1
+        if self.resource_retries > MAX_RESOURCE_RETRIES:
+            raise error
+
+        self.launch_delay = RESOURCE_RETRY_DELAY
+
+    def reap(self, ready):
+        """Analyze and retire the probes whose file descriptors are ready.
+
+        Args:
+            ready(list): (fd, events) tuples as returned by the reactor.
+        """
+        for fd, events in ready:
+            if self.syn_engine is not None and fd == self.syn_engine.file_no:
+                self.reap_replies()
+                continue
+
+            if self.service_grabber is not None and fd in self.service_grabber:
+                self.service_grabber.on_ready(fd, events)
+                continue
+
+            probe = self.in_flight.pop(fd)
+            if probe is None:
+                continue
+
+            # the reactor reported the socket writable: SO_ERROR is enough
+            self.retire(probe, probe.analyze(verify=False))
+
+    def reap_replies(self):
+        """Retire the SYN probes answered by replies waiting on the
+        SYN engine's receive socket.
+        """
+        for probe, result in self.syn_engine.receive():
+            # slots are reused: only retire the probe that is in flight
+            if self.in_flight.get(probe.file_no) is probe:
+                self.in_flight.pop(probe.file_no)
+                self.retire(probe, result)
+
+    def expire(self, now):
+        """Retire the in-flight probes whose deadline has passed as filtered.
+        """
+        while self.deadlines and self.deadlines[0][0] <= now:
+            deadline, fd = heapq.heappop(self.deadlines)
+            # the probe may have been reaped, and its fd reused, since
+            if not self.in_flight.is_due(fd, deadline):
+                continue
+
+            self.metrics.timed_out += 1
+            self.retire(self.in_flight.pop(fd), RESULT_FILTERED, timed_out=True)
+
+    def retire(self, probe, result, timed_out=False):
+        """Close a probe that is no longer in flight, and either record its
+        result or queue its port to be probed again.
+
+        Keyword Args:
+            timed_out(bool): Whether the probe reached its deadline.
+        """
+        self.unwatch(probe)
+        if self.fd_cap is not None:
+            self.fd_cap += 1
+            if self.fd_cap >= self.window:
+                self.fd_cap = None
+        if result == RESULT_OPEN and self.service_grabber is not None \
+                and (not self.discovering or probe.port in self.port_list):
+            self.grab_service(probe)
+        probe.close()
+
+        target = (probe.address, probe.port)
+        if self.tracer is not None:
+            self.tracer.finish(self.clock.time(), probe, result, timed_out)
+        if result in (RESULT_OPEN, RESULT_CLOSED):
+            self.metrics.on_answer(probe.rtt())
+            # Karn's algorithm: retries can't tell which probe was answered
+            if self.attempts[target] == 1:
+                self.rtt_estimators[probe.address].sample(probe.rtt())
+
+            self.on_response(target)
+        elif timed_out and not self.discovering and self.attempts[target] > 1:
+            # a first probe timing out may just be a filtered port
+            self.rtt_estimators[probe.address].back_off(self.launch_times[target],
+                                                        self.clock.time())
+
+        if result in (RESULT_FILTERED, RESULT_UNKNOWN) \
+                and self.attempts[target] <= self.max_retries:
+            if result == RESULT_FILTERED:
+                self.loss_candidates[target] = self.launch_times[target]
+
+            self.metrics.retried += 1
+            if self.tracer is not None:
+                self.tracer.retry(self.clock.time(), probe.address, probe.port)
+            self.retries.append(target)
+        else:
+            del self.launch_times[target]
+            self.cache_result(probe.address, probe.port, result)
+            self.record(probe.address, probe.port, result, probe.rtt())
+
+    def record(self, address, port, result, rtt):
+        """Record the final status of a port, and pass it on to
+        ``on_result`` and ``iter_results()``. During host discovery, it is
+        only kept for the scan, and marks the host up if it answered.
+        """
+        if self.discovering:
+            self.discovered[(address, port)] = result
+            if result in (RESULT_OPEN, RESULT_CLOSED):
+                self.live_addresses.add(address)
+            return
+
+        key = self.result_key(address, port)
+        self.results_map[key] = result
+        if self.checkpoint is not None:
+            self.checkpoint.mark(address, port, result)
+
+        self.finished.append((key, result, rtt))
+        if self.on_result is not None:
+            self.on_result(key, result, rtt)
+
+    def grab_service(self, probe):
+        """Hand an open port over to the service grabber, along with the
+        probe's connected socket if it has one.
+        """
+        detach = getattr(probe, 'detach', None)
+        self.service_grabber.add(probe.address, probe.port, detach() if detach else None)
+
+    def record_service(self, address, port, service_info):
+        self.services[self.result_key(address, port)] = service_info
+
+    def on_response(self, target):
+        """Update the congestion window after a target answered a probe.
+        """
+        sent_time = self.loss_candidates.pop(target, None)
+        if self.congestion is None:
+            return
+
+        if sent_time is not None:
+            self.congestion.on_loss(sent_time, self.clock.time())
+        else:
+            self.congestion.on_response()
+
+    def abort(self):
+        """Close any probe still in flight and reset the scheduler state.
+        """
+        for fd in self.in_flight:
+            probe = self.in_flight.get(fd)
+            self.unwatch(probe)
+            probe.close()
+
+        self.in_flight.clear()
+        if self.service_grabber is not None:
+            self.service_grabber.close()
+        self.chunkers.clear()
+        self.pending.clear()
+        self.retries.clear()
+        self.finished.clear()
+        del self.deadlines[:]
+        self.launch_delay = None
+        self.fd_cap = None
+        self.resource_retries = 0
+        self.discovering = False
+        self.attempts.clear()
+        self.launch_times.clear()
+        self.loss_candidates.clear()
 
     def clear(self):
-        """Clear the results map.
+        """Clear the results map and round trip time estimates.
         """
         self.results_map.clear()
+        self.services.clear()
+        self.discovered.clear()
+        self.live_addresses.clear()
+        self.down_addresses = []
+        self.rtt_estimators.clear()
+
+    def close(self):
+        """Release the instance's reactor, and SYN engine and service
+        grabber if any.
+        """
+        if self.service_grabber is not None:
+            self.service_grabber.close()
+
+        if self.syn_engine is not None:
+            self.reactor.unregister(self.syn_engine.file_no)
+            self.syn_engine.close()
+
+        self.reactor.close()
+
+
+class MultiPortScanner(PortScanner):
+    """A ``PortScanner`` for several remote hosts at once.
+
+    All hosts share the instance's reactor and window, so the number of
+    probes in flight is bounded globally rather than per host.
+
+    Args:
+        hosts(collection): The hostnames or IP addresses of the remote hosts.
+            Hostnames are resolved concurrently, and hosts resolving to the
+            same address are scanned once.
+        port_list(collection): The collection of port numbers (integers) to scan
+            on every host.
+
+    Keyword Args:
+        Same as ``PortScanner``.
+
+    Attributes:
+        addresses(list): The resolved addresses of the hosts.
+        results_map(dict): A dictionary mapping (address, port) tuples to
+            their status codes populated during a call to ``run()``.
+
+    Raises:
+        InvalidHostError: If a hostname doesn't resolve.
+    """
+    def resolve(self, hosts):
+        hosts = list(hosts)
+        resolved = self.resolver.resolve_many(hosts)
+
+        addresses = []
+        seen = set()
+        for host in hosts:
+            for address in pick_addresses(host, resolved[host], self.all_addresses):
+                if address not in seen:
+                    seen.add(address)
+                    addresses.append(address)
+
+        return addresses
+
+    def result_key(self, address, port):
+        return address, port
+
+
+def scan_many(targets, port_list, **kwargs):
+    """Scan a collection of ports on several targets, sharing a single
+    reactor and in-flight window between all of them.
+
+    Args:
+        targets(collection): Hostnames, IP addresses or CIDR blocks.
+        port_list(collection): The collection of port numbers (integers) to scan.
+
+    Keyword Args:
+        Passed on to ``MultiPortScanner``.
+
+    Returns:
+        A dictionary mapping (address, port) tuples to status codes.
+    """
+    scanner = MultiPortScanner(expand_targets(targets), port_list, **kwargs)
+    try:
+        return scanner.run()
+    finally:
+        scanner.close()
@@ -0,0 +1,295 @@
+"""This module provides a class ``ServiceGrabber`` that identifies the
+services listening on open ports, on the reactor of a running scan.
+
+Open ports get a connection of their own: the connect probe's socket when
+the scan hands it over, or a new connection otherwise. Ports where clients
+speak first are sent a small protocol probe, such as an HTTP ``HEAD``
+request or a TLS ClientHello, and the first data the server sends back,
+or a banner it sends unprompted, is kept along with the service it
+identifies. Sessions have a short deadline, and the number of them open at
+once is bounded separately from the scan's probes.
+"""
+import errno
+import heapq
+import os
+import socket
+import struct
+from collections import deque, namedtuple
+
+from port_scanner.probe import address_family, connect, create_tcp_socket, setup_tcp_socket
+from port_scanner.reactor import EVENT_READ, EVENT_WRITE
+from port_scanner.timing import SYSTEM_CLOCK
+
+# number of service sessions open at once
+SERVICE_WINDOW = 32
+
+# time after which a session is ended, with whatever it received, in seconds
+BANNER_TIMEOUT = 2.0
+
+# number of bytes of a banner kept
+BANNER_SIZE = 1024
+
+# cipher suites offered by the TLS ClientHello: TLS 1.3, then ECDHE and RSA
+TLS_CIPHER_SUITES = (0x1301, 0x1302, 0x1303, 0xc02b, 0xc02f, 0xc02c, 0xc030,
+                     0xcca9, 0xcca8, 0xc013, 0xc014, 0x009c, 0x009d, 0x002f, 0x0035)
+
+# (extension type, data) of the TLS ClientHello: supported groups,
+# EC point formats and signature algorithms
+TLS_EXTENSIONS = (
+    (0x000a, struct.pack('!HHHH', 6, 0x001d, 0x0017, 0x0018)),
+    (0x000b, struct.pack('!BB', 1, 0)),
+    (0x000d, struct.pack('!H6H', 12, 0x0403, 0x0503, 0x0804, 0x0805, 0x0401, 0x0501)),
+)
+
+# outcome of a session: the service identified, or None, and the data received
+ServiceInfo = namedtuple('ServiceInfo', ['service', 'banner'])
+
+
+def http_head(address):
+    """Return an HTTP ``HEAD`` request for the root of a host.
+    """
+    host = '[%s]' % address if ':' in address else address
+    return ('HEAD / HTTP/1.0\r\nHost: %s\r\nUser-Agent: portscanner\r\n\r\n' % host).encode()
+
+
+def tls_client_hello(address):
+    """Return a TLS 1.2 ClientHello record, to which TLS servers answer with
+    a ServerHello or an alert.
+    """
+    extensions = b''.join(struct.pack('!HH', ext_type, len(data)) + data
+                          for ext_type, data in TLS_EXTENSIONS)
+    body = (struct.pack('!H', 0x0303) + os.urandom(32) + b'\x00' +
+            struct.pack('!H%dH' % len(TLS_CIPHER_SUITES), 2 * len(TLS_CIPHER_SUITES),
+                        *TLS_CIPHER_SUITES) +
+            b'\x01\x00' + struct.pack('!H', len(extensions)) + extensions)
+    handshake = struct.pack('!B', 1) + struct.pack('!I', len(body))[1:] + body
+    return struct.pack('!BHH', 0x16, 0x0301, len(handshake)) + handshake
+
+
+# protocol probes, by name
+SERVICE_PROBES = {
+    'http': http_head,
+    'tls': tls_client_hello,
+}
+
+# protocol probe sent to well-known ports where clients speak first;
+# other ports are only listened to for a banner
+PORT_PROBES = {
+    80: 'http', 81: 'http', 591: 'http', 3128: 'http', 8000: 'http', 8008: 'http',
+    8080: 'http', 8081: 'http', 8888: 'http',
+    443: 'tls', 465: 'tls', 636: 'tls', 853: 'tls', 993: 'tls', 995: 'tls',
+    4443: 'tls', 8443: 'tls', 9443: 'tls',
+}
+
+
+def identify(banner):
+    """Return the name of the service that sent a banner, or ``None``.
+    """
+    if banner.startswith(b'SSH-'):
+        return 'ssh'
+    if banner.startswith(b'HTTP/'):
+        return 'http'
+    if banner[:1] in (b'\x15', b'\x16') and banner[1:2] == b'\x03':
+        return 'tls'
+    if banner.startswith(b'220'):
+        return 'ftp' if b'FTP' in banner.upper() else 'smtp'
+    if banner.startswith(b'+OK'):
+        return 'pop3'
+    if banner.startswith(b'* OK'):
+        return 'imap'
+    if banner.startswith(b'RFB '):
+        return 'vnc'
+
+    return None
+
+
+class ServiceSession(object):
+    """A connection to an open port, waiting for the first data of the service.
+    """
+    __slots__ = ('address', 'port', 'socket', 'file_no', 'connected', 'probe', 'deadline')
+
+    def __init__(self, address, port, sock, probe, deadline):
+        self.address = address
+        self.port = port
+        self.connected = sock is not None
+        if sock is None:
+            sock = create_tcp_socket(address_family(address))
+            setup_tcp_socket(sock)
+            try:
+                connect(sock, (address, port))
+            except socket.error:
+                sock.close()
+                raise
+
+        self.socket = sock
+        self.file_no = sock.fileno()
+        self.probe = probe
+        self.deadline = deadline
+
+    def send_probe(self):
+        """Send the session's protocol probe, if any. It fits in the send
+        buffer of a new connection, so it is sent at once.
+        """
+        if self.probe is not None:
+            self.socket.send(SERVICE_PROBES[self.probe](self.address))
+
+
+class ServiceGrabber(object):
+    """Identifies services on open ports, using the reactor of a scan.
+
+    Args:
+        reactor(Reactor): The reactor the sessions' sockets are watched with.
+
+    Keyword Args:
+        clock: The clock deadlines are measured with.
+        window(int): The number of sessions open at once. Further ports
+            are queued.
+        timeout(float): The time after which a session is ended.
+        size(int): The number of bytes of a banner kept.
+        port_probes(dict): A dictionary mapping ports to the name of the
+            protocol probe, in ``SERVICE_PROBES``, sent to them.
+        on_service: A callable invoked with (address, port, service info)
+            when a session ends.
+
+    Attributes:
+        sessions(dict): A dictionary mapping file descriptors to open sessions.
+        queue(deque): The (address, port, socket) tuples waiting for a
+            session. Sockets are ``None`` for ports to connect to.
+    """
+    def __init__(self, reactor, clock=SYSTEM_CLOCK, window=SERVICE_WINDOW,
+                 timeout=BANNER_TIMEOUT, size=BANNER_SIZE, port_probes=PORT_PROBES,
+                 on_service=None):
+        self.reactor = reactor
+        self.clock = clock
+        self.window = max(window, 1)
+        self.timeout = timeout
+        self.size = size
+        self.port_probes = port_probes
+        self.on_service = on_service
+        self.sessions = {}
+        self.queue = deque()
+        self.deadlines = []
+
+    def add(self, address, port, sock=None):
+        """Identify the service on an open port, over a connected socket the
+        grabber now owns, or over a new connection if ``sock`` is ``None``.
+        """
+        if sock is not None and len(self.sessions) >= self.window:
+            # don't hold on to a file descriptor while waiting for room
+            sock.close()
+            sock = None
+
+        self.queue.append((address, port, sock))
+        self.start_sessions()
+
+    def start_sessions(self):
+        while self.queue and len(self.sessions) < self.window:
+            address, port, sock = self.queue.popleft()
+            deadline = self.clock.time() + self.timeout
+            try:
+                session = ServiceSession(address, port, sock,
+                                         self.port_probes.get(port), deadline)
+            except socket.error:
+                self.report(address, port, b'')
+                continue
+
+            self.sessions[session.file_no] = session
+            heapq.heappush(self.deadlines, (deadline, session.file_no))
+            if session.connected:
+                self.on_connected(session)
+            else:
+                self.reactor.register(session.file_no, EVENT_WRITE)
+
+    def on_connected(self, session):
+        try:
+            session.send_probe()
+        except socket.error:
+            self.finish(session, b'')
+            return
+
+        if session.file_no in self.reactor:
+            self.reactor.modify(session.file_no, EVENT_READ)
+        else:
+            self.reactor.register(session.file_no, EVENT_READ)
+
+    def on_ready(self, fd, events):
+        """Advance the session of a file descriptor the reactor reported ready.
+        """
+        session = self.sessions.get(fd)
+        if session is None:
+            return
+
+        if not session.connected:
+            if session.socket.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR):
+                self.finish(session, b'')
+                return
+
+            session.connected = True
+            self.on_connected(session)
+            return
+
+        try:
+            banner = session.socket.recv(self.size)
+        except socket.error as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return
+            banner = b''
+
+        self.finish(session, banner)
+
+    def expire(self, now):
+        """End the sessions whose deadline has passed, without a banner.
+        """
+        while self.deadlines and self.deadlines[0][0] <= now:
+            deadline, fd = heapq.heappop(self.deadlines)
+            session = self.sessions.get(fd)
+            # the session may have ended, and its fd been reused, since
+            if session is not None and session.deadline == deadline:
+                self.finish(session, b'')
+
+    def next_deadline(self):
+        """Return the earliest deadline of the open sessions, or ``None``.
+        """
+        while self.deadlines:
+            deadline, fd = self.deadlines[0]
+            session = self.sessions.get(fd)
+            if session is not None and session.deadline == deadline:
+                return deadline
+
+            heapq.heappop(self.deadlines)
+
+        return None
+
+    def finish(self, session, banner):
+        del self.sessions[session.file_no]
+        self.reactor.unregister(session.file_no)
+        session.socket.close()
+        self.report(session.address, session.port, banner)
+        self.start_sessions()
+
+    def report(self, address, port, banner):
+        if self.on_service is not None:
+            self.on_service(address, port, ServiceInfo(identify(banner), banner))
+
+    def close(self):
+        """End every session and drop the queue, without reporting them.
+        """
+        for session in list(self.sessions.values()):
+            self.reactor.unregister(session.file_no)
+            session.socket.close()
+
+        for address, port, sock in self.queue:
+            if sock is not None:
+                sock.close()
+
+        self.sessions.clear()
+        self.queue.clear()
+        del self.deadlines[:]
+
+    def __contains__(self, fd):
+        return fd in self.sessions
+
+    def __len__(self):
+        """Return the number of ports with a session open or queued.
+        """
+        return len(self.sessions) + len(self.queue)
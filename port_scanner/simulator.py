@@ -0,0 +1,339 @@
+"""This module provides a discrete-event network simulator, so that scans can
+be run against modelled hosts on a virtual clock instead of a real network.
+
+A ``SimulatedNetwork`` hands a ``PortScanner`` its probes, reactor and clock.
+Probes never touch a socket: when one is launched, the network decides from
+the ``HostModel`` of its address whether and when it is answered, and queues
+the answer as an event. The network's reactor jumps the clock to the next
+event, or to the end of its timeout, instead of waiting, so a scan of
+thousands of ports over a slow, lossy link takes as long as the scheduler
+takes to run, and given a seed, always produces the same results in the
+same virtual time::
+
+    hosts = {'10.0.0.1': HostModel(open_ports=[22, 80], latency=0.08, loss=0.02)}
+    report = simulate(hosts, range(1, 2001), seed=1)
+
+Running the scheduler isn't free: each probe costs about 60 microseconds of
+wall time, three quarters of it in the scanner itself rather than in the
+simulation. A scan of 2000 ports takes about a tenth of a second, but a scan
+of all 65535 ports over a lossy link takes several seconds, so tests keep
+to a few thousand ports.
+"""
+import heapq
+import random
+from collections import namedtuple
+
+from port_scanner.reactor import Reactor, EVENT_WRITE
+from port_scanner.scanner import MultiPortScanner
+from port_scanner.values import RESULT_OPEN, RESULT_CLOSED, RESULT_FILTERED, RESULT_UNKNOWN
+
+# first file descriptor handed out to simulated probes
+FIRST_FD = 3
+
+
+class VirtualClock(object):
+    """A clock whose time only moves when told to.
+
+    Keyword Args:
+        start(float): The initial time, in seconds.
+
+    Attributes:
+        now(float): The current time.
+    """
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        if seconds > 0:
+            self.now += seconds
+
+    def advance_to(self, when):
+        self.now = max(self.now, when)
+
+
+class HostModel(object):
+    """The behaviour of a simulated host towards probes.
+
+    Keyword Args:
+        open_ports(collection): The ports that accept connections.
+        filtered_ports(collection): The ports a firewall silently drops
+            probes to.
+        default_result(int): The status of other ports: ``RESULT_CLOSED``
+            for a host that answers with RSTs, or ``RESULT_FILTERED`` for a
+            firewall that drops everything it doesn't allow.
+        latency(float): The round trip time to the host, in seconds.
+        jitter(float): The maximum random delay added to each round trip,
+            in seconds.
+        port_latency(dict): A dictionary mapping ports to their own round
+            trip time, replacing ``latency``.
+        loss(float): The probability that a probe or its answer is lost.
+        rate_limit(float): The number of answers per second the host sends
+            at most, as with RST and ICMP rate limiting. Further answers are
+            dropped. ``None`` for no limit.
+        burst(int): The number of answers the host may send at once before
+            ``rate_limit`` applies.
+    """
+    def __init__(self, open_ports=(), filtered_ports=(), default_result=RESULT_CLOSED,
+                 latency=0.05, jitter=0.0, port_latency=None, loss=0.0,
+                 rate_limit=None, burst=1):
+        self.open_ports = frozenset(open_ports)
+        self.filtered_ports = frozenset(filtered_ports)
+        self.default_result = default_result
+        self.latency = latency
+        self.jitter = jitter
+        self.port_latency = port_latency or {}
+        self.loss = loss
+        self.rate_limit = rate_limit
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.refill_time = None
+
+    def result(self, port):
+        """Return the actual status of a port.
+        """
+        if port in self.open_ports:
+            return RESULT_OPEN
+        if port in self.filtered_ports:
+            return RESULT_FILTERED
+
+        return self.default_result
+
+    def take_token(self, now):
+        """Return whether the rate limit allows an answer at ``now``.
+        """
+        if self.rate_limit is None:
+            return True
+
+        if self.refill_time is not None:
+            self.tokens = min(self.tokens + (now - self.refill_time) * self.rate_limit,
+                              self.burst)
+        self.refill_time = now
+
+        if self.tokens < 1.0:
+            return False
+
+        self.tokens -= 1.0
+        return True
+
+    def answer(self, port, now, rng):
+        """Decide the fate of a probe sent to a port at ``now``.
+
+        Returns:
+            A (result, round trip time) tuple, or ``None`` if the probe is
+            never answered.
+        """
+        result = self.result(port)
+        if result == RESULT_FILTERED:
+            return None
+
+        if self.loss and rng.random() < self.loss:
+            return None
+
+        rtt = self.port_latency.get(port, self.latency)
+        if self.jitter:
+            rtt += rng.uniform(0.0, self.jitter)
+
+        # the host answers once the probe has made it half way
+        if not self.take_token(now + rtt / 2.0):
+            return None
+
+        return result, rtt
+
+
+class SimulatedProbe(object):
+    """A probe launched on a ``SimulatedNetwork``, with the interface of a
+    ``port_scanner.probe.PortProbe``.
+
+    Attributes:
+        file_no(int): A simulated file descriptor, unique among the probes
+            in flight and reused like real ones.
+    """
+    __slots__ = ('network', 'file_no', 'address', 'port', 'result',
+                 'start_time', 'reap_time')
+
+    def __init__(self, network, ip_addr, port):
+        self.network = network
+        self.file_no = network.acquire_fd()
+        self.address = ip_addr
+        self.port = port
+        self.result = RESULT_UNKNOWN
+        self.reap_time = None
+        self.start_time = network.clock.time()
+
+    def close(self):
+        if self.network is not None:
+            self.network.release(self)
+            self.network = None
+
+    def rtt(self):
+        if self.reap_time is None or self.result not in (RESULT_OPEN, RESULT_CLOSED):
+            return None
+
+        return self.reap_time - self.start_time
+
+    def analyze(self, verify=True):
+        """Return the status of the port, once its answer was delivered.
+        """
+        return self.result
+
+
+class SimulatedReactor(Reactor):
+    """A reactor reporting the probes of a ``SimulatedNetwork`` whose answers
+    have arrived. Polling advances the network's clock instead of waiting.
+    """
+    def __init__(self, network):
+        super(SimulatedReactor, self).__init__()
+        self.network = network
+
+    def poll(self, timeout):
+        network = self.network
+        clock = network.clock
+        events = network.events
+        deadline = None if timeout is None else clock.now + timeout
+
+        while events and not network.is_live(events[0][2]):
+            heapq.heappop(events)
+
+        if not events or (deadline is not None and events[0][0] > deadline):
+            if deadline is not None:
+                clock.advance_to(deadline)
+            return []
+
+        clock.advance_to(events[0][0])
+        ready = []
+        while events and events[0][0] <= clock.now:
+            when, sequence, probe, result = heapq.heappop(events)
+            if not network.is_live(probe):
+                continue
+
+            probe.result = result
+            probe.reap_time = when
+            if probe.file_no in self.registered:
+                ready.append((probe.file_no, EVENT_WRITE))
+
+        return ready
+
+
+class SimulatedNetwork(object):
+    """A network of modelled hosts, with a queue of answers to deliver.
+
+    Args:
+        hosts(dict): A dictionary mapping IP addresses to ``HostModel``s.
+            Probes to other addresses are never answered.
+
+    Keyword Args:
+        seed: Seed of the network's random number generator.
+        clock(VirtualClock): The clock of the network. Defaults to a new
+            ``VirtualClock``.
+
+    Attributes:
+        events(list): A heap of (time, sequence, probe, result) answers.
+        probes(dict): A dictionary mapping file descriptors to the probes
+            in flight.
+        launched(int): The number of probes launched.
+        answered(int): The number of probes the hosts answered.
+    """
+    def __init__(self, hosts, seed=None, clock=None):
+        self.hosts = hosts
+        self.rng = random.Random(seed)
+        self.clock = clock if clock is not None else VirtualClock()
+        self.events = []
+        self.probes = {}
+        self.free_fds = []
+        self.next_fd = FIRST_FD
+        self.sequence = 0
+        self.launched = 0
+        self.answered = 0
+
+    def acquire_fd(self):
+        # like the kernel, hand out the lowest free file descriptor
+        if self.free_fds:
+            return heapq.heappop(self.free_fds)
+
+        self.next_fd += 1
+        return self.next_fd - 1
+
+    def release(self, probe):
+        if self.probes.get(probe.file_no) is probe:
+            del self.probes[probe.file_no]
+            heapq.heappush(self.free_fds, probe.file_no)
+
+    def is_live(self, probe):
+        return self.probes.get(probe.file_no) is probe
+
+    def connect(self, address, port):
+        """Launch a ``SimulatedProbe``, and queue its answer if it gets one.
+        Usable as the ``probe_factory`` of a ``PortScanner``.
+        """
+        probe = SimulatedProbe(self, address, port)
+        self.probes[probe.file_no] = probe
+        self.launched += 1
+
+        host = self.hosts.get(address)
+        answer = host.answer(port, self.clock.now, self.rng) if host is not None else None
+        if answer is not None:
+            result, rtt = answer
+            self.answered += 1
+            self.sequence += 1
+            heapq.heappush(self.events, (self.clock.now + rtt, self.sequence, probe, result))
+
+        return probe
+
+    def create_reactor(self):
+        return SimulatedReactor(self)
+
+    def scanner_kwargs(self):
+        """Return the keyword arguments that make a ``PortScanner`` scan
+        this network.
+        """
+        return {
+            'probe_factory': self.connect,
+            'reactor': self.create_reactor(),
+            'clock': self.clock,
+        }
+
+
+# outcome of ``simulate()``
+SimulationReport = namedtuple('SimulationReport',
+                              ['results_map', 'elapsed', 'launched', 'accuracy'])
+
+
+def simulate(hosts, port_list, seed=None, **scanner_kwargs):
+    """Scan a collection of ports on simulated hosts.
+
+    Args:
+        hosts(dict): A dictionary mapping IP addresses to ``HostModel``s.
+        port_list(collection): The collection of port numbers (integers) to scan.
+
+    Keyword Args:
+        seed: Seed of both the network and the scanner's chunkers.
+        Other keyword arguments are passed on to ``MultiPortScanner``.
+
+    Returns:
+        A ``SimulationReport`` with the results map, keyed by (address, port)
+        tuples, the virtual time the scan took, the number of probes
+        launched, and the share of ports whose status was found correctly.
+    """
+    network = SimulatedNetwork(hosts, seed=seed)
+    kwargs = network.scanner_kwargs()
+    kwargs.update(scanner_kwargs)
+
+    scanner = MultiPortScanner(sorted(hosts), port_list, seed=seed, **kwargs)
+    try:
+        start_time = network.clock.time()
+        results_map = scanner.run()
+        elapsed = network.clock.time() - start_time
+    finally:
+        scanner.close()
+
+    correct = sum(1 for (address, port), result in results_map.items()
+                  if hosts[address].result(port) == result)
+    accuracy = correct / float(len(results_map)) if results_map else 1.0
+
+    return SimulationReport(dict(results_map), elapsed, network.launched, accuracy)
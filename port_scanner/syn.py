@@ -0,0 +1,305 @@
+"""This module provides a raw-socket SYN ("half-open") scan engine for Linux.
+
+Instead of a kernel socket per probe, a single raw socket sends crafted TCP
+SYN segments, and a second raw socket receives the replies. A SYN-ACK means
+the port is open and a RST means it is closed. The kernel answers SYN-ACKs
+with a RST itself, since no socket owns the source port, so connections are
+never completed.
+
+The sequence number of every SYN is a keyed hash of the target address and
+port, so a reply is matched by checking that it acknowledges that number,
+without keeping any per-packet state. Raw sockets require root privileges or
+the ``CAP_NET_RAW`` capability. Only IPv4 targets are supported.
+"""
+import errno
+import hashlib
+import os
+import random
+import socket
+import struct
+import sys
+
+from port_scanner.timing import monotonic
+from port_scanner.values import RESULT_OPEN, RESULT_CLOSED, RESULT_UNKNOWN
+
+# TCP flags
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_ACK = 0x10
+
+# source ports are picked from this range when none is given
+SOURCE_PORT_RANGE = (40000, 60999)
+
+# window advertised in SYNs
+SYN_WINDOW = 1024
+
+# SYNs carry an MSS option, like those sent by operating systems
+MSS_OPTION = struct.pack('!BBH', 2, 4, 1460)
+
+TCP_HEADER = struct.Struct('!HHIIBBHHH')
+PSEUDO_HEADER = struct.Struct('!4s4sBBH')
+
+# size of the receive socket's buffer, so that bursts of replies aren't dropped
+RECEIVE_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+class SynUnavailableError(Exception):
+    def __init__(self, message):
+        self.message = message
+
+
+def checksum(data):
+    """Return the internet checksum (RFC 1071) of a byte string.
+    """
+    if len(data) % 2:
+        data += b'\x00'
+
+    total = sum(struct.unpack('!%dH' % (len(data) // 2), data))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+
+    return ~total & 0xFFFF
+
+
+def build_syn(source_address, address, source_port, port, seq):
+    """Return a TCP SYN segment, checksummed for the given IPv4 addresses.
+    The IP header is added by the kernel.
+    """
+    offset = (TCP_HEADER.size + len(MSS_OPTION)) // 4
+    header = TCP_HEADER.pack(source_port, port, seq, 0, offset << 4, TCP_SYN,
+                             SYN_WINDOW, 0, 0) + MSS_OPTION
+
+    pseudo_header = PSEUDO_HEADER.pack(socket.inet_aton(source_address),
+                                       socket.inet_aton(address),
+                                       0, socket.IPPROTO_TCP, len(header))
+    tcp_checksum = checksum(pseudo_header + header)
+
+    return header[:16] + struct.pack('!H', tcp_checksum) + header[18:]
+
+
+def parse_reply(packet):
+    """Parse an IPv4 packet carrying a TCP segment, as received from a raw socket.
+
+    Returns:
+        A (source address, source port, destination port, ack, flags) tuple,
+        or ``None`` if the packet isn't a TCP segment.
+    """
+    if len(packet) < 20:
+        return None
+
+    version_ihl, protocol = struct.unpack_from('!B8xB', packet)
+    ihl = (version_ihl & 0x0F) * 4
+    if version_ihl >> 4 != 4 or protocol != socket.IPPROTO_TCP \
+            or len(packet) < ihl + TCP_HEADER.size:
+        return None
+
+    source_address = socket.inet_ntoa(packet[12:16])
+    source_port, destination_port, seq, ack, offset, flags, window, tcp_checksum, urgent = \
+        TCP_HEADER.unpack_from(packet, ihl)
+
+    return source_address, source_port, destination_port, ack, flags
+
+
+def reply_result(flags):
+    """Return the status of a port from the flags of its reply to a SYN.
+    """
+    if flags & TCP_SYN and flags & TCP_ACK:
+        return RESULT_OPEN
+    if flags & TCP_RST:
+        return RESULT_CLOSED
+
+    return RESULT_UNKNOWN
+
+
+def syn_is_available():
+    """Return whether raw sockets can be opened by this process.
+    """
+    try:
+        SynEngine().close()
+    except SynUnavailableError:
+        return False
+
+    return True
+
+
+class SynEngine(object):
+    """Sends SYNs from a raw socket and matches replies on another one.
+
+    Keyword Args:
+        source_port(int): The source port of SYNs. Defaults to a random port
+            in ``SOURCE_PORT_RANGE``.
+        secret(bytes): The key of the sequence number cookies. Defaults to
+            random bytes.
+
+    Attributes:
+        file_no(int): The file descriptor of the receive socket, which is
+            readable when replies are waiting.
+        probes(dict): A dictionary mapping (address, port) tuples to the
+            ``SynProbe``s in flight.
+
+    Raises:
+        SynUnavailableError: If the platform isn't Linux, or raw sockets
+            can't be opened.
+    """
+    def __init__(self, source_port=None, secret=None):
+        if not sys.platform.startswith('linux'):
+            raise SynUnavailableError('SYN scans are only supported on Linux')
+
+        try:
+            self.send_socket = socket.socket(socket.AF_INET, socket.SOCK_RAW,
+                                             socket.IPPROTO_TCP)
+        except socket.error as e:
+            raise SynUnavailableError('SYN scans need root privileges or CAP_NET_RAW (%s)'
+                                      % e.strerror)
+
+        self.recv_socket = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP)
+        self.recv_socket.setblocking(0)
+        self.recv_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_SIZE)
+        self.file_no = self.recv_socket.fileno()
+
+        if source_port is None:
+            source_port = random.randint(*SOURCE_PORT_RANGE)
+
+        self.source_port = source_port
+        self.secret = os.urandom(16) if secret is None else secret
+        self.source_addresses = {}
+        self.probes = {}
+        self.free_slots = []
+        self.slot_count = 0
+
+    def cookie(self, address, port):
+        """Return the sequence number of the SYN to a port on an address.
+        """
+        digest = hashlib.md5(self.secret + socket.inet_aton(address) +
+                             struct.pack('!H', port)).digest()
+        return struct.unpack('!I', digest[:4])[0]
+
+    def source_address(self, address):
+        """Return the local address the kernel sends packets to ``address`` from.
+        """
+        source_address = self.source_addresses.get(address)
+        if source_address is None:
+            # connecting a UDP socket only selects a route
+            route = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                route.connect((address, 9))
+                source_address = route.getsockname()[0]
+            finally:
+                route.close()
+
+            self.source_addresses[address] = source_address
+
+        return source_address
+
+    def acquire_slot(self):
+        if self.free_slots:
+            return self.free_slots.pop()
+
+        self.slot_count += 1
+        return self.slot_count - 1
+
+    def send(self, probe):
+        """Send the SYN of a probe, and start tracking it.
+        """
+        seq = self.cookie(probe.address, probe.port)
+        segment = build_syn(self.source_address(probe.address), probe.address,
+                            self.source_port, probe.port, seq)
+
+        self.probes[(probe.address, probe.port)] = probe
+        self.send_socket.sendto(segment, (probe.address, 0))
+
+    def release(self, probe):
+        """Stop tracking a probe, and free its slot.
+        """
+        if self.probes.get((probe.address, probe.port)) is probe:
+            del self.probes[(probe.address, probe.port)]
+
+        self.free_slots.append(probe.file_no)
+
+    def receive(self):
+        """Read every reply waiting on the receive socket.
+
+        Returns:
+            A list of (probe, result) tuples for replies that answer a probe
+            in flight. Other packets are ignored.
+        """
+        answered = []
+        while True:
+            try:
+                packet = self.recv_socket.recv(65535)
+            except socket.error as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                    break
+                raise
+
+            reply = parse_reply(packet)
+            if reply is None:
+                continue
+
+            address, port, destination_port, ack, flags = reply
+            if destination_port != self.source_port or not flags & TCP_ACK:
+                continue
+
+            probe = self.probes.get((address, port))
+            if probe is None or ack != (self.cookie(address, port) + 1) & 0xFFFFFFFF:
+                continue
+
+            result = reply_result(flags)
+            if result != RESULT_UNKNOWN:
+                probe.result = result
+                probe.reap_time = monotonic()
+                answered.append((probe, result))
+
+        return answered
+
+    def close(self):
+        self.send_socket.close()
+        self.recv_socket.close()
+
+
+class SynProbe(object):
+    """A SYN sent by a ``SynEngine``, with the interface of a
+    ``port_scanner.probe.PortProbe``.
+
+    Args:
+        engine(SynEngine): The engine sending the SYN.
+        ip_addr(str): IPv4 address of host to probe.
+        port(int): Port to probe.
+
+    Attributes:
+        file_no(int): A slot number, unique among the engine's probes in
+            flight. It is not a file descriptor.
+    """
+    __slots__ = ('engine', 'file_no', 'address', 'port', 'result',
+                 'start_time', 'reap_time')
+
+    def __init__(self, engine, ip_addr, port):
+        self.engine = engine
+        self.file_no = engine.acquire_slot()
+        self.address = ip_addr
+        self.port = port
+        self.result = RESULT_UNKNOWN
+        self.reap_time = None
+        self.start_time = monotonic()
+        try:
+            engine.send(self)
+        except socket.error:
+            self.close()
+            raise
+
+    def close(self):
+        if self.engine is not None:
+            self.engine.release(self)
+            self.engine = None
+
+    def rtt(self):
+        if self.reap_time is None or self.result not in (RESULT_OPEN, RESULT_CLOSED):
+            return None
+
+        return self.reap_time - self.start_time
+
+    def analyze(self, verify=True):
+        """Return the status of the port, as found by the engine's receive path.
+        """
+        return self.result
@@ -0,0 +1,80 @@
+"""This module provides functions for turning target specifications
+(hostnames, IP addresses, CIDR blocks and target files) into lists of hosts
+for a port scanner.
+"""
+import socket
+import struct
+
+
+class InvalidTargetError(Exception):
+    def __init__(self, target):
+        self.message = '%s is an invalid target specification' % target
+
+
+def ip_to_int(ip_addr):
+    return struct.unpack('!I', socket.inet_aton(ip_addr))[0]
+
+
+def int_to_ip(value):
+    return socket.inet_ntoa(struct.pack('!I', value))
+
+
+def is_cidr(target):
+    return '/' in target
+
+
+def expand_cidr(cidr):
+    """Generate the IPv4 addresses of a CIDR block, e.g. ``'10.0.0.0/22'``.
+
+    Raises:
+        InvalidTargetError: If the block is malformed.
+    """
+    try:
+        network, prefix_length = cidr.split('/')
+        prefix_length = int(prefix_length)
+        base = ip_to_int(network)
+    except (ValueError, socket.error):
+        raise InvalidTargetError(cidr)
+
+    if prefix_length < 0 or prefix_length > 32:
+        raise InvalidTargetError(cidr)
+
+    host_bits = 32 - prefix_length
+    value = base >> host_bits << host_bits
+    end = value + (1 << host_bits)
+    while value < end:
+        yield int_to_ip(value)
+        value += 1
+
+
+def expand_target(target):
+    """Generate the hosts of a single target specification.
+    Hostnames and IP addresses are returned as is, CIDR blocks are expanded.
+    """
+    target = target.strip()
+    if is_cidr(target):
+        for ip_addr in expand_cidr(target):
+            yield ip_addr
+    elif target:
+        yield target
+
+
+def expand_targets(targets):
+    """Generate the hosts of a collection of target specifications,
+    without duplicates.
+    """
+    seen = set()
+    for target in targets:
+        for host in expand_target(target):
+            if host not in seen:
+                seen.add(host)
+                yield host
+
+
+def read_target_file(file_obj):
+    """Generate the target specifications of a file object, one per line or
+    separated by whitespace. Everything after a ``#`` on a line is ignored.
+    """
+    for line in file_obj:
+        for target in line.split('#', 1)[0].split():
+            yield target
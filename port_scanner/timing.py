@@ -0,0 +1,245 @@
+"""This module provides classes that adapt a port scanner's timing to the
+network conditions it observes, a clock, and a rate limiter.
+"""
+import threading
+import time
+
+# congestion window bounds, in probes
+INITIAL_WINDOW = 10
+MIN_WINDOW = 1
+MAX_WINDOW = 1000
+
+# probe timeout bounds, in seconds
+INITIAL_TIMEOUT = 1.0
+MIN_TIMEOUT = 0.05
+MAX_TIMEOUT = 2.0
+
+# RFC 6298 smoothing factors and variance multiplier
+RTT_ALPHA = 1.0 / 8
+RTT_BETA = 1.0 / 4
+RTT_K = 4
+
+# number of times in a row the timeout is doubled at most, before a sample
+# recomputes it from the estimates
+MAX_BACKOFFS = 2
+
+# clock granularity added to the variance term, in seconds
+CLOCK_GRANULARITY = 0.001
+
+# time worth of probes a rate limiter lets through at once by default, in seconds
+RATE_BURST_TIME = 0.01
+
+# fraction of a token that counts as a whole one, so that rounding errors
+# don't leave a limiter waiting for a token it has already refilled
+TOKEN_TOLERANCE = 1e-9
+
+# time.monotonic is only available from Python 3.3
+monotonic = getattr(time, 'monotonic', time.time)
+
+
+class CongestionWindow(object):
+    """An additive-increase/multiplicative-decrease window bounding the
+    number of probes in flight, in the spirit of TCP congestion control.
+
+    The window grows by one probe per response while it is below the slow
+    start threshold, and by one probe per window's worth of responses above
+    it. When a loss is detected, the window and the threshold are halved.
+    Losses of probes sent before the last decrease belong to the same
+    congestion event and are ignored.
+
+    Keyword Args:
+        initial(int): The initial size of the window.
+        minimum(int): The size the window never shrinks below.
+        maximum(int): The size the window never grows above.
+
+    Attributes:
+        size(float): The current size of the window.
+        ssthresh(float): The slow start threshold.
+        decreases(int): The number of times the window was decreased.
+    """
+    def __init__(self, initial=INITIAL_WINDOW, minimum=MIN_WINDOW, maximum=MAX_WINDOW):
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum)
+        self.size = float(min(max(initial, minimum), self.maximum))
+        self.ssthresh = float(self.maximum)
+        self.decreases = 0
+        self.last_decrease = None
+
+    def limit(self):
+        """Return the number of probes that may currently be in flight.
+        """
+        return int(self.size)
+
+    def on_response(self):
+        """Grow the window after a probe was answered.
+        """
+        if self.size < self.ssthresh:
+            self.size += 1.0
+        else:
+            self.size += 1.0 / self.size
+
+        self.size = min(self.size, self.maximum)
+
+    def on_loss(self, sent_time, now):
+        """Shrink the window after a probe sent at ``sent_time`` was lost.
+
+        Returns:
+            Whether the window was decreased.
+        """
+        if self.last_decrease is not None and sent_time < self.last_decrease:
+            return False
+
+        self.ssthresh = max(self.size / 2.0, self.minimum)
+        self.size = self.ssthresh
+        self.decreases += 1
+        self.last_decrease = now
+        return True
+
+
+class RttEstimator(object):
+    """A smoothed round trip time estimator for a single host, following
+    RFC 6298. The derived retransmission timeout is used as the time after
+    which an unanswered probe is considered lost. It is doubled whenever a
+    retransmitted probe times out, up to ``MAX_BACKOFFS`` times above the
+    timeout derived from the estimates, and recomputed at the next sample.
+    The bound keeps hosts that drop most probes, and so answer few, from
+    holding the timeout at its maximum. Timeouts of probes sent before the
+    last back off belong to the same event and are ignored.
+
+    Keyword Args:
+        initial_timeout(float): The timeout used before any sample is taken.
+        min_timeout(float): The timeout never goes below this value.
+        max_timeout(float): The timeout never goes above this value.
+
+    Attributes:
+        srtt(float): The smoothed round trip time, or ``None`` before any sample.
+        rttvar(float): The round trip time variation, or ``None`` before any sample.
+        samples(int): The number of samples taken.
+        backoffs(int): The number of times the timeout was doubled.
+    """
+    def __init__(self, initial_timeout=INITIAL_TIMEOUT,
+                 min_timeout=MIN_TIMEOUT, max_timeout=MAX_TIMEOUT):
+        self.min_timeout = min_timeout
+        self.max_timeout = max(max_timeout, min_timeout)
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+        self.backoffs = 0
+        self.last_backoff = None
+        self.base_rto = self.clamp(initial_timeout)
+        self.rto = self.base_rto
+
+    def clamp(self, value):
+        return min(max(value, self.min_timeout), self.max_timeout)
+
+    def sample(self, rtt):
+        """Update the estimates with a measured round trip time. Only times
+        of probes that were not retransmitted should be sampled.
+        """
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2.0
+        else:
+            self.rttvar = (1 - RTT_BETA) * self.rttvar + RTT_BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - RTT_ALPHA) * self.srtt + RTT_ALPHA * rtt
+
+        self.samples += 1
+        self.base_rto = self.clamp(self.srtt + max(CLOCK_GRANULARITY, RTT_K * self.rttvar))
+        self.rto = self.base_rto
+
+    def back_off(self, sent_time, now):
+        """Double the timeout after a retransmitted probe sent at
+        ``sent_time`` timed out, as in RFC 6298 section 5.5.
+
+        Returns:
+            Whether the timeout was doubled.
+        """
+        if self.last_backoff is not None and sent_time < self.last_backoff:
+            return False
+
+        rto = min(self.clamp(self.rto * 2), self.clamp(self.base_rto * 2 ** MAX_BACKOFFS))
+        if rto <= self.rto:
+            return False
+
+        self.rto = rto
+        self.backoffs += 1
+        self.last_backoff = now
+        return True
+
+    def timeout(self):
+        """Return the current timeout for a probe.
+        """
+        return self.rto
+
+
+class SystemClock(object):
+    """The clock scanners measure and wait with by default. Its time is
+    monotonic where the platform provides it, so that it doesn't jump with
+    changes of the system time, and it has no fixed origin.
+    """
+    def time(self):
+        return monotonic()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+SYSTEM_CLOCK = SystemClock()
+
+
+class RateLimiter(object):
+    """A token bucket bounding the number of probes launched per second.
+    Instances are safe to share between threads, and between scanners that
+    use the same clock.
+
+    Args:
+        rate(float): The number of probes per second.
+
+    Keyword Args:
+        burst(int): The number of probes that may be launched at once.
+            Defaults to ``RATE_BURST_TIME`` worth of probes, and at least 1.
+        clock: The clock tokens are refilled with. Defaults to ``SYSTEM_CLOCK``.
+
+    Attributes:
+        tokens(float): The number of probes that may currently be launched.
+    """
+    def __init__(self, rate, burst=None, clock=SYSTEM_CLOCK):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+
+        if burst is None:
+            burst = int(rate * RATE_BURST_TIME)
+
+        self.rate = float(rate)
+        self.burst = max(burst, 1)
+        self.clock = clock
+        self.tokens = float(self.burst)
+        self.refill_time = clock.time()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token if one is available.
+
+        Returns:
+            0.0 if a probe may be launched now, or the time to wait until the
+            next token, in seconds, in which case no token was taken.
+        """
+        with self.lock:
+            now = self.clock.time()
+            self.tokens = min(self.tokens + (now - self.refill_time) * self.rate, self.burst)
+            self.refill_time = now
+
+            if self.tokens >= 1.0 - TOKEN_TOLERANCE:
+                self.tokens = max(self.tokens - 1.0, 0.0)
+                return 0.0
+
+            return (1.0 - self.tokens) / self.rate
+
+    def wait(self):
+        """Take a token, sleeping on the clock until one is available.
+        """
+        delay = self.acquire()
+        while delay > 0:
+            self.clock.sleep(delay)
+            delay = self.acquire()
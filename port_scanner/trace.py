@@ -0,0 +1,185 @@
+"""This module provides a class ``ProbeTracer`` that records the timeline of
+a scan: when each probe was launched, when it was answered or timed out,
+which reactor wakeup reaped it, and which ports were queued again.
+
+Events are packed into a fixed-size ring buffer, so tracing allocates
+nothing per event and keeps the most recent events once the buffer is full.
+Scanners without a tracer skip tracing altogether. The timeline can be
+exported in the Chrome trace event format, which Perfetto and
+``chrome://tracing`` open::
+
+    tracer = ProbeTracer()
+    scanner = PortScanner('www.google.com', [80, 443], tracer=tracer)
+    scanner.run()
+    with open('scan.json', 'w') as trace_file:
+        tracer.dump(trace_file)
+"""
+import json
+import struct
+
+from port_scanner.values import RESULT_NAMES
+
+# number of events a tracer keeps by default
+TRACE_CAPACITY = 65536
+
+# kinds of events
+EVENT_LAUNCH = 1
+EVENT_ANSWER = 2
+EVENT_TIMEOUT = 3
+EVENT_RETRY = 4
+EVENT_WAKEUP = 5
+
+EVENT_NAMES = {
+    EVENT_LAUNCH: 'launch',
+    EVENT_ANSWER: 'answer',
+    EVENT_TIMEOUT: 'timeout',
+    EVENT_RETRY: 'retry',
+    EVENT_WAKEUP: 'wakeup',
+}
+
+# time, duration, kind, result, port, fd, address index, value
+# value is the attempt of launches, the wakeup of answers and timeouts,
+# and the number of ready file descriptors of wakeups
+EVENT_RECORD = struct.Struct('=ddBBHiII')
+
+# Chrome trace thread ids
+REACTOR_TID = 0
+PROBES_TID = 1
+
+
+class ProbeTracer(object):
+    """Records scan events into a ring buffer.
+
+    Keyword Args:
+        capacity(int): The number of events kept. Older events are
+            overwritten once the buffer is full.
+
+    Attributes:
+        count(int): The number of events recorded, including overwritten ones.
+        wakeups(int): The number of reactor wakeups recorded. Answers and
+            timeouts record the wakeup that handled them.
+    """
+    def __init__(self, capacity=TRACE_CAPACITY):
+        self.capacity = max(capacity, 1)
+        self.buffer = bytearray(self.capacity * EVENT_RECORD.size)
+        self.count = 0
+        self.wakeups = 0
+        self.addresses = []
+        self.address_indexes = {}
+
+    def address_index(self, address):
+        index = self.address_indexes.get(address)
+        if index is None:
+            index = self.address_indexes[address] = len(self.addresses)
+            self.addresses.append(address)
+
+        return index
+
+    def record(self, kind, time, duration=0.0, address=None, port=0, fd=-1,
+               result=0, value=0):
+        """Pack an event into the next slot of the ring buffer.
+        """
+        index = 0 if address is None else self.address_index(address)
+        offset = (self.count % self.capacity) * EVENT_RECORD.size
+        EVENT_RECORD.pack_into(self.buffer, offset, time, duration, kind, result,
+                               port, fd, index, value)
+        self.count += 1
+
+    def launch(self, time, probe, attempt):
+        self.record(EVENT_LAUNCH, time, address=probe.address, port=probe.port,
+                    fd=probe.file_no, value=attempt)
+
+    def finish(self, time, probe, result, timed_out=False):
+        """Record the end of a probe, answered or timed out.
+        """
+        self.record(EVENT_TIMEOUT if timed_out else EVENT_ANSWER, time,
+                    address=probe.address, port=probe.port, fd=probe.file_no,
+                    result=result, value=self.wakeups)
+
+    def retry(self, time, address, port):
+        self.record(EVENT_RETRY, time, address=address, port=port)
+
+    def wakeup(self, time, waited, ready):
+        """Record a return from waiting ``waited`` seconds on the reactor,
+        which ended at ``time`` with ``ready`` file descriptors.
+        """
+        self.wakeups += 1
+        self.record(EVENT_WAKEUP, time - waited, duration=waited, value=ready)
+
+    @property
+    def dropped(self):
+        """The number of events overwritten.
+        """
+        return max(self.count - self.capacity, 0)
+
+    def events(self):
+        """Generate the events kept, oldest first, as (time, duration, kind,
+        result, port, fd, address, value) tuples.
+        """
+        for sequence in range(self.dropped, self.count):
+            offset = (sequence % self.capacity) * EVENT_RECORD.size
+            time, duration, kind, result, port, fd, index, value = \
+                EVENT_RECORD.unpack_from(self.buffer, offset)
+            address = self.addresses[index] if self.addresses else None
+            yield time, duration, kind, result, port, fd, address, value
+
+    def clear(self):
+        self.count = 0
+        self.wakeups = 0
+
+    def to_chrome_trace(self):
+        """Return the events kept in the Chrome trace event format.
+
+        Probes are async slices from launch to answer or timeout, wakeups
+        are complete slices on a thread of their own, and retries are
+        instant events. Probes whose launch was overwritten are left out.
+
+        Returns:
+            A dictionary that serializes to a trace JSON object.
+        """
+        trace_events = [
+            {'ph': 'M', 'pid': 0, 'tid': REACTOR_TID, 'name': 'thread_name',
+             'args': {'name': 'reactor'}},
+            {'ph': 'M', 'pid': 0, 'tid': PROBES_TID, 'name': 'thread_name',
+             'args': {'name': 'probes'}},
+        ]
+        launches = {}
+        origin = None
+        probe_id = 0
+
+        for time, duration, kind, result, port, fd, address, value in self.events():
+            if origin is None:
+                origin = time
+            ts = (time - origin) * 1e6
+            name = '%s:%d' % (address, port) if kind != EVENT_WAKEUP else None
+
+            if kind == EVENT_WAKEUP:
+                trace_events.append({'ph': 'X', 'pid': 0, 'tid': REACTOR_TID, 'name': 'wait',
+                                     'cat': 'reactor', 'ts': ts, 'dur': duration * 1e6,
+                                     'args': {'ready': value}})
+            elif kind == EVENT_LAUNCH:
+                probe_id += 1
+                launches[fd] = probe_id
+                trace_events.append({'ph': 'b', 'pid': 0, 'tid': PROBES_TID, 'name': name,
+                                     'cat': 'probe', 'id': probe_id, 'ts': ts,
+                                     'args': {'attempt': value, 'fd': fd}})
+            elif kind in (EVENT_ANSWER, EVENT_TIMEOUT):
+                launched = launches.pop(fd, None)
+                if launched is None:
+                    continue
+                trace_events.append({'ph': 'e', 'pid': 0, 'tid': PROBES_TID, 'name': name,
+                                     'cat': 'probe', 'id': launched, 'ts': ts,
+                                     'args': {'result': RESULT_NAMES.get(result, result),
+                                              'event': EVENT_NAMES[kind],
+                                              'wakeup': value}})
+            elif kind == EVENT_RETRY:
+                trace_events.append({'ph': 'i', 'pid': 0, 'tid': PROBES_TID, 's': 't',
+                                     'name': 'retry ' + name, 'cat': 'retry', 'ts': ts})
+
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms',
+                'otherData': {'events': self.count, 'dropped': self.dropped}}
+
+    def dump(self, file_obj):
+        """Write the events kept to a file object as Chrome trace JSON.
+        """
+        json.dump(self.to_chrome_trace(), file_obj)
@@ -6,3 +6,11 @@ RESULT_UNKNOWN = 0
 RESULT_OPEN = 1
 RESULT_CLOSED = 2
 RESULT_FILTERED = 3
+
+# Names of the status results, as displayed and written out
+RESULT_NAMES = {
+    RESULT_UNKNOWN: 'unknown',
+    RESULT_OPEN: 'open',
+    RESULT_CLOSED: 'closed',
+    RESULT_FILTERED: 'filtered'
+}
@@ -4,5 +4,6 @@ import port_scanner
 setup(name='port_scanner',
       version='0.0.1',
       packages=['port_scanner'],
+      package_data={'port_scanner': ['data/common-ports']},
       scripts=['portscanner']
 )
@@ -1,5 +1,6 @@
 from port_scanner.values import *
 import random
+import time
 
 counter = 2
 
@@ -11,13 +12,18 @@ def get_next_counter():
 class MockProbe(object):
     def __init__(self, ip_addr, port):
         self.file_no = get_next_counter()
+        self.address = ip_addr
         self.port = port
         self.result = RESULT_UNKNOWN
+        self.start_time = time.time()
 
     def close(self):
         pass
 
-    def analyze(self):
+    def rtt(self):
+        return time.time() - self.start_time
+
+    def analyze(self, verify=True):
         if self.result is not RESULT_UNKNOWN:
             return self.result
 
@@ -0,0 +1,118 @@
+import unittest
+import socket
+
+from port_scanner.values import *
+
+try:
+    import asyncio
+    from port_scanner.aio import *
+    from port_scanner.timing import MIN_TIMEOUT
+except (ImportError, SyntaxError):
+    # the asyncio engine requires Python 3.6 or later
+    asyncio = None
+
+
+def closed_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+@unittest.skipIf(asyncio is None, 'asyncio engine not supported on this Python version')
+class AsyncScannerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(5)
+        self.open_port = self.listener.getsockname()[1]
+        self.closed_port = closed_port()
+
+        self.loop = new_event_loop(use_uvloop=False)
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+        self.listener.close()
+
+    def test_scan(self):
+        scanner = AsyncPortScanner('127.0.0.1', [self.open_port, self.closed_port])
+        results_map = self.loop.run_until_complete(scanner.scan())
+
+        self.assertEqual(results_map, {self.open_port: RESULT_OPEN,
+                                       self.closed_port: RESULT_CLOSED})
+
+    def test_timeout_follows_rtt(self):
+        scanner = AsyncPortScanner('127.0.0.1', [self.open_port, self.closed_port])
+        self.loop.run_until_complete(scanner.scan())
+
+        self.assertEqual(scanner.rtt_estimator.samples, 2)
+        self.assertEqual(scanner.rtt_estimator.timeout(), MIN_TIMEOUT)
+
+    def test_stream(self):
+        scanner = AsyncPortScanner('127.0.0.1', [self.open_port, self.closed_port])
+        stream = scanner.stream()
+
+        results = []
+        for _ in range(2):
+            results.append(self.loop.run_until_complete(stream.__anext__()))
+
+        self.assertEqual(sorted(results), sorted([(self.open_port, RESULT_OPEN),
+                                                  (self.closed_port, RESULT_CLOSED)]))
+
+        with self.assertRaises(StopAsyncIteration):
+            self.loop.run_until_complete(stream.__anext__())
+
+    def test_stream_closed_early(self):
+        # full accept queues leave connects unanswered
+        silent = []
+        for _ in range(5):
+            server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            server.bind(('127.0.0.1', 0))
+            server.listen(0)
+            filler = socket.create_connection(server.getsockname())
+            silent.extend([server, filler])
+
+        ports = [self.open_port] + [sock.getsockname()[1] for sock in silent[::2]]
+        scanner = AsyncPortScanner('127.0.0.1', ports, timeout=5.0)
+        stream = scanner.stream()
+        try:
+            self.assertEqual(self.loop.run_until_complete(stream.__anext__()),
+                             (self.open_port, RESULT_OPEN))
+            self.loop.run_until_complete(stream.aclose())
+
+            all_tasks = getattr(asyncio, 'all_tasks', None) or asyncio.Task.all_tasks
+            self.assertEqual([task for task in all_tasks(self.loop) if not task.done()], [])
+        finally:
+            for sock in silent:
+                sock.close()
+
+    def test_scans_share_loop(self):
+        scanners = [AsyncPortScanner('127.0.0.1', [self.open_port]) for _ in range(5)]
+        results = self.loop.run_until_complete(
+            asyncio.gather(*[scanner.scan() for scanner in scanners]))
+
+        for results_map in results:
+            self.assertEqual(results_map, {self.open_port: RESULT_OPEN})
+
+    def test_invalid_host(self):
+        scanner = AsyncPortScanner('bad host name', [80])
+
+        with self.assertRaises(InvalidHostError):
+            self.loop.run_until_complete(scanner.scan())
+
+
+    def test_no_addresses(self):
+        addr_info = self.loop.create_future()
+        addr_info.set_result([])
+        self.loop.getaddrinfo = lambda *args, **kwargs: addr_info
+        scanner = AsyncPortScanner('empty.example', [80])
+
+        with self.assertRaises(InvalidHostError):
+            self.loop.run_until_complete(scanner.scan())
+
+if __name__ == "__main__":
+    unittest.main()
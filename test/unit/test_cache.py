@@ -0,0 +1,77 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from port_scanner.cache import *
+from port_scanner.values import *
+
+
+class ResultCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResultCache(ttls={RESULT_OPEN: 100.0, RESULT_FILTERED: 10.0})
+
+    def tearDown(self):
+        self.cache.close()
+
+    def test_lookup(self):
+        self.cache.store('10.0.0.1', 80, RESULT_OPEN, now=1000.0)
+        self.cache.flush()
+
+        self.assertEqual(self.cache.lookup('10.0.0.1', 80, now=1050.0), RESULT_OPEN)
+        self.assertIsNone(self.cache.lookup('10.0.0.2', 80, now=1050.0))
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_ttl_per_result(self):
+        self.cache.store('10.0.0.1', 80, RESULT_OPEN, now=1000.0)
+        self.cache.store('10.0.0.1', 81, RESULT_FILTERED, now=1000.0)
+        self.cache.flush()
+
+        self.assertEqual(self.cache.lookup('10.0.0.1', 81, now=1005.0), RESULT_FILTERED)
+        self.assertIsNone(self.cache.lookup('10.0.0.1', 81, now=1020.0))
+        self.assertEqual(self.cache.lookup('10.0.0.1', 80, now=1020.0), RESULT_OPEN)
+        self.assertIsNone(self.cache.lookup('10.0.0.1', 80, now=1200.0))
+
+    def test_uncached_results(self):
+        self.cache.store('10.0.0.1', 80, RESULT_CLOSED)
+        self.cache.store('10.0.0.1', 81, RESULT_UNKNOWN)
+        self.cache.flush()
+
+        self.assertEqual(len(self.cache), 0)
+
+    def test_replace(self):
+        self.cache.store('10.0.0.1', 80, RESULT_FILTERED, now=1000.0)
+        self.cache.store('10.0.0.1', 80, RESULT_OPEN, now=1001.0)
+        self.cache.flush()
+
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.lookup('10.0.0.1', 80, now=1002.0), RESULT_OPEN)
+
+    def test_eviction(self):
+        self.cache.max_entries = 3
+        for port in range(1, 6):
+            self.cache.store('10.0.0.1', port, RESULT_OPEN, now=1000.0 + port)
+        self.cache.flush()
+
+        self.assertEqual(len(self.cache), 3)
+        self.assertIsNone(self.cache.lookup('10.0.0.1', 2, now=1010.0))
+        self.assertEqual(self.cache.lookup('10.0.0.1', 5, now=1010.0), RESULT_OPEN)
+
+    def test_persistent(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'results.db')
+        try:
+            cache = ResultCache(path)
+            cache.store('10.0.0.1', 443, RESULT_OPEN)
+            cache.close()
+
+            cache = ResultCache(path)
+            self.assertEqual(cache.lookup('10.0.0.1', 443), RESULT_OPEN)
+            cache.close()
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
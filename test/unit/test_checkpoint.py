@@ -0,0 +1,74 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from port_scanner.checkpoint import *
+from port_scanner.values import *
+
+
+class CheckpointTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'scan.checkpoint')
+        self.addresses = ['10.0.0.1', '10.0.0.2']
+        self.port_list = [80, 22, 443, 65535, 1]
+        self.checkpoint = Checkpoint.create(self.path, self.addresses, self.port_list, seed=42)
+
+    def tearDown(self):
+        self.checkpoint.close()
+        shutil.rmtree(self.directory)
+
+    def test_create(self):
+        self.assertEqual(self.checkpoint.seed, 42)
+        self.assertEqual(self.checkpoint.addresses, self.addresses)
+        self.assertEqual(self.checkpoint.port_list, [1, 22, 80, 443, 65535])
+        self.assertEqual(os.path.getsize(self.path), Checkpoint.size(2))
+
+    def test_random_seed(self):
+        checkpoint = Checkpoint.create(self.path + '2', self.addresses, self.port_list)
+        self.assertIsNotNone(checkpoint.seed)
+        checkpoint.close()
+
+    def test_mark(self):
+        self.checkpoint.mark('10.0.0.1', 80, RESULT_OPEN)
+        self.checkpoint.mark('10.0.0.1', 81, RESULT_FILTERED)
+        self.checkpoint.mark('10.0.0.2', 65535, RESULT_CLOSED)
+
+        self.assertTrue(self.checkpoint.is_done('10.0.0.1', 80))
+        self.assertFalse(self.checkpoint.is_done('10.0.0.2', 80))
+        self.assertEqual(list(self.checkpoint.results('10.0.0.1')),
+                         [(80, RESULT_OPEN), (81, RESULT_FILTERED)])
+        self.assertEqual(self.checkpoint.remaining_ports('10.0.0.1'), [1, 22, 443, 65535])
+        self.assertEqual(self.checkpoint.remaining_ports('10.0.0.2'), [1, 22, 80, 443])
+
+    def test_load(self):
+        self.checkpoint.mark('10.0.0.2', 22, RESULT_CLOSED)
+        self.checkpoint.close()
+
+        self.checkpoint = Checkpoint.load(self.path)
+        self.assertEqual(self.checkpoint.seed, 42)
+        self.assertEqual(self.checkpoint.addresses, self.addresses)
+        self.assertEqual(list(self.checkpoint.results('10.0.0.2')), [(22, RESULT_CLOSED)])
+        self.assertEqual(self.checkpoint.remaining_ports('10.0.0.2'), [1, 80, 443, 65535])
+
+    def test_unknown_address(self):
+        with self.assertRaises(InvalidCheckpointError):
+            self.checkpoint.mark('10.0.0.3', 22, RESULT_OPEN)
+
+    def test_load_invalid(self):
+        path = os.path.join(self.directory, 'other')
+        for contents in [b'', b'not a checkpoint file']:
+            with open(path, 'wb') as file_obj:
+                file_obj.write(contents)
+
+            with self.assertRaises(InvalidCheckpointError):
+                Checkpoint.load(path)
+
+        with self.assertRaises(InvalidCheckpointError):
+            Checkpoint.load(os.path.join(self.directory, 'missing'))
+
+
+if __name__ == "__main__":
+    unittest.main()
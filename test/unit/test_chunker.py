@@ -200,5 +200,82 @@ class ChunkerTestCase(unittest.TestCase):
         with self.assertRaises(ChunkBoundsError):
             random_chunk_size(lower, upper)
 
+
+class PortPermutationTestCase(unittest.TestCase):
+
+    def test_permutation_covers_range(self):
+        for size in [0, 1, 2, 3, 17, 1000, 4097]:
+            permutation = PortPermutation(size)
+            values = list(permutation)
+
+            self.assertEqual(len(values), size)
+            self.assertEqual(set(values), set(range(size)))
+            self.assertEqual(permutation.remaining(), 0)
+            self.assertIsNone(permutation.next())
+
+    def test_permutation_is_seedable(self):
+        first = list(PortPermutation(500, seed=7))
+        second = list(PortPermutation(500, seed=7))
+        other = list(PortPermutation(500, seed=8))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    def test_permutation_shuffles(self):
+        values = list(PortPermutation(1000, seed=1))
+        self.assertNotEqual(values, sorted(values))
+
+
+class PermutedChunkerTestCase(unittest.TestCase):
+
+    def drain(self, chunker):
+        chunks = []
+        chunk = chunker.get_chunk()
+        while chunk:
+            chunks.append(chunk)
+            chunk = chunker.get_chunk()
+
+        return chunks
+
+    def test_chunks_cover_port_list(self):
+        sample_list = random_sample(VALID_LIST)
+        chunker = PermutedPortChunker(sample_list)
+
+        drawn = []
+        for chunk in self.drain(chunker):
+            self.assertLessEqual(len(chunk), CHUNK_SIZE_UPPER_LIMIT)
+            drawn.extend(chunk)
+
+        self.assertEqual(len(drawn), len(set(drawn)))
+        self.assertEqual(set(drawn), set(sample_list))
+
+    def test_first_class_ports_first(self):
+        port_list = list(FIRST_CLASS_PORTS) + random_sample(VALID_LIST)
+        chunker = PermutedPortChunker(port_list)
+
+        chunk = chunker.get_chunk()
+        self.assertEqual(set(chunk), FIRST_CLASS_PORTS)
+
+    def test_tiers_come_in_rank_order(self):
+        chunker = PermutedPortChunker(VALID_LIST, seed=1)
+
+        drawn = []
+        for chunk in self.drain(chunker):
+            drawn.extend(chunk)
+
+        lower = 0
+        for tier_ports in TIER_PORTS:
+            self.assertEqual(set(drawn[lower:lower + len(tier_ports)]), set(tier_ports))
+            lower += len(tier_ports)
+        self.assertEqual(len(drawn), len(VALID_LIST))
+
+    def test_chunks_are_seedable(self):
+        sample_list = random_sample(VALID_LIST, 100)
+
+        first = self.drain(PermutedPortChunker(sample_list, seed=3))
+        second = self.drain(PermutedPortChunker(sample_list, seed=3))
+
+        self.assertEqual(first, second)
+
 if __name__ == "__main__":
     unittest.main()
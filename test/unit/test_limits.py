@@ -0,0 +1,164 @@
+import errno
+import socket
+import unittest
+
+import mock
+
+from port_scanner import limits
+from port_scanner.limits import *
+from port_scanner.metrics import ScanMetrics
+from port_scanner.scanner import PortScanner, MAX_RESOURCE_RETRIES
+from port_scanner.simulator import HostModel, SimulatedNetwork
+from port_scanner.values import RESULT_OPEN, RESULT_CLOSED
+
+INFINITY = getattr(limits.resource, 'RLIM_INFINITY', -1)
+
+
+@unittest.skipIf(limits.resource is None, 'resource module not available')
+class FdLimitTestCase(unittest.TestCase):
+
+    @mock.patch('port_scanner.limits.resource.getrlimit', return_value=(256, INFINITY))
+    def test_get_fd_limit(self, getrlimit):
+        self.assertEqual(get_fd_limit(), (256, None))
+
+    @mock.patch('port_scanner.limits.resource.setrlimit')
+    @mock.patch('port_scanner.limits.resource.getrlimit', return_value=(1024, 4096))
+    def test_raise_to_hard_limit(self, getrlimit, setrlimit):
+        self.assertEqual(raise_fd_limit(), 4096)
+        setrlimit.assert_called_once_with(limits.resource.RLIMIT_NOFILE, (4096, 4096))
+
+    @mock.patch('port_scanner.limits.resource.setrlimit')
+    @mock.patch('port_scanner.limits.resource.getrlimit', return_value=(1024, 4096))
+    def test_raise_to_target(self, getrlimit, setrlimit):
+        self.assertEqual(raise_fd_limit(2048), 2048)
+        self.assertEqual(raise_fd_limit(512), 1024)
+        setrlimit.assert_called_once_with(limits.resource.RLIMIT_NOFILE, (2048, 4096))
+
+    @mock.patch('port_scanner.limits.resource.setrlimit')
+    @mock.patch('port_scanner.limits.resource.getrlimit', return_value=(256, INFINITY))
+    def test_raise_unlimited_hard_limit(self, getrlimit, setrlimit):
+        # macOS only accepts up to OPEN_MAX
+        self.assertEqual(raise_fd_limit(), OPEN_MAX)
+
+    @mock.patch('port_scanner.limits.resource.setrlimit', side_effect=ValueError)
+    @mock.patch('port_scanner.limits.resource.getrlimit', return_value=(256, 4096))
+    def test_raise_refused(self, getrlimit, setrlimit):
+        self.assertEqual(raise_fd_limit(), 256)
+
+    @mock.patch('port_scanner.limits.count_open_fds', return_value=10)
+    @mock.patch('port_scanner.limits.resource.getrlimit', return_value=(256, 4096))
+    def test_fd_budget(self, getrlimit, count_open_fds):
+        self.assertEqual(fd_budget(), 256 - 10 - FD_HEADROOM)
+        self.assertEqual(fd_budget(headroom=300), 1)
+
+    @mock.patch('port_scanner.limits.resource.getrlimit', return_value=(INFINITY, INFINITY))
+    def test_fd_budget_unlimited(self, getrlimit):
+        self.assertIsNone(fd_budget())
+
+    def test_count_open_fds(self):
+        count = count_open_fds()
+        if count is not None:
+            sock = socket.socket()
+            self.assertEqual(count_open_fds(), count + 1)
+            sock.close()
+
+    def test_is_resource_error(self):
+        self.assertTrue(is_resource_error(socket.error(errno.EMFILE, 'Too many open files')))
+        self.assertTrue(is_resource_error(socket.error(errno.ENOBUFS, 'No buffer space')))
+        self.assertFalse(is_resource_error(socket.error(errno.ENETUNREACH, 'Unreachable')))
+        self.assertFalse(is_resource_error(ValueError()))
+
+
+class ScannerBackpressureTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.network = SimulatedNetwork({'10.0.0.1': HostModel(open_ports=[22])})
+
+    def exhausted_after(self, count):
+        """Return a probe factory refusing probes once ``count`` are in flight.
+        """
+        def probe_factory(address, port):
+            if len(self.network.probes) >= count:
+                raise socket.error(errno.EMFILE, 'Too many open files')
+            return self.network.connect(address, port)
+
+        return probe_factory
+
+    def scanner(self, probe_factory, **kwargs):
+        scanner_kwargs = self.network.scanner_kwargs()
+        scanner_kwargs['probe_factory'] = probe_factory
+        scanner_kwargs.update(kwargs)
+        return PortScanner('10.0.0.1', range(1, 201), **scanner_kwargs)
+
+    def test_window_capped(self):
+        scanner = self.scanner(self.exhausted_after(30), adaptive=False, window=100)
+        results_map = scanner.run()
+
+        self.assertEqual(len(results_map), 200)
+        self.assertEqual(results_map[22], RESULT_OPEN)
+        self.assertEqual(results_map[23], RESULT_CLOSED)
+        self.assertEqual(scanner.window, 100)
+        self.assertEqual(scanner.metrics.in_flight_peak, 30)
+        self.assertEqual(scanner.metrics.launched, 200)
+
+    def test_cap_grows_back(self):
+        refusals = [1]
+
+        def probe_factory(address, port):
+            if refusals[0] and len(self.network.probes) >= 30:
+                refusals[0] -= 1
+                raise socket.error(errno.EMFILE, 'Too many open files')
+            return self.network.connect(address, port)
+
+        scanner = self.scanner(probe_factory, adaptive=False, window=100)
+        self.assertEqual(len(scanner.run()), 200)
+        self.assertEqual(scanner.metrics.resource_errors, 1)
+        self.assertGreater(scanner.metrics.in_flight_peak, 30)
+        self.assertIsNone(scanner.fd_cap)
+
+        # the next scan starts with the full window
+        scanner.metrics = ScanMetrics()
+        self.assertEqual(len(scanner.run()), 200)
+        self.assertEqual(scanner.metrics.in_flight_peak, 100)
+
+    def test_retry_when_nothing_in_flight(self):
+        refusals = [2]
+
+        def probe_factory(address, port):
+            if refusals[0]:
+                refusals[0] -= 1
+                raise socket.error(errno.ENOBUFS, 'No buffer space available')
+            return self.network.connect(address, port)
+
+        scanner = self.scanner(probe_factory)
+        self.assertEqual(len(scanner.run()), 200)
+        self.assertEqual(scanner.metrics.resource_errors, 2)
+
+    def test_retries_bounded(self):
+        def probe_factory(address, port):
+            raise socket.error(errno.EADDRNOTAVAIL, 'Cannot assign requested address')
+
+        scanner = self.scanner(probe_factory)
+        with self.assertRaises(socket.error):
+            scanner.run()
+        self.assertEqual(scanner.metrics.resource_errors, MAX_RESOURCE_RETRIES + 1)
+
+    def test_other_errors_raised(self):
+        def probe_factory(address, port):
+            raise socket.error(errno.ENETUNREACH, 'Network is unreachable')
+
+        with self.assertRaises(socket.error):
+            self.scanner(probe_factory).run()
+
+    @mock.patch('port_scanner.scanner.fd_budget', return_value=50)
+    def test_window_fits_budget(self, fd_budget):
+        scanner = PortScanner('10.0.0.1', [22], raise_fd_limit=True, fd_headroom=10)
+        fd_budget.assert_called_once_with(10, True)
+        self.assertEqual(scanner.fd_budget, 50)
+        self.assertEqual(scanner.window, 50)
+
+    @mock.patch('port_scanner.scanner.fd_budget', return_value=50)
+    def test_simulated_probes_not_budgeted(self, fd_budget):
+        scanner = PortScanner('10.0.0.1', [22], **self.network.scanner_kwargs())
+        self.assertIsNone(scanner.fd_budget)
+        self.assertFalse(fd_budget.called)
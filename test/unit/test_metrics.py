@@ -0,0 +1,125 @@
+import unittest
+
+from port_scanner.metrics import *
+from port_scanner.scanner import PortScanner
+from port_scanner.simulator import HostModel, SimulatedNetwork
+from port_scanner.values import RESULT_FILTERED
+
+
+class HistogramTestCase(unittest.TestCase):
+
+    def test_observe(self):
+        histogram = Histogram([1.0, 2.0])
+        for value in (0.5, 1.0, 1.5, 3.0):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.count, 4)
+        self.assertEqual(histogram.sum, 6.0)
+        self.assertEqual(histogram.cumulative_counts(),
+                         [(1.0, 2), (2.0, 3), (float('inf'), 4)])
+
+    def test_as_dict(self):
+        histogram = Histogram([1.0])
+        histogram.observe(2.0)
+        self.assertEqual(histogram.as_dict(), {'buckets': [[1.0, 0]], 'sum': 2.0, 'count': 1})
+
+
+class ScanMetricsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = ScanMetrics()
+
+    def test_on_launch(self):
+        self.metrics.on_launch(3)
+        self.metrics.on_launch(1)
+        self.assertEqual(self.metrics.launched, 2)
+        self.assertEqual(self.metrics.in_flight_peak, 3)
+
+    def test_on_wakeup(self):
+        self.metrics.on_wakeup(0.25, 10)
+        self.metrics.on_wakeup(0.5, 20)
+        self.assertEqual(self.metrics.wakeups, 2)
+        self.assertEqual(self.metrics.wait_seconds, 0.75)
+        self.assertEqual(self.metrics.in_flight.sum, 30)
+
+    def test_on_answer(self):
+        self.metrics.on_answer(0.01)
+        self.metrics.on_answer(None)
+        self.assertEqual(self.metrics.reaped, 2)
+        self.assertEqual(self.metrics.rtt_seconds.count, 1)
+
+    def test_reset(self):
+        self.metrics.on_launch(3)
+        self.metrics.on_answer(0.01)
+        self.metrics.reset()
+        self.assertEqual(self.metrics.launched, 0)
+        self.assertEqual(self.metrics.in_flight_peak, 0)
+        self.assertEqual(self.metrics.rtt_seconds.count, 0)
+
+    def test_as_dict(self):
+        self.metrics.on_launch(1)
+        metrics = self.metrics.as_dict()
+        self.assertEqual(metrics['launched'], 1)
+        self.assertEqual(metrics['sleep_seconds'], 0.0)
+        self.assertEqual(metrics['rtt_seconds']['count'], 0)
+        self.assertEqual(len(metrics['in_flight']['buckets']), len(DEPTH_BUCKETS))
+
+    def test_to_prometheus(self):
+        self.metrics.on_launch(1)
+        self.metrics.on_answer(0.003)
+        text = self.metrics.to_prometheus(labels={'host': '10.0.0.1'})
+        lines = text.splitlines()
+
+        self.assertIn('# TYPE portscanner_launched_total counter', lines)
+        self.assertIn('portscanner_launched_total{host="10.0.0.1"} 1', lines)
+        self.assertIn('# TYPE portscanner_in_flight_peak gauge', lines)
+        self.assertIn('# TYPE portscanner_rtt_seconds histogram', lines)
+        self.assertIn('portscanner_rtt_seconds_bucket{host="10.0.0.1",le="0.0025"} 0', lines)
+        self.assertIn('portscanner_rtt_seconds_bucket{host="10.0.0.1",le="0.005"} 1', lines)
+        self.assertIn('portscanner_rtt_seconds_bucket{host="10.0.0.1",le="+Inf"} 1', lines)
+        self.assertIn('portscanner_rtt_seconds_count{host="10.0.0.1"} 1', lines)
+        self.assertTrue(text.endswith('\n'))
+
+    def test_prefix(self):
+        self.assertIn('scan_launched_total 0', self.metrics.to_prometheus(prefix='scan'))
+
+
+class ScannerMetricsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        host = HostModel(open_ports=[22], filtered_ports=[25], latency=0.01)
+        self.network = SimulatedNetwork({'10.0.0.1': host}, seed=1)
+        self.scanner = PortScanner('10.0.0.1', range(1, 101), max_retries=1,
+                                   **self.network.scanner_kwargs())
+
+    def test_run(self):
+        self.scanner.run()
+        metrics = self.scanner.metrics
+
+        # port 25 is probed twice
+        self.assertEqual(metrics.launched, 101)
+        self.assertEqual(metrics.reaped, 99)
+        self.assertEqual(metrics.timed_out, 2)
+        self.assertEqual(metrics.retried, 1)
+        self.assertEqual(metrics.rtt_seconds.count, 99)
+        self.assertGreater(metrics.wakeups, 0)
+        self.assertGreater(metrics.wait_seconds, 0.0)
+        self.assertLessEqual(metrics.in_flight_peak, self.scanner.window)
+
+    def test_poll(self):
+        self.scanner.poll([22, 23, 25], 1.0)
+        metrics = self.scanner.metrics
+
+        self.assertEqual(self.scanner.results_map[25], RESULT_FILTERED)
+        self.assertEqual(metrics.launched, 3)
+        self.assertEqual(metrics.reaped, 2)
+        self.assertEqual(metrics.timed_out, 1)
+        self.assertEqual(metrics.in_flight_peak, 3)
+        self.assertAlmostEqual(metrics.wait_seconds + metrics.sleep_seconds, 1.0)
+
+    def test_shared_metrics(self):
+        metrics = ScanMetrics()
+        scanner = PortScanner('10.0.0.1', [22], metrics=metrics,
+                              **SimulatedNetwork({}).scanner_kwargs())
+        self.assertIs(scanner.metrics, metrics)
@@ -0,0 +1,121 @@
+import unittest
+import json
+import math
+from io import BytesIO
+from StringIO import StringIO
+
+from port_scanner.output import *
+from port_scanner.values import *
+
+
+RECORDS = [
+    ('10.0.0.1', 80, RESULT_OPEN, 0.015),
+    ('10.0.0.1', 81, RESULT_CLOSED, 0.25),
+    ('10.0.0.2', 443, RESULT_FILTERED, None),
+    ('2001:db8::1', 22, RESULT_UNKNOWN, None),
+]
+
+
+def write_records(writer):
+    for record in RECORDS:
+        writer.write(*record)
+
+    writer.close()
+
+
+class WriterTestCase(unittest.TestCase):
+
+    def test_jsonl(self):
+        stream = StringIO()
+        write_records(JsonLinesWriter(stream))
+
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), len(RECORDS))
+        self.assertEqual(json.loads(lines[0]), {'address': '10.0.0.1', 'port': 80,
+                                                'status': 'open', 'rtt': 0.015})
+        self.assertEqual(json.loads(lines[2])['rtt'], None)
+
+    def test_csv(self):
+        stream = StringIO()
+        write_records(CsvWriter(stream))
+
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(lines[0], 'address,port,status,rtt')
+        self.assertEqual(lines[1], '10.0.0.1,80,open,0.015000')
+        self.assertEqual(lines[3], '10.0.0.2,443,filtered,')
+        self.assertEqual(len(lines), len(RECORDS) + 1)
+
+    def test_binary_round_trip(self):
+        stream = BytesIO()
+        write_records(BinaryWriter(stream))
+
+        self.assertEqual(len(stream.getvalue()),
+                         len(BINARY_MAGIC) + len(RECORDS) * BINARY_RECORD.size)
+
+        stream.seek(0)
+        records = list(read_binary(stream))
+        self.assertEqual(len(records), len(RECORDS))
+        for (address, port, result, rtt), expected in zip(records, RECORDS):
+            self.assertEqual((address, port, result), expected[:3])
+            if expected[3] is None:
+                self.assertIsNone(rtt)
+            else:
+                self.assertAlmostEqual(rtt, expected[3], places=6)
+
+    def test_binary_short_reads(self):
+        stream = BytesIO()
+        write_records(BinaryWriter(stream))
+        # a truncated last record
+        data = stream.getvalue() + b'\x00' * 5
+
+        class Pipe(object):
+            def __init__(self):
+                self.position = 0
+
+            def read(self, size):
+                size = min(size, 7)
+                chunk = data[self.position:self.position + size]
+                self.position += len(chunk)
+                return chunk
+
+        records = list(read_binary(Pipe()))
+        self.assertEqual([record[:3] for record in records],
+                         [record[:3] for record in RECORDS])
+
+    def test_binary_invalid(self):
+        with self.assertRaises(InvalidBinaryError):
+            list(read_binary(BytesIO(b'nope')))
+
+    def test_batching(self):
+        stream = StringIO()
+        writer = JsonLinesWriter(stream, batch_size=3)
+
+        writer.write('10.0.0.1', 1, RESULT_OPEN)
+        writer.write('10.0.0.1', 2, RESULT_OPEN)
+        self.assertEqual(stream.getvalue(), '')
+
+        writer.write('10.0.0.1', 3, RESULT_OPEN)
+        self.assertEqual(len(stream.getvalue().splitlines()), 3)
+
+        writer.write('10.0.0.1', 4, RESULT_OPEN)
+        writer.close()
+        self.assertEqual(len(stream.getvalue().splitlines()), 4)
+        self.assertEqual(writer.count, 4)
+
+    def test_on_result(self):
+        stream = StringIO()
+        writer = JsonLinesWriter(stream)
+        writer.on_result(('10.0.0.1', 80), RESULT_OPEN, None)
+        writer.close()
+
+        self.assertEqual(json.loads(stream.getvalue())['port'], 80)
+
+    def test_create_writer(self):
+        self.assertIsInstance(create_writer('csv', StringIO()), CsvWriter)
+
+        with self.assertRaises(UnknownFormatError):
+            create_writer('xml', StringIO())
+
+
+if __name__ == "__main__":
+    unittest.main()
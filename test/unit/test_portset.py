@@ -0,0 +1,100 @@
+import unittest
+import random
+
+from port_scanner.portset import *
+
+
+class PortSetTestCase(unittest.TestCase):
+
+    def test_init(self):
+        port_set = PortSet([80, 443, 80, -1, 70000])
+
+        self.assertEqual(list(port_set), [80, 443])
+        self.assertEqual(len(port_set), 2)
+        self.assertIn(443, port_set)
+        self.assertNotIn(444, port_set)
+        self.assertNotIn(70000, port_set)
+
+    def test_from_range(self):
+        for lower, upper in [(1, 65535), (3, 5), (8, 15), (7, 8), (100, 100), (0, 1024)]:
+            port_set = PortSet.from_range(lower, upper)
+            self.assertEqual(list(port_set), list(range(lower, upper + 1)))
+
+        self.assertEqual(len(PortSet.from_range(-5, 70000)), PORT_COUNT)
+        self.assertFalse(PortSet.from_range(5, 4))
+
+    def test_from_string(self):
+        port_set = PortSet.from_string('1,2-8,9,10-20,443')
+
+        self.assertEqual(list(port_set), list(range(1, 21)) + [443])
+        self.assertEqual(port_set.to_string(), '1-20,443')
+        self.assertEqual(PortSet.from_string(port_set.to_string()), port_set)
+
+    def test_from_string_invalid(self):
+        for port_string in ['a', '1,,2', '1-', '5-3']:
+            with self.assertRaises(InvalidPortSpecError):
+                PortSet.from_string(port_string)
+
+    def test_set_operations(self):
+        a = PortSet.from_string('1-100')
+        b = PortSet.from_string('50-150')
+
+        self.assertEqual(a | b, PortSet.from_range(1, 150))
+        self.assertEqual(a & b, PortSet.from_range(50, 100))
+        self.assertEqual(a - b, PortSet.from_range(1, 49))
+        self.assertEqual(a - [1, 2], PortSet.from_range(3, 100))
+        self.assertEqual(a, set(range(1, 101)))
+
+    def test_in_place_operations(self):
+        port_set = PortSet.from_string('1-10')
+        port_set -= PortSet([5])
+        port_set |= [20]
+        port_set &= PortSet.from_string('2-20')
+
+        self.assertEqual(port_set.to_string(), '2-4,6-10,20')
+
+    def test_add_and_remove(self):
+        port_set = PortSet()
+        port_set.add(65535)
+        port_set.add(0)
+        self.assertEqual(list(port_set), [0, 65535])
+
+        port_set.remove(0)
+        port_set.discard(1)
+        self.assertEqual(list(port_set), [65535])
+
+        with self.assertRaises(KeyError):
+            port_set.remove(0)
+        with self.assertRaises(ValueError):
+            port_set.add(65536)
+
+    def test_copy(self):
+        port_set = PortSet([1, 2])
+        copy = port_set.copy()
+        copy.add(3)
+
+        self.assertEqual(list(port_set), [1, 2])
+
+    def test_bounds(self):
+        self.assertIsNone(PortSet().bounds())
+        self.assertEqual(PortSet([9, 1000, 63]).bounds(), (9, 1000))
+
+    def test_intervals(self):
+        port_set = PortSet([1, 2, 3, 7, 9, 10])
+        self.assertEqual(list(port_set.intervals()), [(1, 3), (7, 7), (9, 10)])
+
+    def test_sample(self):
+        rng = random.Random(4)
+        for port_set in [PortSet.from_range(1, 65535), PortSet([1, 30000, 65000, 65001])]:
+            sample = port_set.sample(3, rng)
+            self.assertEqual(len(sample), 3)
+            self.assertEqual(len(set(sample)), 3)
+            for port in sample:
+                self.assertIn(port, port_set)
+
+        self.assertEqual(sorted(PortSet([5, 6]).sample(10, rng)), [5, 6])
+        self.assertEqual(PortSet().sample(10, rng), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -40,6 +40,19 @@ class ProbeTestCase(unittest.TestCase):
         self.port = 80
         self.port_probe = PortProbe(self.ip_addr, self.port)
 
+    @mock.patch('port_scanner.probe.create_tcp_socket')
+    def test_init_ipv6(self, create_tcp):
+        create_tcp.return_value = self.mock_socket
+        probe = PortProbe('2001:db8::1', 443)
+
+        create_tcp.assert_called_with(socket.AF_INET6)
+        self.mock_socket.connect_ex.assert_called_with(('2001:db8::1', 443))
+        self.assertEqual(probe.address, '2001:db8::1')
+
+    def test_address_family(self):
+        self.assertEqual(address_family('10.0.0.1'), socket.AF_INET)
+        self.assertEqual(address_family('::1'), socket.AF_INET6)
+
     def test_init_result_value_unknown(self):
         self.assertEqual(self.port_probe.result, RESULT_UNKNOWN)
 
@@ -89,6 +102,50 @@ class ProbeTestCase(unittest.TestCase):
         result = self.port_probe.analyze()
         self.assertEqual(result, RESULT_UNKNOWN)
 
+    def test_rtt(self):
+        self.assertIsNone(self.port_probe.rtt())
+
+        self.mock_socket.getsockopt.return_value = ECONNREFUSED
+        self.port_probe.analyze()
+
+        rtt = self.port_probe.rtt()
+        self.assertEqual(rtt, self.port_probe.reap_time - self.port_probe.start_time)
+        self.assertGreaterEqual(rtt, 0.0)
+
+    @mock.patch('time.time', side_effect=[1e9, 1e9 - 3600.0])
+    @mock.patch('port_scanner.probe.create_tcp_socket')
+    def test_rtt_ignores_system_time(self, create_tcp, system_time):
+        create_tcp.return_value = self.mock_socket
+        port_probe = PortProbe(self.ip_addr, self.port)
+        # the system time is set back an hour before the answer
+        self.mock_socket.getsockopt.return_value = ECONNREFUSED
+        port_probe.analyze()
+
+        self.assertGreaterEqual(port_probe.rtt(), 0.0)
+        self.assertLess(port_probe.rtt(), 1.0)
+
+    def test_rtt_unanswered(self):
+        self.mock_socket.getsockopt.return_value = ETIMEDOUT
+        self.port_probe.analyze()
+
+        self.assertIsNone(self.port_probe.rtt())
+
+    def test_analyze_without_verify(self):
+        self.mock_socket.getsockopt.return_value = 0
+
+        result = self.port_probe.analyze(verify=False)
+        self.assertEqual(result, RESULT_OPEN)
+        self.assertFalse(self.mock_socket.getpeername.called)
+
+    def test_analyze_without_verify_closed(self):
+        self.mock_socket.getsockopt.return_value = ECONNREFUSED
+
+        result = self.port_probe.analyze(verify=False)
+        self.assertEqual(result, RESULT_CLOSED)
+
+    def test_slots(self):
+        self.assertFalse(hasattr(self.port_probe, '__dict__'))
+
     def test_analyze_known_idempotency(self):
         self.mock_socket.getsockopt.return_value = 0
 
@@ -103,5 +160,63 @@ class ProbeTestCase(unittest.TestCase):
         self.mock_socket.getsockopt.assert_called_once_with(socket.SOL_SOCKET, socket.SO_ERROR)
 
 
+class FakeProbe(object):
+    def __init__(self, file_no, port):
+        self.file_no = file_no
+        self.port = port
+
+
+class ProbeTableTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.table = ProbeTable(size=4)
+
+    def test_add_and_pop(self):
+        probe = FakeProbe(2, 80)
+        self.table.add(probe, 1.5)
+
+        self.assertEqual(len(self.table), 1)
+        self.assertIn(2, self.table)
+        self.assertIs(self.table.get(2), probe)
+        self.assertEqual(self.table.deadlines[2], 1.5)
+
+        self.assertIs(self.table.pop(2), probe)
+        self.assertEqual(len(self.table), 0)
+        self.assertNotIn(2, self.table)
+        self.assertIsNone(self.table.pop(2))
+
+    def test_unknown_fds(self):
+        self.assertIsNone(self.table.get(-1))
+        self.assertIsNone(self.table.get(100))
+        self.assertIsNone(self.table.pop(100))
+
+    def test_grow(self):
+        probe = FakeProbe(37, 443)
+        self.table.add(probe, 2.0)
+
+        self.assertEqual(len(self.table.probes), 64)
+        self.assertEqual(len(self.table.deadlines), 64)
+        self.assertIs(self.table.get(37), probe)
+
+    def test_replace_slot(self):
+        self.table.add(FakeProbe(1, 22), 1.0)
+        self.table.pop(1)
+        self.table.add(FakeProbe(1, 23), 2.0)
+
+        self.assertEqual(len(self.table), 1)
+        self.assertFalse(self.table.is_due(1, 1.0))
+        self.assertTrue(self.table.is_due(1, 2.0))
+
+    def test_iter_and_clear(self):
+        for fd in [3, 0, 2]:
+            self.table.add(FakeProbe(fd, 1000 + fd), 1.0)
+
+        self.assertEqual(list(self.table), [0, 2, 3])
+
+        self.table.clear()
+        self.assertEqual(len(self.table), 0)
+        self.assertEqual(list(self.table), [])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from port_scanner.chunker import LOWEST_PORT_NUMBER, HIGHEST_PORT_NUMBER
+from port_scanner.ranking import *
+
+
+class RankingTestCase(unittest.TestCase):
+
+    def test_every_port_ranked_once(self):
+        self.assertEqual(len(RANKED_PORTS), HIGHEST_PORT_NUMBER)
+        self.assertEqual(sorted(RANKED_PORTS),
+                         list(range(LOWEST_PORT_NUMBER, HIGHEST_PORT_NUMBER + 1)))
+
+    def test_parse_common_ports(self):
+        ports = parse_common_ports([
+            '# comment',
+            'http\t80/tcp\t# World Wide Web HTTP',
+            'http\t80/udp',
+            'telnet\t23/tcp',
+            'http\t80/tcp',
+            'tcpmux\t1/tcp',
+            '',
+        ])
+        self.assertEqual(ports, [80, 23, 1])
+
+    def test_build_ranking(self):
+        ranked = build_ranking([8080, 22, 50000])
+        self.assertEqual(list(ranked[:5]), [8080, 22, 50000, 1, 2])
+        self.assertEqual(len(ranked), HIGHEST_PORT_NUMBER)
+
+    def test_bundled_common_ports(self):
+        self.assertGreaterEqual(len(COMMON_PORTS), 100)
+        self.assertEqual(len(set(COMMON_PORTS)), len(COMMON_PORTS))
+        for port in COMMON_PORTS:
+            self.assertTrue(LOWEST_PORT_NUMBER <= port <= HIGHEST_PORT_NUMBER)
+
+    def test_port_rank(self):
+        self.assertEqual(port_rank(80), 0)
+        self.assertEqual(port_rank(443), 2)
+        self.assertLess(port_rank(22), port_rank(3389))
+        for rank, port in enumerate(COMMON_PORTS):
+            self.assertEqual(port_rank(port), rank)
+        for rank, port in enumerate(RANKED_PORTS[:1000]):
+            self.assertEqual(port_rank(port), rank)
+
+    def test_unranked_ports_by_range(self):
+        # a well-known port comes before registered and dynamic ones
+        self.assertLess(port_rank(1), port_rank(1024))
+        self.assertLess(port_rank(1024), port_rank(60000))
+        self.assertEqual(RANKED_PORTS[-1], HIGHEST_PORT_NUMBER)
+
+    def test_top_ports(self):
+        self.assertEqual(set(top_ports(3)), {80, 23, 443})
+        self.assertEqual(len(top_ports(100)), 100)
+        # there is no ranking beyond the common ports
+        self.assertEqual(set(top_ports(100000)), set(COMMON_PORTS))
+        self.assertEqual(len(top_ports(0)), 0)
+        self.assertEqual(set(ranked_slice(1, 3)), {23, 443})
@@ -0,0 +1,85 @@
+import unittest
+import socket
+
+from port_scanner.reactor import *
+
+
+class ReactorTestCase(object):
+    """Tests run against every available backend, over a local socket pair.
+    """
+    backend = None
+
+    def setUp(self):
+        if not backend_is_available(self.backend):
+            self.skipTest('%s is not available on this platform' % self.backend)
+
+        self.reactor = create_reactor(self.backend)
+        self.left, self.right = socket.socketpair()
+
+    def tearDown(self):
+        self.reactor.close()
+        self.left.close()
+        self.right.close()
+
+    def test_writable(self):
+        self.reactor.register(self.left.fileno(), EVENT_WRITE)
+
+        ready = self.reactor.poll(0.1)
+        self.assertEqual(ready, [(self.left.fileno(), EVENT_WRITE)])
+
+    def test_readable(self):
+        self.reactor.register(self.left.fileno(), EVENT_READ)
+        self.assertEqual(self.reactor.poll(0.0), [])
+
+        self.right.send(b'x')
+        ready = self.reactor.poll(0.1)
+        self.assertEqual(ready, [(self.left.fileno(), EVENT_READ)])
+
+    def test_modify(self):
+        self.reactor.register(self.left.fileno(), EVENT_READ)
+        self.reactor.modify(self.left.fileno(), EVENT_WRITE)
+
+        ready = self.reactor.poll(0.1)
+        self.assertEqual(ready, [(self.left.fileno(), EVENT_WRITE)])
+
+    def test_unregister(self):
+        fd = self.left.fileno()
+        self.reactor.register(fd)
+        self.assertIn(fd, self.reactor)
+        self.assertEqual(len(self.reactor), 1)
+
+        self.reactor.unregister(fd)
+        self.reactor.unregister(fd)
+        self.assertNotIn(fd, self.reactor)
+        self.assertEqual(self.reactor.poll(0.0), [])
+
+
+class EpollReactorTestCase(ReactorTestCase, unittest.TestCase):
+    backend = 'epoll'
+
+
+class PollReactorTestCase(ReactorTestCase, unittest.TestCase):
+    backend = 'poll'
+
+
+class SelectReactorTestCase(ReactorTestCase, unittest.TestCase):
+    backend = 'select'
+
+
+class CreateReactorTestCase(unittest.TestCase):
+
+    def test_default_backend(self):
+        reactor = create_reactor()
+        self.assertIsInstance(reactor, REACTOR_BACKENDS[available_backends()[0]])
+        reactor.close()
+
+    def test_select_always_available(self):
+        self.assertIn('select', available_backends())
+
+    def test_unknown_backend(self):
+        with self.assertRaises(UnknownBackendError):
+            create_reactor('kqueue2')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import mock
+import socket
+import threading
+import time
+
+from port_scanner.resolver import *
+
+
+def addr_info(*addresses):
+    return [(socket.AF_INET6 if ':' in address else socket.AF_INET,
+             socket.SOCK_STREAM, 6, '', (address, 0)) for address in addresses]
+
+
+class ResolverTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.resolver = Resolver()
+
+    def test_is_ip_address(self):
+        self.assertTrue(is_ip_address('10.0.0.1'))
+        self.assertTrue(is_ip_address('2001:db8::1'))
+        self.assertTrue(is_ip_address('fe80::1%eth0'))
+        self.assertFalse(is_ip_address('example.com'))
+        self.assertFalse(is_ip_address('10.0.0.256'))
+
+    @mock.patch('socket.getaddrinfo')
+    def test_ip_address_not_looked_up(self, getaddrinfo):
+        self.assertEqual(self.resolver.lookup('10.0.0.1'), ['10.0.0.1'])
+        self.assertFalse(getaddrinfo.called)
+
+    @mock.patch('socket.getaddrinfo')
+    def test_lookup_ipv4_first(self, getaddrinfo):
+        getaddrinfo.return_value = addr_info('2001:db8::1', '10.0.0.1', '10.0.0.1', '10.0.0.2')
+        self.assertEqual(self.resolver.lookup('example.com'),
+                         ['10.0.0.1', '10.0.0.2', '2001:db8::1'])
+
+    @mock.patch('socket.getaddrinfo')
+    def test_lookup_cached(self, getaddrinfo):
+        getaddrinfo.return_value = addr_info('10.0.0.1')
+        self.resolver.lookup('example.com')
+        self.resolver.lookup('example.com')
+
+        self.assertEqual(getaddrinfo.call_count, 1)
+        self.assertEqual(self.resolver.lookups, 1)
+
+    @mock.patch('socket.getaddrinfo')
+    def test_lookup_expires(self, getaddrinfo):
+        getaddrinfo.return_value = addr_info('10.0.0.1')
+        self.resolver.ttl = 0.0
+        self.resolver.lookup('example.com')
+        self.resolver.lookup('example.com')
+
+        self.assertEqual(getaddrinfo.call_count, 2)
+
+    @mock.patch('socket.getaddrinfo', side_effect=socket.gaierror)
+    def test_lookup_failure_cached(self, getaddrinfo):
+        self.assertEqual(self.resolver.lookup('badhost.com'), [])
+        self.assertEqual(self.resolver.lookup('badhost.com'), [])
+        self.assertEqual(getaddrinfo.call_count, 1)
+
+    def test_resolve_many_concurrently(self):
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow_getaddrinfo(host, *args):
+            with lock:
+                active.append(host)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.remove(host)
+            return addr_info('10.0.0.%d' % int(host.split('.')[0][4:]))
+
+        hosts = ['host%d.example' % index for index in range(8)] + ['10.0.1.1']
+        with mock.patch('socket.getaddrinfo', slow_getaddrinfo):
+            resolved = self.resolver.resolve_many(hosts)
+
+        self.assertEqual(resolved['host3.example'], ['10.0.0.3'])
+        self.assertEqual(resolved['10.0.1.1'], ['10.0.1.1'])
+        self.assertGreater(max(peak), 1)
+        self.assertEqual(self.resolver.lookups, 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
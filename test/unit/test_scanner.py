@@ -1,26 +1,51 @@
 import unittest
 import mock
+import os
+import socket
 import random
+import shutil
+import tempfile
 import time
 
 from port_scanner.scanner import *
 from port_scanner.values import *
-from port_scanner.chunker import LOWEST_PORT_NUMBER, HIGHEST_PORT_NUMBER
+from port_scanner.timing import CongestionWindow, RttEstimator
+from port_scanner.checkpoint import Checkpoint, InvalidCheckpointError
+from port_scanner.cache import ResultCache
+from port_scanner.resolver import Resolver
+from port_scanner.simulator import HostModel, SimulatedNetwork
+from port_scanner.chunker import LOWEST_PORT_NUMBER, HIGHEST_PORT_NUMBER, PermutedPortChunker
 
 from mock_probe import MockProbe
 
 VALID_PORT_LIST = range(LOWEST_PORT_NUMBER, HIGHEST_PORT_NUMBER + 1)
 
+# timeouts that keep scans of mock probes, which time out at random, short
+MOCK_TIMEOUTS = {'timeout': 0.1, 'max_timeout': 0.2}
+
 
 class ScannerBadHostTestCase(unittest.TestCase):
 
-    @mock.patch('socket.gethostbyname', side_effect=socket.gaierror)
+    @mock.patch('socket.getaddrinfo', side_effect=socket.gaierror)
     def test_init_bad_host(self, mock_socket):
         host = 'badhost.com'
         port_list = [1, 2]
 
         with self.assertRaises(InvalidHostError):
-            PortScanner(host, port_list)
+            PortScanner(host, port_list, resolver=Resolver())
+
+    def test_init_unknown_scan_type(self):
+        with self.assertRaises(UnknownScanTypeError):
+            PortScanner('10.0.0.1', [1, 2], scan_type='fin')
+
+    def test_syn_scan_of_ipv6_address(self):
+        with self.assertRaises(SynUnavailableError):
+            PortScanner('2001:db8::1', [1, 2], scan_type='syn')
+
+    @mock.patch('socket.getaddrinfo', side_effect=socket.gaierror)
+    def test_init_bad_hosts(self, mock_socket):
+        with self.assertRaises(InvalidHostError):
+            MultiPortScanner(['10.0.0.1', 'badhost.com'], [1, 2], resolver=Resolver())
 
 
 def mock_select(r, w, e, timeout):
@@ -38,7 +63,9 @@ class ScannerTestCase(unittest.TestCase):
 
     def setUp(self):
         port_sample = random.sample(VALID_PORT_LIST, 100)
-        self.scanner = PortScanner('goodhost.com', port_sample)
+        # MockProbe file descriptors aren't real, so select.select is mocked instead
+        self.scanner = PortScanner('goodhost.com', port_sample, reactor_backend='select',
+                                   **MOCK_TIMEOUTS)
 
     @mock.patch('port_scanner.scanner.PortProbe', MockProbe)
     def test_launch_probes(self):
@@ -79,12 +106,221 @@ class ScannerTestCase(unittest.TestCase):
             self.assertIn(port, self.scanner.results_map)
             self.assertIn(self.scanner.results_map[port], [RESULT_FILTERED, RESULT_OPEN, RESULT_CLOSED])
 
+    @mock.patch('port_scanner.scanner.PortProbe', MockProbe)
+    def test_run_respects_window(self):
+        depths = []
+
+        def never_ready(timeout):
+            depths.append(len(self.scanner.in_flight))
+            return []
+
+        self.scanner.window = 7
+        self.scanner.reactor.poll = mock.MagicMock(side_effect=never_ready)
+        self.scanner.min_timeout = 0.001
+        self.scanner.max_timeout = 0.001
+        self.scanner.run(timeout=0.001)
+
+        self.assertLessEqual(max(depths), 7)
+        self.assertEqual(len(self.scanner.in_flight), 0)
+
+    @mock.patch('port_scanner.scanner.PortProbe', MockProbe)
+    def test_run_retries_filtered(self):
+        launched = []
+        launch_probe = self.scanner.launch_probe
+
+        def counting_launch(port, address=None):
+            launched.append(port)
+            return launch_probe(port, address)
+
+        self.scanner.launch_probe = counting_launch
+        self.scanner.reactor.poll = mock.MagicMock(return_value=[])
+        self.scanner.min_timeout = 0.001
+        self.scanner.run(timeout=0.001)
+
+        self.assertEqual(sorted(launched), sorted(self.scanner.port_list * (MAX_RETRIES + 1)))
+        for port in self.scanner.port_list:
+            self.assertEqual(self.scanner.results_map[port], RESULT_FILTERED)
+
+    @mock.patch('port_scanner.scanner.PortProbe', MockProbe)
+    def test_run_does_not_wait_for_answered_probes(self):
+        def all_ready(timeout):
+            return [(fd, 0) for fd in self.scanner.in_flight]
+
+        self.scanner.reactor.poll = mock.MagicMock(side_effect=all_ready)
+        with mock.patch.object(MockProbe, 'analyze', return_value=RESULT_CLOSED):
+            start_time = time.time()
+            self.scanner.run(timeout=10.0)
+
+        self.assertLess(time.time() - start_time, 1.0)
+        for port in self.scanner.port_list:
+            self.assertEqual(self.scanner.results_map[port], RESULT_CLOSED)
+
+    @mock.patch('port_scanner.scanner.PortProbe', MockProbe)
+    def test_run_retries_unknown(self):
+        def all_ready(timeout):
+            return [(fd, 0) for fd in self.scanner.in_flight]
+
+        launched = []
+        launch_probe = self.scanner.launch_probe
+
+        def counting_launch(port, address=None):
+            launched.append(port)
+            return launch_probe(port, address)
+
+        self.scanner.max_retries = 3
+        self.scanner.launch_probe = counting_launch
+        self.scanner.reactor.poll = mock.MagicMock(side_effect=all_ready)
+        with mock.patch.object(MockProbe, 'analyze', return_value=RESULT_UNKNOWN):
+            self.scanner.run()
+
+        self.assertEqual(sorted(launched), sorted(self.scanner.port_list * 4))
+        for port in self.scanner.port_list:
+            self.assertEqual(self.scanner.results_map[port], RESULT_UNKNOWN)
+
+    @mock.patch('port_scanner.scanner.PortProbe', MockProbe)
+    def test_run_without_retries(self):
+        launched = []
+        launch_probe = self.scanner.launch_probe
+
+        def counting_launch(port, address=None):
+            launched.append(port)
+            return launch_probe(port, address)
+
+        self.scanner.max_retries = 0
+        self.scanner.min_timeout = 0.001
+        self.scanner.launch_probe = counting_launch
+        self.scanner.reactor.poll = mock.MagicMock(return_value=[])
+        self.scanner.run(timeout=0.001)
+
+        self.assertEqual(sorted(launched), sorted(self.scanner.port_list))
+
+    def test_retry_timeout_backoff(self):
+        target = (self.scanner.address, 80)
+        self.scanner.rtt_estimators[self.scanner.address] = RttEstimator(0.1, 0.05, 0.35)
+
+        self.assertAlmostEqual(self.scanner.probe_timeout(target), 0.1)
+        self.scanner.attempts[target] = 1
+        self.assertAlmostEqual(self.scanner.probe_timeout(target), 0.2)
+        self.scanner.attempts[target] = 2
+        self.assertAlmostEqual(self.scanner.probe_timeout(target), 0.35)
+
+    def test_retries_come_first(self):
+        self.scanner.pending.extend([(self.scanner.address, 1), (self.scanner.address, 2)])
+        self.scanner.retries.append((self.scanner.address, 3))
+
+        targets = [self.scanner.next_target() for _ in range(3)]
+        self.assertEqual([port for address, port in targets], [3, 1, 2])
+
+    @mock.patch('port_scanner.scanner.PortProbe', MockProbe)
+    @mock.patch('select.select', mock_select)
+    def test_iter_results(self):
+        results = list(self.scanner.iter_results())
+
+        self.assertEqual(len(results), len(self.scanner.port_list))
+        for port, result, rtt in results:
+            self.assertEqual(self.scanner.results_map[port], result)
+            if result != RESULT_FILTERED:
+                self.assertGreaterEqual(rtt, 0.0)
+
+    @mock.patch('port_scanner.scanner.PortProbe', MockProbe)
+    @mock.patch('select.select', mock_select)
+    def test_iter_results_stopped_early(self):
+        results = self.scanner.iter_results()
+        next(results)
+        results.close()
+
+        self.assertEqual(len(self.scanner.in_flight), 0)
+        self.assertEqual(len(self.scanner.reactor), 0)
+
+    @mock.patch('port_scanner.scanner.PortProbe', MockProbe)
+    @mock.patch('select.select', mock_select)
+    def test_on_result(self):
+        results = []
+        self.scanner.on_result = lambda port, result, rtt: results.append((port, result))
+        self.scanner.run()
+
+        self.assertEqual(sorted(results), sorted(self.scanner.results_map.items()))
+
+    @mock.patch('port_scanner.scanner.PortProbe', MockProbe)
+    @mock.patch('select.select', mock_select)
+    def test_cache(self):
+        cache = ResultCache()
+        self.scanner.cache = cache
+        self.scanner.run()
+        first_results = dict(self.scanner.results_map)
+        self.assertEqual(cache.misses, len(self.scanner.port_list))
+
+        probed = []
+        self.scanner.launch_probe = lambda port, address=None: probed.append(port)
+        self.scanner.run()
+
+        self.assertEqual(probed, [])
+        self.assertEqual(self.scanner.results_map, first_results)
+        self.assertEqual(cache.hits, len(self.scanner.port_list))
+
+    def test_answered_retry_shrinks_window(self):
+        self.scanner.congestion = CongestionWindow(initial=20)
+        target = (self.scanner.address, 80)
+
+        self.scanner.on_response(target)
+        self.assertEqual(self.scanner.congestion.limit(), 21)
+
+        self.scanner.loss_candidates[target] = time.time()
+        self.scanner.on_response(target)
+        self.assertEqual(self.scanner.congestion.limit(), 10)
+        self.assertNotIn(target, self.scanner.loss_candidates)
+
+    @mock.patch('port_scanner.scanner.PortProbe', MockProbe)
+    def test_run_measures_rtt(self):
+        def all_ready(timeout):
+            return [(fd, 0) for fd in self.scanner.in_flight]
+
+        self.scanner.reactor.poll = mock.MagicMock(side_effect=all_ready)
+        with mock.patch.object(MockProbe, 'analyze', return_value=RESULT_OPEN):
+            self.scanner.run()
+
+        estimator = self.scanner.rtt_estimators[self.scanner.address]
+        self.assertEqual(estimator.samples, len(self.scanner.port_list))
+        self.assertEqual(estimator.timeout(), self.scanner.min_timeout)
+
+    @mock.patch('port_scanner.scanner.PortProbe', MockProbe)
+    def test_run_does_not_sample_timeouts(self):
+        self.scanner.reactor.poll = mock.MagicMock(return_value=[])
+        self.scanner.min_timeout = 0.001
+        self.scanner.run(timeout=0.001)
+
+        estimator = self.scanner.rtt_estimators[self.scanner.address]
+        self.assertEqual(estimator.samples, 0)
+        self.assertIsNone(estimator.srtt)
+
+    def test_fixed_window(self):
+        scanner = PortScanner('127.0.0.1', [1], reactor_backend='select',
+                              window=5, adaptive=False)
+        self.assertEqual(scanner.window_limit(), 5)
+
     def test_clear(self):
         self.scanner.results_map[5] = RESULT_OPEN
         self.scanner.clear()
 
         self.assertEqual(self.scanner.results_map, {})
 
+    def test_all_addresses_keyed_by_address(self):
+        network = SimulatedNetwork({'10.0.0.1': HostModel(open_ports=[22]),
+                                    '10.0.0.2': HostModel(open_ports=[80])}, seed=1)
+        resolver = Resolver()
+        resolver.lookup = lambda host: ['10.0.0.1', '10.0.0.2']
+
+        scanner = PortScanner('dual.example', [22, 80, 443], resolver=resolver,
+                              all_addresses=True, **network.scanner_kwargs())
+        keys = [key for key, result, rtt in scanner.iter_results()]
+
+        self.assertEqual(len(keys), 6)
+        self.assertEqual(set(keys), set(scanner.results_map))
+        self.assertEqual(scanner.results_map[('10.0.0.1', 22)], RESULT_OPEN)
+        self.assertEqual(scanner.results_map[('10.0.0.1', 80)], RESULT_CLOSED)
+        self.assertEqual(scanner.results_map[('10.0.0.2', 22)], RESULT_CLOSED)
+        self.assertEqual(scanner.results_map[('10.0.0.2', 80)], RESULT_OPEN)
+
     def test_reverse_chunk(self):
         chunk = [3, 2, 1]
         reversed_chunk = reverse_port_chunk(chunk)
@@ -92,5 +328,136 @@ class ScannerTestCase(unittest.TestCase):
         self.assertEqual(reversed_chunk, [1, 2, 3])
 
 
+class MultiScannerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.hosts = ['10.0.0.1', '10.0.0.2', '10.0.0.1', '10.0.0.3']
+        self.port_list = random.sample(VALID_PORT_LIST, 30)
+        self.scanner = MultiPortScanner(self.hosts, self.port_list, reactor_backend='select',
+                                        **MOCK_TIMEOUTS)
+
+    def test_addresses_are_unique(self):
+        self.assertEqual(self.scanner.addresses, ['10.0.0.1', '10.0.0.2', '10.0.0.3'])
+
+    @mock.patch('port_scanner.scanner.PortProbe', MockProbe)
+    @mock.patch('select.select', mock_select)
+    def test_run(self):
+        self.scanner.run()
+
+        self.assertEqual(len(self.scanner.results_map), 3 * len(self.port_list))
+        for address in self.scanner.addresses:
+            for port in self.port_list:
+                self.assertIn(self.scanner.results_map[(address, port)],
+                              [RESULT_FILTERED, RESULT_OPEN, RESULT_CLOSED])
+
+    @mock.patch('port_scanner.scanner.PortProbe', MockProbe)
+    def test_window_is_global(self):
+        depths = []
+
+        def never_ready(timeout):
+            depths.append(len(self.scanner.in_flight))
+            return []
+
+        self.scanner.window = 10
+        self.scanner.reactor.poll = mock.MagicMock(side_effect=never_ready)
+        self.scanner.min_timeout = 0.001
+        self.scanner.run(timeout=0.001)
+
+        self.assertEqual(max(depths), 10)
+
+    def test_all_addresses(self):
+        resolver = Resolver()
+        resolver.lookup = lambda host: {'dual.example': ['10.0.0.5', '2001:db8::5'],
+                                        '10.0.0.1': ['10.0.0.1']}[host]
+
+        scanner = MultiPortScanner(['dual.example', '10.0.0.1'], self.port_list,
+                                   reactor_backend='select', resolver=resolver)
+        self.assertEqual(scanner.addresses, ['10.0.0.5', '10.0.0.1'])
+
+        scanner = MultiPortScanner(['dual.example', '10.0.0.1'], self.port_list,
+                                   reactor_backend='select', resolver=resolver,
+                                   all_addresses=True)
+        self.assertEqual(scanner.addresses, ['10.0.0.5', '2001:db8::5', '10.0.0.1'])
+
+    def test_hosts_take_turns(self):
+        for address in self.scanner.addresses:
+            self.scanner.chunkers.append((address, PermutedPortChunker(self.port_list)))
+
+        addresses = set()
+        for _ in range(3):
+            addresses.update(address for address, port in self.scanner.next_targets())
+
+        self.assertEqual(addresses, set(self.scanner.addresses))
+
+    @mock.patch('port_scanner.scanner.PortProbe', MockProbe)
+    @mock.patch('select.select', mock_select)
+    def test_scan_many(self):
+        results_map = scan_many(['10.0.0.0/31', '10.0.0.9'], [22, 80], reactor_backend='select')
+
+        self.assertEqual(sorted(results_map.keys()),
+                         [('10.0.0.0', 22), ('10.0.0.0', 80),
+                          ('10.0.0.1', 22), ('10.0.0.1', 80),
+                          ('10.0.0.9', 22), ('10.0.0.9', 80)])
+
+
+class CheckpointScannerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.port_list = random.sample(VALID_PORT_LIST, 50)
+        self.checkpoint = Checkpoint.create(os.path.join(self.directory, 'scan.checkpoint'),
+                                            ['10.0.0.1', '10.0.0.2'], self.port_list)
+
+    def tearDown(self):
+        self.checkpoint.close()
+        shutil.rmtree(self.directory)
+
+    def create_scanner(self):
+        return MultiPortScanner(['10.0.0.1', '10.0.0.2'], self.port_list,
+                                reactor_backend='select', checkpoint=self.checkpoint,
+                                **MOCK_TIMEOUTS)
+
+    @mock.patch('port_scanner.scanner.PortProbe', MockProbe)
+    @mock.patch('select.select', mock_select)
+    def test_run_marks_checkpoint(self):
+        scanner = self.create_scanner()
+        self.assertEqual(scanner.seed, self.checkpoint.seed)
+        results_map = scanner.run()
+
+        for address in ['10.0.0.1', '10.0.0.2']:
+            self.assertEqual(self.checkpoint.remaining_ports(address), [])
+            for port, result in self.checkpoint.results(address):
+                self.assertEqual(results_map[(address, port)], result)
+
+    @mock.patch('port_scanner.scanner.PortProbe', MockProbe)
+    @mock.patch('select.select', mock_select)
+    def test_resume_skips_done_ports(self):
+        done = self.port_list[:20]
+        for port in done:
+            self.checkpoint.mark('10.0.0.1', port, RESULT_OPEN)
+
+        scanner = self.create_scanner()
+        probed = []
+        launch_probe = scanner.launch_probe
+
+        def counting_launch(port, address=None):
+            probed.append((address, port))
+            return launch_probe(port, address)
+
+        scanner.launch_probe = counting_launch
+        results = list(scanner.iter_results())
+
+        self.assertEqual(len(results), 2 * len(self.port_list) - len(done))
+        for port in done:
+            self.assertNotIn(('10.0.0.1', port), probed)
+            self.assertEqual(scanner.results_map[('10.0.0.1', port)], RESULT_OPEN)
+
+        self.assertEqual(len(scanner.results_map), 2 * len(self.port_list))
+
+    def test_unknown_address(self):
+        with self.assertRaises(InvalidCheckpointError):
+            MultiPortScanner(['10.0.0.3'], self.port_list, checkpoint=self.checkpoint)
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,195 @@
+import socket
+import struct
+import threading
+import unittest
+
+from port_scanner.reactor import create_reactor
+from port_scanner.scanner import PortScanner
+from port_scanner.service import *
+from port_scanner.values import RESULT_OPEN
+
+
+def listen():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(8)
+    return server
+
+
+def serve(server, handler):
+    """Accept one connection in the background and hand it to ``handler``.
+    """
+    def accept():
+        conn, addr = server.accept()
+        try:
+            handler(conn)
+        except socket.error:
+            # the grabber hung up first
+            pass
+        finally:
+            conn.close()
+
+    thread = threading.Thread(target=accept)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def send_banner(conn):
+    conn.sendall(b'SSH-2.0-test\r\n')
+    conn.recv(1)
+
+
+def answer_http(conn):
+    request = b''
+    while not request.endswith(b'\r\n\r\n'):
+        data = conn.recv(1024)
+        if not data:
+            return
+        request += data
+
+    if request.startswith(b'HEAD / '):
+        conn.sendall(b'HTTP/1.0 200 OK\r\nServer: test\r\n\r\n')
+    conn.recv(1)
+
+
+class IdentifyTestCase(unittest.TestCase):
+
+    def test_identify(self):
+        self.assertEqual(identify(b'SSH-2.0-OpenSSH_9.6\r\n'), 'ssh')
+        self.assertEqual(identify(b'HTTP/1.1 301 Moved Permanently\r\n'), 'http')
+        self.assertEqual(identify(b'\x16\x03\x03\x00\x5a\x02'), 'tls')
+        self.assertEqual(identify(b'\x15\x03\x01\x00\x02\x02\x28'), 'tls')
+        self.assertEqual(identify(b'220 (vsFTPd 3.0.5)\r\n'), 'ftp')
+        self.assertEqual(identify(b'220 mail.example.com ESMTP Postfix\r\n'), 'smtp')
+        self.assertEqual(identify(b'+OK Dovecot ready.\r\n'), 'pop3')
+        self.assertEqual(identify(b'* OK IMAP4rev1 ready\r\n'), 'imap')
+        self.assertEqual(identify(b'RFB 003.008\n'), 'vnc')
+        self.assertIsNone(identify(b''))
+        self.assertIsNone(identify(b'hello'))
+
+    def test_http_head(self):
+        self.assertEqual(http_head('10.0.0.1'),
+                         b'HEAD / HTTP/1.0\r\nHost: 10.0.0.1\r\n'
+                         b'User-Agent: portscanner\r\n\r\n')
+        self.assertIn(b'Host: [::1]\r\n', http_head('::1'))
+
+    def test_tls_client_hello(self):
+        hello = tls_client_hello('10.0.0.1')
+        content_type, version, length = struct.unpack('!BHH', hello[:5])
+        self.assertEqual(content_type, 0x16)
+        self.assertEqual(version, 0x0301)
+        self.assertEqual(length, len(hello) - 5)
+        # a ClientHello handshake, its length, and TLS 1.2
+        self.assertEqual(hello[5:6], b'\x01')
+        self.assertEqual(struct.unpack('!I', b'\x00' + hello[6:9])[0], len(hello) - 9)
+        self.assertEqual(hello[9:11], b'\x03\x03')
+
+
+class ServiceGrabberTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.reactor = create_reactor()
+        self.services = {}
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.close()
+        self.reactor.close()
+
+    def server(self):
+        server = listen()
+        self.servers.append(server)
+        return server
+
+    def on_service(self, address, port, service_info):
+        self.services[port] = service_info
+
+    def grab(self, grabber):
+        while len(grabber):
+            deadline = grabber.next_deadline()
+            for fd, events in self.reactor.poll(max(deadline - grabber.clock.time(), 0.0)):
+                grabber.on_ready(fd, events)
+            grabber.expire(grabber.clock.time())
+
+    def test_grab(self):
+        ssh_server, http_server, silent_server = self.server(), self.server(), self.server()
+        ssh_port = ssh_server.getsockname()[1]
+        http_port = http_server.getsockname()[1]
+        silent_port = silent_server.getsockname()[1]
+        threads = [serve(ssh_server, send_banner), serve(http_server, answer_http)]
+
+        grabber = ServiceGrabber(self.reactor, timeout=0.5, on_service=self.on_service,
+                                 port_probes={http_port: 'http'})
+        for port in (ssh_port, http_port, silent_port):
+            grabber.add('127.0.0.1', port)
+        self.grab(grabber)
+        for thread in threads:
+            thread.join(1.0)
+
+        self.assertEqual(self.services[ssh_port], ServiceInfo('ssh', b'SSH-2.0-test\r\n'))
+        self.assertEqual(self.services[http_port].service, 'http')
+        self.assertTrue(self.services[http_port].banner.startswith(b'HTTP/1.0 200 OK'))
+        # the silent server accepted the connection but never spoke
+        self.assertEqual(self.services[silent_port], ServiceInfo(None, b''))
+        self.assertEqual(len(grabber.sessions), 0)
+        self.assertEqual(len(self.reactor.registered), 0)
+
+    def test_window(self):
+        servers = [self.server() for _ in range(3)]
+        threads = [serve(server, send_banner) for server in servers]
+
+        grabber = ServiceGrabber(self.reactor, window=1, timeout=1.0,
+                                 on_service=self.on_service)
+        for server in servers:
+            grabber.add('127.0.0.1', server.getsockname()[1])
+        self.assertEqual(len(grabber.sessions), 1)
+        self.assertEqual(len(grabber), 3)
+
+        self.grab(grabber)
+        for thread in threads:
+            thread.join(1.0)
+
+        self.assertEqual(sorted(info.service for info in self.services.values()),
+                         ['ssh'] * 3)
+
+    def test_refused(self):
+        server = self.server()
+        port = server.getsockname()[1]
+        server.close()
+
+        grabber = ServiceGrabber(self.reactor, timeout=0.5, on_service=self.on_service)
+        grabber.add('127.0.0.1', port)
+        self.grab(grabber)
+
+        self.assertEqual(self.services[port], ServiceInfo(None, b''))
+
+    def test_close(self):
+        server = self.server()
+        grabber = ServiceGrabber(self.reactor, timeout=5.0, on_service=self.on_service)
+        grabber.add('127.0.0.1', server.getsockname()[1])
+        grabber.close()
+
+        self.assertEqual(len(grabber), 0)
+        self.assertIsNone(grabber.next_deadline())
+        self.assertEqual(self.services, {})
+
+
+class ScannerServiceTestCase(unittest.TestCase):
+
+    def test_scan_grabs_services(self):
+        server = listen()
+        port = server.getsockname()[1]
+        thread = serve(server, send_banner)
+
+        scanner = PortScanner('127.0.0.1', [port], grab_services=True, service_timeout=1.0)
+        try:
+            results_map = scanner.run()
+        finally:
+            scanner.close()
+            server.close()
+        thread.join(1.0)
+
+        self.assertEqual(results_map[port], RESULT_OPEN)
+        self.assertEqual(scanner.services[port], ServiceInfo('ssh', b'SSH-2.0-test\r\n'))
@@ -0,0 +1,279 @@
+import time
+import unittest
+
+from port_scanner.cache import ResultCache
+from port_scanner.scanner import PortScanner, MultiPortScanner, DISCOVERY_PORTS
+from port_scanner.simulator import *
+from port_scanner.values import *
+
+
+class VirtualClockTestCase(unittest.TestCase):
+
+    def test_sleep(self):
+        clock = VirtualClock(start=10.0)
+        clock.sleep(2.5)
+        clock.sleep(-1.0)
+        self.assertEqual(clock.time(), 12.5)
+
+    def test_advance_to(self):
+        clock = VirtualClock()
+        clock.advance_to(3.0)
+        clock.advance_to(1.0)
+        self.assertEqual(clock.time(), 3.0)
+
+
+class HostModelTestCase(unittest.TestCase):
+
+    def test_result(self):
+        host = HostModel(open_ports=[80], filtered_ports=[25])
+        self.assertEqual(host.result(80), RESULT_OPEN)
+        self.assertEqual(host.result(25), RESULT_FILTERED)
+        self.assertEqual(host.result(81), RESULT_CLOSED)
+        self.assertEqual(HostModel(default_result=RESULT_FILTERED).result(81), RESULT_FILTERED)
+
+    def test_answer(self):
+        host = HostModel(open_ports=[80], filtered_ports=[25], latency=0.1,
+                         port_latency={443: 0.3})
+        self.assertEqual(host.answer(80, 0.0, None), (RESULT_OPEN, 0.1))
+        self.assertEqual(host.answer(443, 0.0, None), (RESULT_CLOSED, 0.3))
+        self.assertIsNone(host.answer(25, 0.0, None))
+
+    def test_rate_limit(self):
+        host = HostModel(latency=0.0, rate_limit=10.0, burst=2)
+        answers = [host.answer(1, 0.0, None) for _ in range(3)]
+        self.assertEqual(sum(1 for answer in answers if answer is not None), 2)
+
+        # one answer every tenth of a second
+        self.assertIsNotNone(host.answer(1, 0.1, None))
+        self.assertIsNone(host.answer(1, 0.1, None))
+
+
+class SimulatedNetworkTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.network = SimulatedNetwork({'10.0.0.1': HostModel(open_ports=[80], latency=0.1)})
+        self.reactor = self.network.create_reactor()
+
+    def test_answer_delivered(self):
+        probe = self.network.connect('10.0.0.1', 80)
+        self.reactor.register(probe.file_no)
+
+        self.assertEqual(self.reactor.poll(0.05), [])
+        self.assertAlmostEqual(self.network.clock.time(), 0.05)
+
+        self.assertEqual(self.reactor.poll(1.0), [(probe.file_no, 2)])
+        self.assertAlmostEqual(self.network.clock.time(), 0.1)
+        self.assertEqual(probe.analyze(), RESULT_OPEN)
+        self.assertAlmostEqual(probe.rtt(), 0.1)
+
+    def test_unknown_address(self):
+        probe = self.network.connect('10.0.0.2', 80)
+        self.reactor.register(probe.file_no)
+
+        self.assertEqual(self.reactor.poll(1.0), [])
+        self.assertEqual(probe.analyze(), RESULT_UNKNOWN)
+
+    def test_closed_probe_not_reported(self):
+        probe = self.network.connect('10.0.0.1', 80)
+        self.reactor.register(probe.file_no)
+        probe.close()
+
+        self.assertEqual(self.reactor.poll(1.0), [])
+
+    def test_fds_reused(self):
+        first = self.network.connect('10.0.0.1', 80)
+        second = self.network.connect('10.0.0.1', 81)
+        self.assertNotEqual(first.file_no, second.file_no)
+
+        first.close()
+        self.assertEqual(self.network.connect('10.0.0.1', 82).file_no, first.file_no)
+
+    def test_scanner(self):
+        hosts = {'10.0.0.1': HostModel(open_ports=[22, 80], filtered_ports=[25])}
+        network = SimulatedNetwork(hosts, seed=1)
+        scanner = PortScanner('10.0.0.1', range(1, 101), **network.scanner_kwargs())
+        results_map = scanner.run()
+
+        self.assertEqual(results_map[22], RESULT_OPEN)
+        self.assertEqual(results_map[25], RESULT_FILTERED)
+        self.assertEqual(results_map[23], RESULT_CLOSED)
+
+        # poll() sleeps on the network's clock too
+        now = network.clock.time()
+        scanner.poll([80], 5.0)
+        self.assertEqual(scanner.results_map[80], RESULT_OPEN)
+        self.assertAlmostEqual(network.clock.time(), now + 5.0)
+
+
+class SimulateTestCase(unittest.TestCase):
+
+    def hosts(self, latency=0.08, **kwargs):
+        return {
+            '10.0.0.1': HostModel(open_ports=[22, 80, 443], filtered_ports=range(1000, 1020),
+                                  latency=latency, **kwargs),
+            '10.0.0.2': HostModel(open_ports=[1080], default_result=RESULT_FILTERED,
+                                  latency=0.2, **kwargs),
+        }
+
+    def test_accurate(self):
+        report = simulate(self.hosts(), range(1, 2001), seed=1)
+        self.assertEqual(len(report.results_map), 4000)
+        self.assertEqual(report.accuracy, 1.0)
+        self.assertEqual(report.results_map[('10.0.0.2', 1080)], RESULT_OPEN)
+
+    def test_deterministic(self):
+        first = simulate(self.hosts(loss=0.05, jitter=0.05), range(1, 2001), seed=7)
+        second = simulate(self.hosts(loss=0.05, jitter=0.05), range(1, 2001), seed=7)
+        self.assertEqual(first, second)
+
+    def test_loss_retried(self):
+        lossless = simulate(self.hosts(), range(1, 2001), seed=1)
+        lossy = simulate(self.hosts(loss=0.05), range(1, 2001), seed=1)
+
+        self.assertGreater(lossy.launched, lossless.launched)
+        self.assertGreater(lossy.elapsed, lossless.elapsed)
+        self.assertGreater(lossy.accuracy, 0.99)
+
+    def test_rate_limit_slows_scan(self):
+        limited = simulate(self.hosts(rate_limit=100.0, burst=10), range(1, 2001), seed=1)
+        unlimited = simulate(self.hosts(), range(1, 2001), seed=1)
+        self.assertGreater(limited.elapsed, unlimited.elapsed)
+
+    def test_scanner_kwargs(self):
+        report = simulate(self.hosts(), range(1, 2001), seed=1, adaptive=False, window=50)
+        self.assertEqual(report.accuracy, 1.0)
+
+    def test_runs_in_virtual_time(self):
+        start_time = time.time()
+        report = simulate(self.hosts(latency=1.0), range(1, 2001), seed=1)
+        self.assertLess(time.time() - start_time, report.elapsed)
+        self.assertEqual(report.accuracy, 1.0)
+
+    def test_accurate_on_high_latency_links(self):
+        for latency in (0.3, 0.5):
+            hosts = {'10.0.0.1': HostModel(open_ports=range(1, 2001, 10), latency=latency)}
+            report = simulate(hosts, range(1, 2001), seed=1)
+            self.assertEqual(report.accuracy, 1.0)
+            # first probes are answered within the initial timeout
+            self.assertEqual(report.launched, 2000)
+            self.assertLess(report.elapsed, 20 * latency)
+
+    def test_timeout_follows_rtt_on_filtered_host(self):
+        hosts = {'10.0.0.1': HostModel(open_ports=[22, 80, 443],
+                                       default_result=RESULT_FILTERED, latency=0.02)}
+        network = SimulatedNetwork(hosts, seed=1)
+        scanner = PortScanner('10.0.0.1', range(1, 2001), seed=1, **network.scanner_kwargs())
+        start_time = network.clock.time()
+        results_map = scanner.run()
+
+        self.assertEqual(len(results_map), 2000)
+        self.assertEqual(results_map[80], RESULT_OPEN)
+        # silent ports don't push the timeout away from the round trip time
+        estimator = scanner.rtt_estimators['10.0.0.1']
+        self.assertLessEqual(estimator.timeout(), estimator.base_rto * 4)
+        self.assertLess(estimator.timeout(), 0.25)
+        self.assertLess(network.clock.time() - start_time, 100.0)
+
+    def test_rate(self):
+        report = simulate({'10.0.0.1': HostModel(latency=0.01)}, range(1, 501), seed=1, rate=100.0)
+        self.assertEqual(report.accuracy, 1.0)
+        self.assertAlmostEqual(report.elapsed, 5.0, delta=0.1)
+
+    def test_rate_shared_between_hosts(self):
+        hosts = {'10.0.0.1': HostModel(latency=0.01), '10.0.0.2': HostModel(latency=0.01)}
+        report = simulate(hosts, range(1, 251), seed=1, rate=100.0)
+        self.assertEqual(len(report.results_map), 500)
+        self.assertAlmostEqual(report.elapsed, 5.0, delta=0.1)
+
+    def test_rate_with_retries(self):
+        hosts = {'10.0.0.1': HostModel(filtered_ports=range(1, 11), latency=0.01)}
+        report = simulate(hosts, range(1, 101), seed=1, rate=100.0, max_retries=1)
+        self.assertEqual(report.launched, 110)
+        self.assertEqual(report.accuracy, 1.0)
+
+    def test_rate_looks_up_cache_once(self):
+        cache = ResultCache()
+        simulate({'10.0.0.1': HostModel(latency=0.01)}, range(1, 101), seed=1, rate=100.0,
+                 cache=cache)
+        self.assertEqual(cache.misses, 100)
+
+
+class HostDiscoveryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.hosts = {
+            # answers discovery with RSTs only
+            '10.0.0.1': HostModel(open_ports=[8000], latency=0.05),
+            # firewalled, but port 443 is open
+            '10.0.0.2': HostModel(open_ports=[443, 8000], default_result=RESULT_FILTERED,
+                                  latency=0.1),
+            # down
+            '10.0.0.3': HostModel(default_result=RESULT_FILTERED),
+        }
+        self.network = SimulatedNetwork(self.hosts, seed=1)
+
+    def scan(self, port_list, **kwargs):
+        scanner = MultiPortScanner(sorted(self.hosts), port_list, seed=1,
+                                   **dict(self.network.scanner_kwargs(), **kwargs))
+        scanner.run()
+        scanner.close()
+        return scanner
+
+    def test_down_hosts_skipped(self):
+        scanner = self.scan(range(1, 1001), discover=True, max_retries=0)
+
+        self.assertEqual(scanner.down_addresses, ['10.0.0.3'])
+        self.assertEqual(sorted(set(address for address, port in scanner.results_map)),
+                         ['10.0.0.1', '10.0.0.2'])
+        self.assertEqual(len(scanner.results_map), 2000)
+        for (address, port), result in scanner.results_map.items():
+            self.assertEqual(result, self.hosts[address].result(port))
+
+        # the down host costs a probe per discovery port, and the results of
+        # discovery are kept for the scan instead of probed again
+        self.assertEqual(self.network.launched, 2000 + len(DISCOVERY_PORTS))
+
+    def test_discovery_stops_at_first_answer(self):
+        scanner = self.scan(range(1, 1001), discover=True, max_retries=1)
+
+        self.assertEqual(scanner.down_addresses, ['10.0.0.3'])
+        self.assertEqual(len(scanner.results_map), 2000)
+        # the down host's discovery ports are retried, but the filtered
+        # discovery ports of 10.0.0.2 aren't once 443 answered: the scan
+        # probes them again from scratch
+        without_discovery = SimulatedNetwork(self.hosts, seed=1)
+        MultiPortScanner(['10.0.0.1', '10.0.0.2'], range(1, 1001), seed=1, max_retries=1,
+                         **without_discovery.scanner_kwargs()).run()
+        self.assertEqual(self.network.launched,
+                         without_discovery.launched + 2 * len(DISCOVERY_PORTS) + 3)
+
+    def test_discovery_ports_outside_port_list(self):
+        scanner = self.scan(range(8000, 8011), discover=True)
+
+        self.assertEqual(scanner.down_addresses, ['10.0.0.3'])
+        self.assertEqual(len(scanner.results_map), 22)
+        self.assertEqual(scanner.results_map[('10.0.0.2', 8000)], RESULT_OPEN)
+        self.assertNotIn(('10.0.0.2', 443), scanner.results_map)
+
+    def test_high_latency_host_found_up(self):
+        hosts = {
+            '10.0.0.1': HostModel(open_ports=[8000], latency=0.05),
+            # farther away than the scan's deadlines
+            '10.0.0.2': HostModel(open_ports=[22, 80], default_result=RESULT_FILTERED,
+                                  latency=0.3),
+        }
+        network = SimulatedNetwork(hosts, seed=1)
+        scanner = MultiPortScanner(sorted(hosts), [22, 80], seed=1, discover=True,
+                                   timeout=0.11, max_timeout=0.22,
+                                   **network.scanner_kwargs())
+        scanner.run()
+
+        self.assertEqual(scanner.down_addresses, [])
+        self.assertEqual(scanner.results_map[('10.0.0.2', 22)], RESULT_OPEN)
+        self.assertEqual(scanner.results_map[('10.0.0.2', 80)], RESULT_OPEN)
+
+    def test_without_discovery(self):
+        scanner = self.scan(range(1, 101))
+
+        self.assertEqual(scanner.down_addresses, [])
+        self.assertEqual(len(scanner.results_map), 300)
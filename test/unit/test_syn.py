@@ -0,0 +1,117 @@
+import unittest
+import socket
+import struct
+import time
+
+from port_scanner.syn import *
+from port_scanner.scanner import MultiPortScanner
+from port_scanner.values import *
+
+
+def ip_packet(source_address, segment):
+    header = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(segment), 0, 0, 64,
+                         socket.IPPROTO_TCP, 0, socket.inet_aton(source_address),
+                         socket.inet_aton('10.0.0.1'))
+    return header + segment
+
+
+def reply_segment(source_port, port, ack, flags):
+    return TCP_HEADER.pack(port, source_port, 0, ack, 5 << 4, flags, 0, 0, 0)
+
+
+class PacketTestCase(unittest.TestCase):
+
+    def test_checksum(self):
+        # example from RFC 1071
+        data = struct.pack('!8B', 0x00, 0x01, 0xf2, 0x03, 0xf4, 0xf5, 0xf6, 0xf7)
+        self.assertEqual(checksum(data), ~0xddf2 & 0xFFFF)
+        self.assertEqual(checksum(b'\x01'), ~0x0100 & 0xFFFF)
+
+    def test_build_syn(self):
+        segment = build_syn('10.0.0.1', '10.0.0.2', 40000, 443, 123456789)
+        source_port, port, seq, ack, offset, flags, window, tcp_checksum, urgent = \
+            TCP_HEADER.unpack_from(segment)
+
+        self.assertEqual((source_port, port, seq, ack), (40000, 443, 123456789, 0))
+        self.assertEqual(flags, TCP_SYN)
+        self.assertEqual((offset >> 4) * 4, len(segment))
+
+        pseudo_header = PSEUDO_HEADER.pack(socket.inet_aton('10.0.0.1'),
+                                           socket.inet_aton('10.0.0.2'),
+                                           0, socket.IPPROTO_TCP, len(segment))
+        self.assertEqual(checksum(pseudo_header + segment), 0)
+
+    def test_parse_reply(self):
+        packet = ip_packet('10.0.0.2', reply_segment(40000, 443, 7, TCP_SYN | TCP_ACK))
+        self.assertEqual(parse_reply(packet), ('10.0.0.2', 443, 40000, 7, TCP_SYN | TCP_ACK))
+
+        self.assertIsNone(parse_reply(b'\x45' * 10))
+        self.assertIsNone(parse_reply(packet[:30]))
+
+    def test_reply_result(self):
+        self.assertEqual(reply_result(TCP_SYN | TCP_ACK), RESULT_OPEN)
+        self.assertEqual(reply_result(TCP_RST | TCP_ACK), RESULT_CLOSED)
+        self.assertEqual(reply_result(TCP_ACK), RESULT_UNKNOWN)
+
+
+@unittest.skipIf(not syn_is_available(), 'raw sockets are not available')
+class SynEngineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = SynEngine(secret=b'secret')
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(5)
+        self.open_port = self.listener.getsockname()[1]
+
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed.bind(('127.0.0.1', 0))
+        self.closed_port = closed.getsockname()[1]
+        closed.close()
+
+    def tearDown(self):
+        self.engine.close()
+        self.listener.close()
+
+    def wait_for_replies(self, count):
+        answered = []
+        for _ in range(100):
+            answered.extend(self.engine.receive())
+            if len(answered) >= count:
+                break
+            time.sleep(0.01)
+
+        return answered
+
+    def test_cookie(self):
+        self.assertEqual(self.engine.cookie('10.0.0.1', 80), self.engine.cookie('10.0.0.1', 80))
+        self.assertNotEqual(self.engine.cookie('10.0.0.1', 80), self.engine.cookie('10.0.0.1', 81))
+
+    def test_loopback(self):
+        open_probe = SynProbe(self.engine, '127.0.0.1', self.open_port)
+        closed_probe = SynProbe(self.engine, '127.0.0.1', self.closed_port)
+        self.assertNotEqual(open_probe.file_no, closed_probe.file_no)
+
+        answered = dict(self.wait_for_replies(2))
+        self.assertEqual(answered[open_probe], RESULT_OPEN)
+        self.assertEqual(answered[closed_probe], RESULT_CLOSED)
+        self.assertGreaterEqual(open_probe.rtt(), 0.0)
+
+        open_probe.close()
+        closed_probe.close()
+        self.assertEqual(self.engine.probes, {})
+
+    def test_scanner(self):
+        scanner = MultiPortScanner(['127.0.0.1'], [self.open_port, self.closed_port],
+                                   scan_type='syn')
+        try:
+            results_map = scanner.run()
+        finally:
+            scanner.close()
+
+        self.assertEqual(results_map, {('127.0.0.1', self.open_port): RESULT_OPEN,
+                                       ('127.0.0.1', self.closed_port): RESULT_CLOSED})
+
+
+if __name__ == "__main__":
+    unittest.main()
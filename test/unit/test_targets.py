@@ -0,0 +1,42 @@
+import unittest
+from StringIO import StringIO
+
+from port_scanner.targets import *
+
+
+class TargetsTestCase(unittest.TestCase):
+
+    def test_expand_cidr(self):
+        addresses = list(expand_cidr('10.0.0.0/30'))
+        self.assertEqual(addresses, ['10.0.0.0', '10.0.0.1', '10.0.0.2', '10.0.0.3'])
+
+    def test_expand_cidr_masks_host_bits(self):
+        addresses = list(expand_cidr('192.168.1.77/31'))
+        self.assertEqual(addresses, ['192.168.1.76', '192.168.1.77'])
+
+    def test_expand_cidr_single_host(self):
+        self.assertEqual(list(expand_cidr('1.2.3.4/32')), ['1.2.3.4'])
+
+    def test_expand_cidr_size(self):
+        self.assertEqual(len(list(expand_cidr('10.0.0.0/22'))), 1024)
+
+    def test_expand_cidr_invalid(self):
+        for cidr in ['10.0.0.0/33', '10.0.0.0/-1', '10.0.0/x', 'host.com/24', '1/2/3']:
+            with self.assertRaises(InvalidTargetError):
+                list(expand_cidr(cidr))
+
+    def test_expand_targets(self):
+        targets = ['host.com', '10.0.0.0/31', ' 10.0.0.1 ', '', 'host.com']
+        hosts = list(expand_targets(targets))
+
+        self.assertEqual(hosts, ['host.com', '10.0.0.0', '10.0.0.1'])
+
+    def test_read_target_file(self):
+        target_file = StringIO('host.com 10.0.0.1\n# a comment\n\n10.0.0.0/24  # office\n')
+        targets = list(read_target_file(target_file))
+
+        self.assertEqual(targets, ['host.com', '10.0.0.1', '10.0.0.0/24'])
+
+
+if __name__ == "__main__":
+    unittest.main()
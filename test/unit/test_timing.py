@@ -0,0 +1,202 @@
+import threading
+import unittest
+
+from port_scanner.simulator import VirtualClock
+from port_scanner.timing import *
+
+
+class CongestionWindowTestCase(unittest.TestCase):
+
+    def test_initial_limit(self):
+        window = CongestionWindow(initial=10)
+        self.assertEqual(window.limit(), 10)
+
+    def test_initial_clamped(self):
+        self.assertEqual(CongestionWindow(initial=0, minimum=2).limit(), 2)
+        self.assertEqual(CongestionWindow(initial=50, maximum=20).limit(), 20)
+
+    def test_slow_start(self):
+        window = CongestionWindow(initial=10)
+        for _ in range(10):
+            window.on_response()
+
+        self.assertEqual(window.limit(), 20)
+
+    def test_congestion_avoidance(self):
+        window = CongestionWindow(initial=16)
+        window.on_loss(0.0, 1.0)
+        self.assertEqual(window.limit(), 8)
+
+        # one probe per window's worth of responses
+        for _ in range(8):
+            window.on_response()
+
+        self.assertEqual(window.limit(), 8)
+        window.on_response()
+        self.assertEqual(window.limit(), 9)
+
+    def test_maximum(self):
+        window = CongestionWindow(initial=10, maximum=12)
+        for _ in range(10):
+            window.on_response()
+
+        self.assertEqual(window.limit(), 12)
+
+    def test_multiplicative_decrease(self):
+        window = CongestionWindow(initial=40, minimum=4)
+
+        self.assertTrue(window.on_loss(0.0, 1.0))
+        self.assertEqual(window.limit(), 20)
+        self.assertTrue(window.on_loss(2.0, 3.0))
+        self.assertEqual(window.limit(), 10)
+        self.assertTrue(window.on_loss(4.0, 5.0))
+        self.assertTrue(window.on_loss(6.0, 7.0))
+        self.assertEqual(window.limit(), 4)
+        self.assertEqual(window.decreases, 4)
+
+    def test_single_decrease_per_congestion_event(self):
+        window = CongestionWindow(initial=40)
+
+        self.assertTrue(window.on_loss(0.0, 1.0))
+        # probes sent before the decrease were lost to the same event
+        self.assertFalse(window.on_loss(0.5, 1.2))
+        self.assertEqual(window.limit(), 20)
+        self.assertEqual(window.decreases, 1)
+
+
+class RttEstimatorTestCase(unittest.TestCase):
+
+    def test_initial_timeout(self):
+        estimator = RttEstimator(initial_timeout=0.5)
+
+        self.assertEqual(estimator.timeout(), 0.5)
+        self.assertIsNone(estimator.srtt)
+        self.assertIsNone(estimator.rttvar)
+
+    def test_initial_timeout_clamped(self):
+        self.assertEqual(RttEstimator(10.0, 0.1, 2.0).timeout(), 2.0)
+        self.assertEqual(RttEstimator(0.01, 0.1, 2.0).timeout(), 0.1)
+
+    def test_first_sample(self):
+        estimator = RttEstimator(1.0, 0.0, 10.0)
+        estimator.sample(0.2)
+
+        self.assertAlmostEqual(estimator.srtt, 0.2)
+        self.assertAlmostEqual(estimator.rttvar, 0.1)
+        self.assertAlmostEqual(estimator.timeout(), 0.6)
+
+    def test_later_samples(self):
+        estimator = RttEstimator(1.0, 0.0, 10.0)
+        estimator.sample(0.2)
+        estimator.sample(0.4)
+
+        self.assertAlmostEqual(estimator.rttvar, 0.75 * 0.1 + 0.25 * 0.2)
+        self.assertAlmostEqual(estimator.srtt, 0.875 * 0.2 + 0.125 * 0.4)
+        self.assertAlmostEqual(estimator.timeout(), estimator.srtt + 4 * estimator.rttvar)
+        self.assertEqual(estimator.samples, 2)
+
+    def test_back_off(self):
+        estimator = RttEstimator(0.5, 0.05, 3.0)
+
+        self.assertTrue(estimator.back_off(0.0, 0.5))
+        self.assertEqual(estimator.timeout(), 1.0)
+        # a probe sent before the last back off timed out with the same timeout
+        self.assertFalse(estimator.back_off(0.1, 0.6))
+        self.assertTrue(estimator.back_off(0.5, 1.5))
+        self.assertEqual(estimator.timeout(), 2.0)
+        # at most MAX_BACKOFFS doublings above the estimated timeout
+        self.assertFalse(estimator.back_off(1.5, 3.5))
+        self.assertEqual(estimator.timeout(), 2.0)
+        self.assertEqual(estimator.backoffs, MAX_BACKOFFS)
+
+        # the next sample recomputes the timeout from the estimates
+        estimator.sample(0.2)
+        self.assertAlmostEqual(estimator.timeout(), 0.6)
+
+    def test_clamped(self):
+        fast = RttEstimator(1.0, 0.05, 2.0)
+        for _ in range(10):
+            fast.sample(0.0001)
+        self.assertEqual(fast.timeout(), 0.05)
+
+        slow = RttEstimator(1.0, 0.05, 2.0)
+        slow.sample(5.0)
+        self.assertEqual(slow.timeout(), 2.0)
+
+    def test_converges(self):
+        estimator = RttEstimator(1.0, 0.0, 10.0)
+        for _ in range(100):
+            estimator.sample(0.3)
+
+        self.assertAlmostEqual(estimator.srtt, 0.3)
+        self.assertAlmostEqual(estimator.timeout(), 0.3 + CLOCK_GRANULARITY, places=3)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+class SystemClockTestCase(unittest.TestCase):
+
+    def test_monotonic(self):
+        first = SYSTEM_CLOCK.time()
+        SYSTEM_CLOCK.sleep(0.001)
+        self.assertGreater(SYSTEM_CLOCK.time(), first)
+
+    def test_negative_sleep(self):
+        SYSTEM_CLOCK.sleep(-1.0)
+
+
+class RateLimiterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = VirtualClock()
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(0)
+
+    def test_default_burst(self):
+        self.assertEqual(RateLimiter(10, clock=self.clock).burst, 1)
+        self.assertEqual(RateLimiter(10000, clock=self.clock).burst, 100)
+
+    def test_acquire(self):
+        limiter = RateLimiter(10, burst=2, clock=self.clock)
+        self.assertEqual(limiter.acquire(), 0.0)
+        self.assertEqual(limiter.acquire(), 0.0)
+        self.assertAlmostEqual(limiter.acquire(), 0.1)
+
+        self.clock.advance(0.05)
+        self.assertAlmostEqual(limiter.acquire(), 0.05)
+        self.clock.advance(0.05)
+        self.assertEqual(limiter.acquire(), 0.0)
+
+    def test_burst_capped(self):
+        limiter = RateLimiter(10, burst=2, clock=self.clock)
+        self.clock.advance(100.0)
+        self.assertEqual([limiter.acquire() for _ in range(2)], [0.0, 0.0])
+        self.assertGreater(limiter.acquire(), 0.0)
+
+    def test_wait(self):
+        limiter = RateLimiter(100, burst=1, clock=self.clock)
+        for _ in range(101):
+            limiter.wait()
+
+        self.assertAlmostEqual(self.clock.time(), 1.0)
+
+    def test_shared_between_threads(self):
+        limiter = RateLimiter(1, burst=50, clock=self.clock)
+        acquired = []
+
+        def acquire():
+            for _ in range(20):
+                if limiter.acquire() == 0.0:
+                    acquired.append(1)
+
+        threads = [threading.Thread(target=acquire) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(acquired), 50)
@@ -0,0 +1,116 @@
+import json
+import unittest
+
+from port_scanner.scanner import PortScanner
+from port_scanner.simulator import HostModel, SimulatedNetwork
+from port_scanner.trace import *
+from port_scanner.values import *
+
+
+class FakeProbe(object):
+    def __init__(self, address, port, file_no):
+        self.address = address
+        self.port = port
+        self.file_no = file_no
+
+
+class ProbeTracerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tracer = ProbeTracer(capacity=4)
+        self.probe = FakeProbe('10.0.0.1', 80, 5)
+
+    def test_events(self):
+        self.tracer.launch(1.0, self.probe, 1)
+        self.tracer.wakeup(1.5, 0.25, 1)
+        self.tracer.finish(1.5, self.probe, RESULT_OPEN)
+
+        self.assertEqual(list(self.tracer.events()), [
+            (1.0, 0.0, EVENT_LAUNCH, 0, 80, 5, '10.0.0.1', 1),
+            (1.25, 0.25, EVENT_WAKEUP, 0, 0, -1, '10.0.0.1', 1),
+            (1.5, 0.0, EVENT_ANSWER, RESULT_OPEN, 80, 5, '10.0.0.1', 1),
+        ])
+
+    def test_ring_buffer(self):
+        for index in range(6):
+            self.tracer.retry(float(index), '10.0.0.1', index)
+
+        self.assertEqual(self.tracer.count, 6)
+        self.assertEqual(self.tracer.dropped, 2)
+        self.assertEqual([event[4] for event in self.tracer.events()], [2, 3, 4, 5])
+
+    def test_clear(self):
+        self.tracer.wakeup(1.0, 0.5, 0)
+        self.tracer.clear()
+        self.assertEqual(list(self.tracer.events()), [])
+        self.assertEqual(self.tracer.wakeups, 0)
+
+    def test_chrome_trace(self):
+        self.tracer.launch(1.0, self.probe, 1)
+        self.tracer.wakeup(1.5, 0.5, 0)
+        self.tracer.finish(1.5, self.probe, RESULT_FILTERED, timed_out=True)
+        self.tracer.retry(1.5, '10.0.0.1', 80)
+
+        trace = self.tracer.to_chrome_trace()
+        events = [event for event in trace['traceEvents'] if event['ph'] != 'M']
+        begin, wait, end, retry = events
+
+        self.assertEqual((begin['ph'], begin['name'], begin['ts']), ('b', '10.0.0.1:80', 0.0))
+        self.assertEqual((wait['ph'], wait['ts'], wait['dur']), ('X', 0.0, 500000.0))
+        self.assertEqual((end['ph'], end['id'], end['ts']), ('e', begin['id'], 500000.0))
+        self.assertEqual(end['args'], {'result': 'filtered', 'event': 'timeout', 'wakeup': 1})
+        self.assertEqual(retry['ph'], 'i')
+
+    def test_overwritten_launch_left_out(self):
+        self.tracer.launch(1.0, self.probe, 1)
+        for index in range(4):
+            self.tracer.wakeup(2.0, 0.5, 0)
+        self.tracer.finish(2.0, self.probe, RESULT_OPEN)
+
+        phases = [event['ph'] for event in self.tracer.to_chrome_trace()['traceEvents']]
+        self.assertNotIn('b', phases)
+        self.assertNotIn('e', phases)
+
+    def test_serializable(self):
+        self.tracer.launch(1.0, self.probe, 1)
+        trace = json.loads(json.dumps(self.tracer.to_chrome_trace()))
+        self.assertEqual(trace['otherData'], {'events': 1, 'dropped': 0})
+
+
+class ScannerTraceTestCase(unittest.TestCase):
+
+    def test_run(self):
+        network = SimulatedNetwork({'10.0.0.1': HostModel(open_ports=[22], filtered_ports=[25])})
+        tracer = ProbeTracer()
+        scanner = PortScanner('10.0.0.1', range(1, 51), tracer=tracer, max_retries=1,
+                              **network.scanner_kwargs())
+        scanner.run()
+
+        kinds = [event[2] for event in tracer.events()]
+        self.assertEqual(kinds.count(EVENT_LAUNCH), 51)
+        self.assertEqual(kinds.count(EVENT_ANSWER), 49)
+        self.assertEqual(kinds.count(EVENT_TIMEOUT), 2)
+        self.assertEqual(kinds.count(EVENT_RETRY), 1)
+        self.assertEqual(kinds.count(EVENT_WAKEUP), tracer.wakeups)
+
+        # answers are handled by the wakeup recorded before them
+        wakeup = 0
+        for time, duration, kind, result, port, fd, address, value in tracer.events():
+            if kind == EVENT_WAKEUP:
+                wakeup += 1
+            elif kind in (EVENT_ANSWER, EVENT_TIMEOUT):
+                self.assertEqual(value, wakeup)
+
+    def test_poll(self):
+        network = SimulatedNetwork({'10.0.0.1': HostModel(open_ports=[22])})
+        tracer = ProbeTracer()
+        scanner = PortScanner('10.0.0.1', [22], tracer=tracer, **network.scanner_kwargs())
+        scanner.poll([22, 23], 1.0)
+
+        kinds = [event[2] for event in tracer.events()]
+        self.assertEqual(kinds.count(EVENT_LAUNCH), 2)
+        self.assertEqual(kinds.count(EVENT_ANSWER), 2)
+
+    def test_disabled(self):
+        scanner = PortScanner('10.0.0.1', [22], **SimulatedNetwork({}).scanner_kwargs())
+        self.assertIsNone(scanner.tracer)